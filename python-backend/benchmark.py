@@ -0,0 +1,334 @@
+"""Benchmark reproduzível do pipeline de detecção de sorrisos
+
+Mede cada etapa do engine principal (decode, escala de cinza, detecção de
+faces, cascade de sorriso, características da boca, score e JSON) e o tempo
+de ponta a ponta de cada engine, em várias resoluções e números de faces.
+
+Exemplos:
+    python benchmark.py
+    python benchmark.py --resolutions 640x480,1280x720 --faces 1,4 --output bench.json
+    python benchmark.py --images ~/fotos-quiosque --compare bench.json
+
+Os frames sintéticos partem das imagens de teste em backend/backend/backend e
+ganham textura aleatória (com semente fixa). Como o Haar não encontra faces
+neles, as etapas depois da detecção usam caixas de face posicionadas em grade;
+com --images as caixas vêm do próprio detector.
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from smile_engine.cascades import FACE_CASCADE, load_cascade
+from smile_engine.classifier import load_model
+from smile_engine.detector import run_engine
+from smile_engine.engine import FaceBatch, score_faces
+from smile_engine.face_detection import DEFAULT_FACE_PARAMS, detect_faces, parse_face_params
+from smile_engine.frame_io import decode_encoded_frame
+from smile_engine.options import ENGINES, parse_detection_options
+from smile_engine.strategies import parse_strategies
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'backend', 'backend')
+FIXTURES = ('test_image.png', 'test_larger.png')
+
+# Etapas do pipeline, na ordem em que rodam
+STAGES = ('decode', 'grayscale', 'face_detect', 'smile_cascade', 'features', 'scoring', 'json')
+PERCENTILES = (50, 95, 99)
+
+
+def parse_resolution(text):
+    width, _, height = text.lower().partition('x')
+    return int(width), int(height)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def synthetic_frame(width, height, rng):
+    """Imagem de teste redimensionada + textura suave (o cascade trabalha de verdade)"""
+    base = None
+    for name in FIXTURES:
+        image = cv2.imread(os.path.join(FIXTURE_DIR, name), cv2.IMREAD_COLOR)
+        if image is not None:
+            base = image if base is None or image.size > base.size else base
+    if base is None:
+        base = np.full((height, width, 3), 128, np.uint8)
+    base = cv2.resize(base, (width, height), interpolation=cv2.INTER_LINEAR)
+
+    noise = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    noise = cv2.GaussianBlur(noise, (0, 0), 3)
+    return cv2.addWeighted(base, 0.4, noise, 0.6, 0)
+
+
+def grid_boxes(width, height, count):
+    """`count` caixas quadradas em grade, como faces lado a lado numa foto em grupo"""
+    if count == 0:
+        return np.empty((0, 4), dtype=int)
+    cols = math.ceil(math.sqrt(count))
+    rows = math.ceil(count / cols)
+    cell_w, cell_h = width // cols, height // rows
+    side = int(min(cell_w, cell_h) * 0.8)
+    boxes = []
+    for index in range(count):
+        row, col = divmod(index, cols)
+        x = col * cell_w + (cell_w - side) // 2
+        y = row * cell_h + (cell_h - side) // 2
+        boxes.append((x, y, side, side))
+    return np.array(boxes, dtype=int)
+
+
+def summarize(samples):
+    """Percentis e média (ms) de uma lista de durações em segundos"""
+    values = np.asarray(samples, dtype=np.float64) * 1000.0
+    summary = {f"p{q}": round(float(np.percentile(values, q)), 4) for q in PERCENTILES}
+    summary["mean"] = round(float(values.mean()), 4)
+    return summary
+
+
+def bench_stages(encoded, boxes, face_params, selection, threshold, frames, warmup, face_size=None):
+    """Roda as etapas do engine principal uma a uma; retorna as durações por etapa"""
+    cascade = load_cascade(FACE_CASCADE)
+    timings = {stage: [] for stage in STAGES}
+    timings['total'] = []
+    cascade_fields = ('smile_detected',)
+    feature_fields = tuple(sorted({
+        field for strategy, _ in selection for field in strategy.fields if field not in cascade_fields
+    }))
+    found = 0
+
+    for iteration in range(warmup + frames):
+        marks = [time.perf_counter()]
+        frame = decode_encoded_frame(encoded)
+        marks.append(time.perf_counter())
+        # Como no servidor o frame já vem em cinza do decode; a etapa fica para comparar com execuções antigas
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        marks.append(time.perf_counter())
+        faces = detect_faces(gray, cascade, **face_params)
+        marks.append(time.perf_counter())
+
+        batch = FaceBatch(gray, faces if boxes is None else boxes, face_size)
+        indices = np.arange(len(batch))
+        batch.columns(cascade_fields, indices)
+        marks.append(time.perf_counter())
+        batch.columns(feature_fields, indices)
+        marks.append(time.perf_counter())
+        sub_scores, combined, strong = score_faces(batch, selection, threshold)
+        marks.append(time.perf_counter())
+        json.dumps({
+            "faces": [
+                {"box": list(box), "smile_score": float(score), "smiling": bool(score > threshold),
+                 "details": {name: float(values[index]) for name, values in sub_scores.items()}}
+                for index, (box, score) in enumerate(zip(batch.boxes, combined))
+            ]
+        })
+        marks.append(time.perf_counter())
+        batch.close()
+
+        if iteration < warmup:
+            continue
+        found = len(faces)
+        for stage, start, end in zip(STAGES, marks, marks[1:]):
+            timings[stage].append(end - start)
+        timings['total'].append(marks[-1] - marks[0])
+
+    return timings, found
+
+
+def bench_engine(encoded, options, frames, warmup):
+    """Tempo de ponta a ponta (decode + detecção + JSON) de um engine"""
+    timings = {'decode': [], 'detect': [], 'json': [], 'total': []}
+    result = None
+    for iteration in range(warmup + frames):
+        start = time.perf_counter()
+        frame = decode_encoded_frame(encoded)
+        decoded = time.perf_counter()
+        result = run_engine(frame, options)
+        detected = time.perf_counter()
+        json.dumps(result)
+        end = time.perf_counter()
+        if iteration < warmup:
+            continue
+        timings['decode'].append(decoded - start)
+        timings['detect'].append(detected - decoded)
+        timings['json'].append(end - detected)
+        timings['total'].append(end - start)
+    return timings, result
+
+
+def build_report(timings):
+    report = {stage: summarize(samples) for stage, samples in timings.items() if samples}
+    mean_total = float(np.mean(timings['total']))
+    return report, round(1.0 / mean_total, 2) if mean_total > 0 else None
+
+
+def load_sources(args, rng):
+    """[(cenário, frame BGR, [(faces, caixas ou None), ...]), ...] de imagens ou frames sintéticos"""
+    sources = []
+    if args.images:
+        pattern = args.images
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*')
+        for path in sorted(glob.glob(os.path.expanduser(pattern))):
+            image = cv2.imread(path, cv2.IMREAD_COLOR)
+            if image is None:
+                continue
+            height, width = image.shape[:2]
+            scenario = {"source": os.path.basename(path), "resolution": f"{width}x{height}"}
+            sources.append((scenario, image, [("detected", None)]))
+        return sources
+
+    for width, height in args.resolutions:
+        scenario = {"source": "synthetic", "resolution": f"{width}x{height}"}
+        box_sets = [(count, grid_boxes(width, height, count)) for count in args.faces]
+        sources.append((scenario, synthetic_frame(width, height, rng), box_sets))
+    return sources
+
+
+def run_benchmark(args):
+    rng = np.random.default_rng(args.seed)
+    face_params = parse_face_params({'min_face_size': args.min_face_size}, DEFAULT_FACE_PARAMS)
+    selection = parse_strategies(args.strategies)
+    results = []
+
+    for base_scenario, frame, box_sets in load_sources(args, rng):
+        ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, args.jpeg_quality])
+        if not ok:
+            continue
+        base_scenario = dict(base_scenario, encoded_bytes=int(encoded.size))
+
+        for faces, boxes in box_sets:
+            scenario = dict(base_scenario, faces=faces)
+            timings, found = bench_stages(encoded, boxes, face_params, selection, args.threshold,
+                                          args.frames, args.warmup, args.face_size)
+            stages, fps = build_report(timings)
+            results.append({"scenario": scenario, "pipeline": "stages", "faces_detected": found,
+                            "frames": args.frames, "fps": fps, "stages": stages})
+            print(f"⏱️  {scenario['source']} {scenario['resolution']} faces={faces}: "
+                  f"{stages['total']['p50']:.2f} ms p50, {fps} fps (etapas)", file=sys.stderr)
+
+        # De ponta a ponta cada engine procura as próprias faces no frame
+        scenario = dict(base_scenario, faces="detected")
+        for engine in args.engines:
+            options = parse_detection_options({
+                'engine': engine, 'threshold': args.threshold,
+                'min_face_size': args.min_face_size, 'strategies': args.strategies,
+                'face_size': args.face_size,
+            })
+            timings, result = bench_engine(encoded, options, args.frames, args.warmup)
+            stages, fps = build_report(timings)
+            results.append({"scenario": scenario, "pipeline": engine,
+                            "face_detected": bool(result.get('face_detected')),
+                            "frames": args.frames, "fps": fps, "stages": stages})
+            print(f"   {engine}: {stages['total']['p50']:.2f} ms p50, {fps} fps", file=sys.stderr)
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "opencv_threads": cv2.getNumThreads(),
+            "config": {
+                "frames": args.frames, "warmup": args.warmup, "seed": args.seed,
+                "jpeg_quality": args.jpeg_quality, "threshold": args.threshold,
+                "min_face_size": args.min_face_size, "strategies": args.strategies,
+                "face_size": args.face_size,
+            },
+        },
+        "results": results,
+    }
+
+
+def result_key(result):
+    scenario = result["scenario"]
+    return (scenario["source"], scenario["resolution"], str(scenario["faces"]), result["pipeline"])
+
+
+def compare(report, baseline):
+    """Razão p50 atual/base por etapa (< 1 = mais rápido que a base)"""
+    previous = {result_key(result): result for result in baseline["results"]}
+    print(f"\n📊 Comparação com {baseline['meta'].get('revision') or 'base'} (p50 atual / p50 base)", file=sys.stderr)
+    for result in report["results"]:
+        old = previous.get(result_key(result))
+        if old is None:
+            continue
+        ratios = []
+        for stage, summary in result["stages"].items():
+            before = old["stages"].get(stage, {}).get("p50")
+            if before:
+                ratios.append(f"{stage}={summary['p50'] / before:.2f}x")
+        print(f"  {' '.join(result_key(result))}: {', '.join(ratios)}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do pipeline de detecção de sorrisos')
+    parser.add_argument('--resolutions', default='320x240,640x480,1280x720',
+                        type=lambda text: [parse_resolution(item) for item in text.split(',')],
+                        help='resoluções dos frames sintéticos (LxA separadas por vírgula)')
+    parser.add_argument('--faces', default='0,1,4', type=lambda text: [int(item) for item in text.split(',')],
+                        help='números de faces por frame sintético')
+    parser.add_argument('--images', help='diretório ou glob com imagens reais (substitui os frames sintéticos)')
+    parser.add_argument('--engines', type=lambda text: [e for e in text.split(',') if e],
+                        help='engines medidos de ponta a ponta (padrão: todos; vazio = só as etapas)')
+    parser.add_argument('--strategies', help='estratégias do engine improved, ex.: "haar,pixel:0.5"')
+    parser.add_argument('--threshold', type=float, default=0.5)
+    parser.add_argument('--min-face-size', type=int, help='ativa a detecção em resolução reduzida')
+    parser.add_argument('--face-size', type=int, help='normaliza cada face para este lado (px) antes de pontuar')
+    parser.add_argument('--model', help='modelo do engine classifier (gerado por train_classifier.py)')
+    parser.add_argument('--frames', type=int, default=50, help='frames medidos por cenário')
+    parser.add_argument('--warmup', type=int, default=5, help='frames descartados antes de medir')
+    parser.add_argument('--jpeg-quality', type=int, default=90)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='arquivo JSON de saída (padrão: stdout)')
+    parser.add_argument('--compare', help='JSON de uma execução anterior para comparar')
+    args = parser.parse_args()
+
+    if args.model:
+        try:
+            load_model(args.model)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    if args.engines is None:
+        # Sem modelo o engine classifier não roda
+        args.engines = [engine for engine in ENGINES if args.model or engine != 'classifier']
+    for engine in args.engines:
+        if engine not in ENGINES:
+            parser.error(f"engine desconhecido: {engine}")
+        if engine == 'classifier' and not args.model:
+            parser.error("o engine classifier precisa de --model")
+
+    report = run_benchmark(args)
+
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(report, handle, indent=2)
+        print(f"💾 Resultados salvos em {args.output}", file=sys.stderr)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as handle:
+            compare(report, json.load(handle))
+
+
+if __name__ == '__main__':
+    main()
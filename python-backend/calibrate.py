@@ -0,0 +1,126 @@
+"""Calibração offline dos pesos, cortes, boosts e threshold do engine improved
+
+Exemplos:
+    # 1. Extrai as características uma vez (dataset/sorrindo/*.jpg, dataset/neutro/*.jpg)
+    python calibrate.py extract dataset --output features/
+    python calibrate.py extract rotulos.csv --output features/    # CSV "caminho,rótulo"
+
+    # 2. Busca a melhor combinação sobre as características em cache
+    python calibrate.py sweep features/ --output smile_config.json
+
+    # 3. Servidor com a config calibrada
+    python improved_smile_detector.py --config smile_config.json
+
+A extração roda o pipeline OpenCV (face + boca + características) em
+paralelo e grava uma coluna por imagem num `.npy` com memory-map. O sweep
+não decodifica nenhuma imagem: reabre esse arquivo e avalia milhares de
+combinações com operações NumPy sobre o dataset inteiro.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from smile_engine.calibration import METRICS, calibrate, extract_features, iter_labeled_images, load_features
+from smile_engine.options import parse_face_size
+from smile_engine.strategies import parse_strategies
+
+
+def _init_worker(opencv_threads):
+    cv2.setNumThreads(opencv_threads)
+
+
+def extract(args):
+    try:
+        face_size = parse_face_size({'face_size': args.face_size})
+    except ValueError as e:
+        sys.exit(f"❌ {e}")
+    items = []
+    for source in args.inputs:
+        items.extend(iter_labeled_images(os.path.expanduser(source)))
+    if not items:
+        sys.exit("❌ Nenhuma imagem rotulada encontrada (use subdiretórios smile/neutral ou um CSV caminho,rótulo)")
+    positives = sum(label for _, label in items)
+    print(f"🖼️  {len(items)} imagens ({positives} sorrindo, {len(items) - positives} neutras)", file=sys.stderr)
+
+    started = time.perf_counter()
+    processes = args.workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                             initargs=(args.opencv_threads,)) as executor:
+        extract_features(items, args.output, executor if processes > 1 else None, face_size=face_size)
+
+    columns, _, _ = load_features(args.output)
+    without_face = int(np.isnan(columns['smile_detected']).sum())
+    elapsed = time.perf_counter() - started
+    print(f"✅ Características extraídas em {elapsed:.1f}s → {args.output} "
+          f"({without_face} imagens sem face)", file=sys.stderr)
+
+
+def sweep(args):
+    columns, labels, index = load_features(args.input)
+    try:
+        selection = parse_strategies(args.strategies)
+    except ValueError as e:
+        sys.exit(f"❌ {e}")
+
+    def log(message):
+        print(f"🔎 {message}", file=sys.stderr)
+
+    try:
+        config = calibrate(columns, labels, selection, metric=args.metric, samples=args.samples,
+                           rounds=args.rounds, validation=args.validation, seed=args.seed, log=log)
+    except ValueError as e:
+        sys.exit(f"❌ {e}")
+    config['calibration']['features'] = os.path.abspath(args.input)
+    if index.get('face_size'):
+        # Cortes calibrados em faces normalizadas só valem com a mesma normalização
+        config['face_size'] = index['face_size']
+
+    with open(args.output, 'w') as handle:
+        json.dump(config, handle, indent=2)
+        handle.write('\n')
+
+    report = config['calibration']
+    print(f"✅ threshold {config['threshold']} | {args.metric} treino {report['train_baseline']} → {report['train']}",
+          file=sys.stderr)
+    if 'validation' in report:
+        print(f"📊 Validação ({report['validation_faces']} faces): "
+              f"{report['validation_baseline']} → {report['validation']}", file=sys.stderr)
+    print(f"💾 Config gravada em {args.output}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Calibração offline do engine improved')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    extract_parser = commands.add_parser('extract', help='extrai as características de imagens rotuladas')
+    extract_parser.add_argument('inputs', nargs='+', help='diretórios com subpastas smile/neutral ou CSVs caminho,rótulo')
+    extract_parser.add_argument('--output', required=True, help='diretório das características')
+    extract_parser.add_argument('--face-size', type=int,
+                                help='normaliza as faces para este lado (px), como o --face-size do servidor')
+    extract_parser.add_argument('--workers', type=int, default=0, help='processos (0 = todos os núcleos)')
+    extract_parser.add_argument('--opencv-threads', type=int, default=1, help='threads do OpenCV por processo')
+    extract_parser.set_defaults(handler=extract)
+
+    sweep_parser = commands.add_parser('sweep', help='busca pesos, cortes e threshold sobre as características')
+    sweep_parser.add_argument('input', help='diretório gerado por "extract"')
+    sweep_parser.add_argument('--output', default='smile_config.json', help='config para o servidor (--config)')
+    sweep_parser.add_argument('--metric', choices=METRICS, default='f1')
+    sweep_parser.add_argument('--strategies', help='estratégias a calibrar, ex.: "haar,pixel,texture"')
+    sweep_parser.add_argument('--samples', type=int, default=2000, help='combinações aleatórias de pesos/boosts')
+    sweep_parser.add_argument('--rounds', type=int, default=2, help='rodadas da busca de cortes')
+    sweep_parser.add_argument('--validation', type=float, default=0.2, help='fração separada para validação')
+    sweep_parser.add_argument('--seed', type=int, default=0)
+    sweep_parser.set_defaults(handler=sweep)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
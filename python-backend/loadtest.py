@@ -0,0 +1,382 @@
+"""Teste de carga de ponta a ponta: uma frota de quiosques contra o servidor local
+
+Cada quiosque é uma corrotina com a própria conexão HTTP que manda frames
+de um corpus no seu ritmo (`--fps`), como o usePythonSmileDetection.ts: JPEG
+cru em /api/detect-smile/binary (`--payload binary`, o que o hook manda hoje)
+ou data URL em JSON em /api/detect-smile (`--payload json`, o formato antigo).
+Um quiosque nunca tem dois frames pendentes: se a hora do próximo frame chega
+com a resposta anterior ainda em aberto, o frame é descartado (drop), como
+no cliente. A carga sobe em degraus (`--kiosks 1,2,4,8`) e cada degrau
+relata latência, vazão, taxa de erro e de drop.
+
+Exemplos:
+    # Servidor já rodando em outro terminal (porta 5001)
+    python loadtest.py --kiosks 1,2,4,8,16 --duration 20
+
+    # Sobe o script indicado, espera /api/ready e mede até saturar
+    python loadtest.py --server improved_smile_detector.py --kiosks 1,2,4,8,16,32 --output carga.json
+    python loadtest.py --server smile_detector.py --port 5000 --payload json --images ~/fotos-quiosque
+
+Tudo roda offline: o cliente HTTP é escrito sobre asyncio (sem dependências
+novas) e os frames vêm de --images ou de frames sintéticos gerados aqui.
+"""
+import argparse
+import asyncio
+import base64
+import glob
+import json
+import os
+import platform
+import shlex
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+from benchmark import git_revision, parse_resolution, synthetic_frame
+
+PERCENTILES = (50, 95, 99)
+PAYLOADS = ('binary', 'json')
+
+# Critérios de saturação: vazão que cresce menos que isto entre degraus,
+# ou erros/drops acima destas taxas
+MIN_THROUGHPUT_GAIN = 0.05
+MAX_ERROR_RATE = 0.01
+MAX_DROP_RATE = 0.05
+
+
+class HttpConnection:
+    """Cliente HTTP/1.1 mínimo sobre asyncio, com keep-alive quando o servidor permite"""
+
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._reader = None
+        self._writer = None
+
+    async def request(self, method, path, headers, body=b''):
+        """(status, corpo) de uma requisição; reconecta se o servidor fechou a conexão"""
+        return await asyncio.wait_for(self._request(method, path, headers, body), self.timeout)
+
+    async def _request(self, method, path, headers, body):
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(body)}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        self._writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        try:
+            await self._writer.drain()
+            status_line = await self._reader.readline()
+            if not status_line:
+                raise ConnectionError("Connection closed by server")
+            version, status = status_line.split(b' ', 2)[:2]
+            response_headers = {}
+            while True:
+                line = await self._reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                response_headers[name.strip().lower()] = value.strip()
+            length = response_headers.get('content-length')
+            if length is not None:
+                payload = await self._reader.readexactly(int(length))
+            else:
+                payload = await self._reader.read()  # Sem tamanho: o corpo vai até o fim da conexão
+        except BaseException:
+            self.close()
+            raise
+        # O servidor de desenvolvimento do Flask responde em HTTP/1.0 e fecha a conexão
+        if (version != b'HTTP/1.1' or length is None
+                or response_headers.get('connection', '').lower() == 'close'):
+            self.close()
+        return int(status), payload
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+
+def load_corpus(args):
+    """Frames (JPEG codificados) que os quiosques reenviam em rodízio"""
+    width, height = args.resolution
+    frames = []
+    if args.images:
+        pattern = os.path.join(args.images, '*') if os.path.isdir(args.images) else args.images
+        for path in sorted(glob.glob(os.path.expanduser(pattern))):
+            image = cv2.imread(path, cv2.IMREAD_COLOR)
+            if image is not None:
+                frames.append(image)
+    else:
+        rng = np.random.default_rng(args.seed)
+        frames = [synthetic_frame(width, height, rng) for _ in range(args.corpus_frames)]
+
+    encoded = []
+    for frame in frames:
+        # Como o canvas do hook: reduzido para caber em --resolution, JPEG 0.8
+        scale = min(1.0, width / frame.shape[1], height / frame.shape[0])
+        if scale < 1.0:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, args.jpeg_quality])
+        if ok:
+            encoded.append(buffer.tobytes())
+    return encoded
+
+
+def build_request(payload, frame, session_id, query):
+    """(caminho, cabeçalhos, corpo) de um frame no formato escolhido"""
+    if payload == 'binary':
+        path = '/api/detect-smile/binary' + (f"?{query}" if query else '')
+        return path, {"Content-Type": "image/jpeg", "X-Session-Id": session_id}, frame
+    body = {"image": "data:image/jpeg;base64," + base64.b64encode(frame).decode(), "session_id": session_id}
+    body.update(option.split('=', 1) for option in query.split('&') if option)
+    return '/api/detect-smile', {"Content-Type": "application/json"}, json.dumps(body).encode()
+
+
+class StageStats:
+    """Contadores e latências de um degrau de carga"""
+
+    def __init__(self):
+        self.latencies = []
+        self.sent = 0
+        self.ok = 0
+        self.errors = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.dropped = 0
+        self.statuses = {}
+
+
+async def run_kiosk(index, connection, corpus, args, stats, stop_at):
+    """Um quiosque: um frame a cada 1/fps, descartando os que chegam com um pendente"""
+    interval = 1.0 / args.fps
+    session_id = f"loadtest-{index}"
+    loop = asyncio.get_running_loop()
+    # Quiosques defasados entre si, e cada um começa num ponto diferente do corpus
+    next_frame = loop.time() + interval * (index % 16) / 16
+    position = index * 7
+    while True:
+        now = loop.time()
+        if now >= stop_at:
+            return
+        if now < next_frame:
+            await asyncio.sleep(min(next_frame, stop_at) - now)
+            continue
+        missed = int((now - next_frame) // interval)
+        stats.dropped += missed
+        next_frame += (missed + 1) * interval
+
+        path, headers, body = build_request(args.payload, corpus[position % len(corpus)], session_id, args.query)
+        position += 1
+        stats.sent += 1
+        started = time.perf_counter()
+        try:
+            status, _ = await connection.request('POST', path, headers, body)
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            stats.errors += 1
+            continue
+        except (OSError, ConnectionError, ValueError, asyncio.IncompleteReadError):
+            stats.errors += 1
+            continue
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        if status == 200:
+            stats.ok += 1
+            stats.latencies.append(time.perf_counter() - started)
+        else:
+            stats.errors += 1
+            stats.rejected += status == 503
+
+
+def summarize(samples):
+    """Percentis e média (ms) de uma lista de durações em segundos"""
+    if not samples:
+        return None
+    values = np.asarray(samples, dtype=np.float64) * 1000.0
+    summary = {f"p{q}": round(float(np.percentile(values, q)), 2) for q in PERCENTILES}
+    summary["mean"] = round(float(values.mean()), 2)
+    return summary
+
+
+async def run_stage(kiosks, corpus, args):
+    host, port = args.host, args.port
+    stats = StageStats()
+    connections = [HttpConnection(host, port, args.timeout) for _ in range(kiosks)]
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    stop_at = started + args.duration
+    try:
+        await asyncio.gather(*(run_kiosk(index, connection, corpus, args, stats, stop_at)
+                               for index, connection in enumerate(connections)))
+    finally:
+        for connection in connections:
+            connection.close()
+    elapsed = loop.time() - started
+
+    attempted = stats.sent + stats.dropped
+    return {
+        "kiosks": kiosks,
+        "offered_fps": round(kiosks * args.fps, 2),
+        "seconds": round(elapsed, 2),
+        "sent": stats.sent,
+        "completed": stats.ok,
+        "throughput_fps": round(stats.ok / elapsed, 2) if elapsed > 0 else 0.0,
+        "error_rate": round(stats.errors / stats.sent, 4) if stats.sent else 0.0,
+        "drop_rate": round(stats.dropped / attempted, 4) if attempted else 0.0,
+        "errors": stats.errors,
+        "rejected_503": stats.rejected,
+        "timeouts": stats.timeouts,
+        "dropped": stats.dropped,
+        "statuses": {str(status): count for status, count in sorted(stats.statuses.items())},
+        "latency_ms": summarize(stats.latencies),
+    }
+
+
+def find_saturation(stages, max_p95=None):
+    """Primeiro degrau em que a vazão para de crescer ou erros/drops/latência passam do limite"""
+    previous = None
+    for stage in stages:
+        latency = stage["latency_ms"] or {}
+        reasons = []
+        if stage["error_rate"] > MAX_ERROR_RATE:
+            reasons.append(f"erros {stage['error_rate']:.1%}")
+        if stage["drop_rate"] > MAX_DROP_RATE:
+            reasons.append(f"drops {stage['drop_rate']:.1%}")
+        if max_p95 is not None and latency.get('p95', 0) > max_p95:
+            reasons.append(f"p95 {latency['p95']:.0f} ms")
+        if previous and stage["throughput_fps"] < previous["throughput_fps"] * (1 + MIN_THROUGHPUT_GAIN):
+            reasons.append("vazão parou de crescer")
+        if reasons:
+            return {"kiosks": stage["kiosks"], "reasons": reasons,
+                    "max_throughput_fps": max(item["throughput_fps"] for item in stages)}
+        previous = stage
+    return None
+
+
+def wait_until_ready(base_url, seconds, server=None):
+    """Espera /api/ready responder 200 (ou o processo do servidor morrer)"""
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(base_url + '/api/ready', timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except (OSError, urllib.error.URLError):
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def start_server(args):
+    """Sobe o script do detector na porta pedida (stdout/stderr vão para o log)"""
+    command = [sys.executable] + shlex.split(args.server) + ['--port', str(args.port)]
+    log = open(args.server_log, 'w') if args.server_log else subprocess.DEVNULL
+    print(f"🚀 {' '.join(command)}", file=sys.stderr)
+    return subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)), stdout=log, stderr=log)
+
+
+def parse_int_list(text):
+    return [int(item) for item in text.split(',') if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga com uma frota de quiosques simulados')
+    parser.add_argument('--url', default=None, help='servidor (padrão: http://127.0.0.1:PORTA)')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--server', help='script do detector a subir antes do teste, ex.: "improved_smile_detector.py --workers 4"')
+    parser.add_argument('--server-log', help='arquivo para a saída do servidor iniciado com --server')
+    parser.add_argument('--kiosks', default='1,2,4,8,16', type=parse_int_list, help='quiosques em cada degrau')
+    parser.add_argument('--fps', type=float, default=5.0, help='frames por segundo de cada quiosque')
+    parser.add_argument('--duration', type=float, default=15.0, help='segundos por degrau')
+    parser.add_argument('--payload', choices=PAYLOADS, default='binary',
+                        help='binary = JPEG cru (hook atual), json = data URL em /api/detect-smile')
+    parser.add_argument('--query', default='', help='opções extras da requisição, ex.: "presence=1&engine=simple"')
+    parser.add_argument('--images', help='diretório ou glob com os frames do corpus (padrão: sintéticos)')
+    parser.add_argument('--resolution', default='640x480', type=parse_resolution,
+                        help='tamanho máximo dos frames enviados (LxA)')
+    parser.add_argument('--corpus-frames', type=int, default=30, help='frames sintéticos no corpus')
+    parser.add_argument('--jpeg-quality', type=int, default=80)
+    parser.add_argument('--timeout', type=float, default=10.0, help='segundos até uma requisição contar como erro')
+    parser.add_argument('--max-p95', type=float, help='p95 (ms) acima do qual o degrau conta como saturado')
+    parser.add_argument('--ready-timeout', type=float, default=60.0, help='espera por /api/ready (s)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='arquivo JSON de saída')
+    args = parser.parse_args()
+
+    if args.fps <= 0 or args.duration <= 0 or not args.kiosks or min(args.kiosks) < 1:
+        parser.error('--fps, --duration e --kiosks devem ser positivos')
+    base_url = (args.url or f"http://127.0.0.1:{args.port}").rstrip('/')
+    target = urlsplit(base_url)
+    if target.scheme != 'http' or not target.hostname:
+        parser.error('--url deve ser http://host:porta')
+    args.host, args.port = target.hostname, target.port or 80
+
+    corpus = load_corpus(args)
+    if not corpus:
+        sys.exit("❌ Nenhum frame no corpus")
+    sizes = [len(frame) for frame in corpus]
+    print(f"🖼️  {len(corpus)} frames no corpus ({np.mean(sizes) / 1024:.0f} KB em média, {args.payload})",
+          file=sys.stderr)
+
+    server = start_server(args) if args.server else None
+    try:
+        if not wait_until_ready(base_url, args.ready_timeout, server):
+            sys.exit(f"❌ Servidor em {base_url} não ficou pronto (/api/ready)")
+
+        stages = []
+        for kiosks in args.kiosks:
+            stage = asyncio.run(run_stage(kiosks, corpus, args))
+            stages.append(stage)
+            latency = stage["latency_ms"] or {}
+            print(f"⏱️  {kiosks:3d} quiosques ({stage['offered_fps']:.0f} fps oferecidos): "
+                  f"{stage['throughput_fps']:.1f} fps, p50 {latency.get('p50', 0):.0f} ms, "
+                  f"p95 {latency.get('p95', 0):.0f} ms, p99 {latency.get('p99', 0):.0f} ms, "
+                  f"erros {stage['error_rate']:.1%}, drops {stage['drop_rate']:.1%}", file=sys.stderr)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(10)
+
+    saturation = find_saturation(stages, args.max_p95)
+    if saturation:
+        print(f"📈 Saturação com {saturation['kiosks']} quiosques ({', '.join(saturation['reasons'])}); "
+              f"vazão máxima {saturation['max_throughput_fps']:.1f} fps", file=sys.stderr)
+    else:
+        print("📈 Sem saturação nos degraus testados", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": {
+                "url": base_url, "server": args.server, "payload": args.payload, "query": args.query,
+                "fps": args.fps, "duration": args.duration, "resolution": "x".join(map(str, args.resolution)),
+                "corpus_frames": len(corpus), "images": args.images, "jpeg_quality": args.jpeg_quality,
+                "timeout": args.timeout,
+            },
+        },
+        "stages": stages,
+        "saturation": saturation,
+    }
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(report, handle, indent=2)
+        print(f"💾 Resultados salvos em {args.output}", file=sys.stderr)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
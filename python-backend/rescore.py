@@ -0,0 +1,285 @@
+"""Re-pontuação offline de fotos e vídeos gravados, sem passar pelo servidor Flask
+
+Exemplos:
+    python rescore.py ~/capturas --output scores.jsonl
+    python rescore.py "sessoes/**/*.jpg" gravacao.mp4 --every 5 --output scores.csv
+    python rescore.py ~/capturas --output scores.jsonl --resume   # continua de onde parou
+
+As imagens são lidas pelos próprios processos worker (só o caminho cruza o
+limite de processo); vídeos são lidos em sequência com cv2.VideoCapture e os
+frames seguem para os workers. No máximo --in-flight itens ficam pendentes ao
+mesmo tempo, então a memória não cresce com o tamanho da entrada. Cada
+resultado é gravado (com flush) assim que fica pronto; com --resume
+os itens já presentes na saída são pulados, exceto os que deram erro, que
+são tentados de novo. Se um worker morre, a execução para sem gravar os
+itens pendentes (sai com código 1) e --resume continua dali.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import cv2
+
+from smile_engine.classifier import current_model, load_model
+from smile_engine.detector import get_detector, run_engine
+from smile_engine.frame_io import DECODE_SCALES, FrameDecodeError, read_image, reduce_frame
+from smile_engine.options import ENGINES, parse_detection_options
+from smile_engine.presence import real_face
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v')
+
+# Colunas da saída (CSV) e campos de cada linha JSONL
+FIELDS = ('source', 'frame', 'time_ms', 'face_detected', 'simulated', 'smiling', 'smile_score',
+          'face_count', 'smiling_count', 'error')
+
+# Opções de detecção do processo worker (definidas no initializer)
+_options = None
+
+
+def _init_worker(opencv_threads, options, model_path=None):
+    global _options
+    cv2.setNumThreads(opencv_threads)
+    _options = options
+    if model_path and current_model() is None:
+        load_model(model_path)  # Processos iniciados com spawn não herdam o modelo
+    get_detector(options['engine'])
+
+
+def _score(frame):
+    result = run_engine(frame, _options)
+    return {
+        # Só face real: a face simulada do engine improved fica marcada em `simulated`
+        "face_detected": real_face(result),
+        "simulated": bool(result.get('simulated')),
+        "smiling": bool(result.get('smiling')),
+        "smile_score": round(float(result.get('smile_score', 0.0)), 4),
+        "face_count": result.get('face_count'),
+        "smiling_count": result.get('smiling_count'),
+        "error": result.get('error'),
+    }, result
+
+
+def _score_image(path, full):
+    # Direto em cinza (e reduzido, com --decode-scale): o engine não usa cor
+    frame = read_image(path, scale=_options['decode_scale'])
+    if frame is None:
+        return {"error": "Could not read image"}, None
+    record, result = _score(frame)
+    return record, result if full else None
+
+
+def _score_frame(frame, full):
+    try:
+        frame = reduce_frame(frame, _options['decode_scale'])
+    except FrameDecodeError as e:
+        return {"error": str(e)}, None
+    record, result = _score(frame)
+    return record, result if full else None
+
+
+def iter_paths(inputs, recursive):
+    """Expande diretórios e globs em caminhos de arquivo, em ordem estável"""
+    for item in inputs:
+        item = os.path.expanduser(item)
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                if not recursive:
+                    dirs.clear()
+                for name in sorted(files):
+                    yield os.path.join(root, name)
+        elif os.path.isfile(item):
+            yield item
+        else:
+            yield from sorted(glob.glob(item, recursive=True))
+
+
+def iter_tasks(inputs, recursive, every, done):
+    """Gera (chave, função, argumento, extras) para cada imagem ou frame de vídeo ainda não feito"""
+    for path in iter_paths(inputs, recursive):
+        extension = os.path.splitext(path)[1].lower()
+        if extension in IMAGE_EXTENSIONS:
+            if (path, None) not in done:
+                yield (path, None), _score_image, path, {"time_ms": None}
+        elif extension in VIDEO_EXTENSIONS:
+            yield from iter_video_tasks(path, every, done)
+
+
+def iter_video_tasks(path, every, done):
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        if (path, None) not in done:
+            yield (path, None), None, None, {"time_ms": None, "error": "Could not open video"}
+        return
+    index = 0
+    try:
+        while True:
+            wanted = index % every == 0 and (path, index) not in done
+            # grab() só avança o vídeo; retrieve() decodifica apenas os frames usados
+            if not capture.grab():
+                break
+            if wanted:
+                ok, frame = capture.retrieve()
+                if ok:
+                    time_ms = round(capture.get(cv2.CAP_PROP_POS_MSEC), 1)
+                    yield (path, index), _score_frame, frame, {"time_ms": time_ms}
+            index += 1
+    finally:
+        capture.release()
+
+
+class ResultWriter:
+    """Grava resultados em JSONL ou CSV linha a linha, com flush a cada registro"""
+
+    def __init__(self, path, resume):
+        self.path = path
+        self.format = 'csv' if path.endswith('.csv') else 'jsonl'
+        self.done = set()
+        if resume and os.path.exists(path):
+            self._load_done()
+        else:
+            open(path, 'w').close()
+        self._handle = open(path, 'a', newline='')
+        self._csv = csv.DictWriter(self._handle, fieldnames=FIELDS, extrasaction='ignore') if self.format == 'csv' else None
+        if self._csv is not None and os.path.getsize(path) == 0:
+            self._csv.writeheader()
+            self._handle.flush()
+
+    def _load_done(self):
+        # Uma linha incompleta no fim (queda no meio da escrita) é descartada
+        with open(self.path, 'rb+') as handle:
+            data = handle.read()
+            complete = data.rfind(b'\n') + 1
+            if complete < len(data):
+                handle.truncate(complete)
+        lines = data[:complete].decode('utf-8').splitlines()
+        if self.format == 'csv':
+            rows = csv.DictReader(lines)
+        else:
+            rows = (json.loads(line) for line in lines if line.strip())
+        # Itens com erro não contam como feitos: voltam para a fila ao retomar
+        keys = ((row['source'], row['frame']) for row in rows if not row.get('error'))
+        for source, frame in keys:
+            self.done.add((source, int(frame) if frame not in (None, '') else None))
+
+    def write(self, record, result=None):
+        if self._csv is not None:
+            self._csv.writerow(record)
+        else:
+            if result is not None:
+                record = dict(record, result=result)
+            self._handle.write(json.dumps(record) + '\n')
+        self._handle.flush()
+
+    def close(self):
+        self._handle.close()
+
+
+def run(args, options):
+    writer = ResultWriter(args.output, args.resume)
+    if writer.done:
+        print(f"↩️  Retomando: {len(writer.done)} itens já pontuados", file=sys.stderr)
+
+    processes = args.workers or os.cpu_count() or 1
+    in_flight = args.in_flight or processes * 4
+    started = time.perf_counter()
+    count = 0
+    broken = False
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                             initargs=(args.opencv_threads, options, args.model)) as executor:
+        pending = {}
+
+        def drain():
+            nonlocal count, broken
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                (source, frame), extras = pending.pop(future)
+                try:
+                    record, result = future.result()
+                except BrokenProcessPool:
+                    # Nenhum registro: o item fica para o --resume
+                    broken = True
+                    continue
+                except Exception as e:
+                    record, result = {"error": str(e)}, None
+                writer.write(dict({"source": source, "frame": frame}, **extras, **record), result)
+                count += 1
+                if count % args.progress_every == 0:
+                    rate = count / (time.perf_counter() - started)
+                    print(f"⏱️  {count} itens ({rate:.1f}/s)", file=sys.stderr)
+
+        for key, function, argument, extras in iter_tasks(args.inputs, args.recursive, args.every, writer.done):
+            if function is None:
+                writer.write(dict({"source": key[0], "frame": key[1]}, **extras))
+                continue
+            # Limita os itens pendentes: o gerador só avança quando há vaga
+            while len(pending) >= in_flight and not broken:
+                drain()
+            if broken:
+                break
+            try:
+                pending[executor.submit(function, argument, args.full)] = (key, extras)
+            except BrokenProcessPool:
+                broken = True
+                break
+        while pending:
+            drain()
+
+    writer.close()
+    elapsed = time.perf_counter() - started
+    if broken:
+        print(f"❌ Um processo worker morreu; {count} itens gravados em {elapsed:.1f}s → {args.output}. "
+              f"Rode de novo com --resume para continuar.", file=sys.stderr)
+        return 1
+    print(f"✅ {count} itens pontuados em {elapsed:.1f}s → {args.output}", file=sys.stderr)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-pontuação offline de imagens e vídeos')
+    parser.add_argument('inputs', nargs='+', help='diretórios, globs, imagens ou vídeos')
+    parser.add_argument('--output', required=True, help='arquivo de saída (.jsonl ou .csv)')
+    parser.add_argument('--resume', action='store_true', help='pula itens já presentes na saída')
+    parser.add_argument('--recursive', action='store_true', help='percorre subdiretórios')
+    parser.add_argument('--every', type=int, default=1, help='pontua 1 a cada N frames de vídeo')
+    parser.add_argument('--engine', choices=ENGINES, default='improved')
+    parser.add_argument('--threshold', type=float, default=0.5)
+    parser.add_argument('--strategies', help='estratégias do engine improved, ex.: "haar,pixel:0.5"')
+    parser.add_argument('--multi-face', action='store_true', help='pontua todas as faces de cada frame')
+    parser.add_argument('--min-face-size', type=int, help='ativa a detecção em resolução reduzida')
+    parser.add_argument('--decode-scale', type=int, choices=DECODE_SCALES, default=1,
+                        help='analisa as imagens em 1/N da resolução')
+    parser.add_argument('--face-size', type=int, help='normaliza cada face para este lado (px) antes de pontuar')
+    parser.add_argument('--model', help='modelo do engine classifier (gerado por train_classifier.py)')
+    parser.add_argument('--full', action='store_true', help='inclui a resposta completa do detector (JSONL)')
+    parser.add_argument('--workers', type=int, default=0, help='processos (0 = todos os núcleos)')
+    parser.add_argument('--opencv-threads', type=int, default=1, help='threads do OpenCV por processo')
+    parser.add_argument('--in-flight', type=int, default=0, help='itens pendentes no máximo (0 = 4 por processo)')
+    parser.add_argument('--progress-every', type=int, default=500)
+    args = parser.parse_args()
+
+    if args.every < 1:
+        parser.error('--every deve ser >= 1')
+    try:
+        if args.model:
+            load_model(args.model)
+        options = parse_detection_options({
+            'engine': args.engine, 'threshold': args.threshold, 'multi_face': args.multi_face,
+            'strategies': args.strategies, 'min_face_size': args.min_face_size,
+            'decode_scale': args.decode_scale, 'face_size': args.face_size,
+        })
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    return run(args, options)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
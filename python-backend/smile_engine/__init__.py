@@ -0,0 +1,18 @@
+"""Engine de detecção de sorriso compartilhado pelos servidores do python-backend
+
+O servidor Flask fica em `smile_engine.server`; importar o pacote não sobe o Flask.
+"""
+from .detector import ImprovedSmileDetector, get_detector, run_engine
+from .engine import FaceBatch, score_faces
+from .legacy import MultiMethodSmileDetector, SimpleSmileDetector
+from .options import DEFAULT_OPTIONS, ENGINES, parse_detection_options
+from .sessions import DetectionSession, SessionStore
+from .strategies import DEFAULT_STRATEGIES, STRATEGIES, parse_strategies, register_strategy
+
+__all__ = [
+    'ImprovedSmileDetector', 'MultiMethodSmileDetector', 'SimpleSmileDetector',
+    'get_detector', 'run_engine', 'FaceBatch', 'score_faces',
+    'DEFAULT_OPTIONS', 'ENGINES', 'parse_detection_options',
+    'DetectionSession', 'SessionStore',
+    'DEFAULT_STRATEGIES', 'STRATEGIES', 'parse_strategies', 'register_strategy',
+]
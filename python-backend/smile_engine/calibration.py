@@ -0,0 +1,342 @@
+"""Calibração de pesos, cortes, boosts e threshold sobre características em cache
+
+1. `extract_features`: roda o pipeline OpenCV uma única vez por imagem rotulada
+   e grava as características da maior face num diretório colunar
+   (`features.npy` com uma linha por característica, `labels.npy`,
+   `index.json`), aberto depois com memory-map.
+2. `calibrate`: com as características fixas, todas as variações de pesos e
+   cortes são avaliadas como operações NumPy sobre o dataset inteiro.
+
+`extract_descriptors` faz a mesma extração para o engine `classifier`,
+gravando o descritor da boca de cada imagem (ver `train_classifier.py`).
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+from .cascades import FACE_CASCADE, cascade_pool
+from .classifier import DESCRIPTOR, DESCRIPTOR_SIZE, mouth_descriptors
+from .config import CONFIG_VERSION
+from .engine import BOOST, CANONICAL_FACE_SIZE, FaceBatch
+from .face_detection import DEFAULT_FACE_PARAMS, detect_faces
+from .frame_io import read_image
+from .mouth_features import FEATURE_NAMES
+
+# Colunas do arquivo de características (NaN = imagem sem face)
+FEATURE_COLUMNS = ('smile_detected',) + FEATURE_NAMES
+
+# Nomes de diretório aceitos como rótulo (dataset/sorrindo/*.jpg, dataset/neutro/*.jpg)
+LABEL_NAMES = {
+    'smile': 1, 'smiling': 1, 'sorriso': 1, 'sorrindo': 1, 'positive': 1, '1': 1,
+    'neutral': 0, 'no_smile': 0, 'neutro': 0, 'serio': 0, 'negative': 0, '0': 0,
+}
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+METRICS = ('f1', 'balanced_accuracy', 'accuracy')
+
+# Multiplicadores aplicados a cada corte na busca (inclui 1 = valor atual)
+CUTOFF_MULTIPLIERS = np.unique(np.concatenate([np.geomspace(1 / 3, 3, 31), [1.0]]))
+
+_face_cascades = cascade_pool(FACE_CASCADE)
+
+
+def iter_labeled_images(source):
+    """(caminho, rótulo) de um CSV `caminho,rótulo` ou de subdiretórios nomeados pelo rótulo"""
+    if os.path.isfile(source):
+        base = os.path.dirname(os.path.abspath(source))
+        with open(source) as handle:
+            for line in handle:
+                path, _, label = line.strip().rpartition(',')
+                if not path or label.strip().lower() not in LABEL_NAMES:
+                    continue  # cabeçalho ou linha sem rótulo válido
+                yield os.path.join(base, path.strip()), LABEL_NAMES[label.strip().lower()]
+        return
+
+    for name in sorted(os.listdir(source)):
+        label = LABEL_NAMES.get(name.lower())
+        folder = os.path.join(source, name)
+        if label is None or not os.path.isdir(folder):
+            continue
+        for root, dirs, files in os.walk(folder):
+            dirs.sort()
+            for filename in sorted(files):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(root, filename), label
+
+
+def largest_face(path, face_params=None, face_size=None):
+    """FaceBatch com a maior face da imagem, ou None se não houver imagem ou face"""
+    gray = read_image(path)
+    if gray is None:
+        return None
+    with _face_cascades.acquire() as cascade:
+        faces = detect_faces(gray, cascade, **(face_params or DEFAULT_FACE_PARAMS))
+    if len(faces) == 0:
+        return None
+    batch = FaceBatch(gray, [max(faces, key=lambda box: box[2] * box[3])], face_size)
+    return batch if len(batch) else None
+
+
+def image_features(path, face_params=None, face_size=None):
+    """Vetor FEATURE_COLUMNS da maior face da imagem (NaN se não houver face)"""
+    row = np.full(len(FEATURE_COLUMNS), np.nan, dtype=np.float32)
+    batch = largest_face(path, face_params, face_size)
+    if batch is None:
+        return row
+    with batch:
+        columns = batch.columns(FEATURE_COLUMNS, np.arange(1))
+    return np.array([columns[name][0] for name in FEATURE_COLUMNS], dtype=np.float32)
+
+
+def extract_features(items, output_dir, executor=None, face_params=None, face_size=None):
+    """Extrai e grava as características de [(caminho, rótulo), ...] em `output_dir`
+
+    As linhas vão direto para um `.npy` aberto com memory-map, na ordem das
+    imagens, então a memória não depende do tamanho do dataset. Com
+    `face_size` as faces são normalizadas como no servidor (ver FaceBatch).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    count = len(items)
+    features = np.lib.format.open_memmap(
+        os.path.join(output_dir, 'features.npy'), mode='w+', dtype=np.float32,
+        shape=(len(FEATURE_COLUMNS), count)
+    )
+    paths = [path for path, _ in items]
+    rows = executor.map(image_features, paths, [face_params] * count, [face_size] * count, chunksize=16) \
+        if executor else (image_features(path, face_params, face_size) for path in paths)
+    for index, row in enumerate(rows):
+        features[:, index] = row
+    features.flush()
+    del features
+
+    np.save(os.path.join(output_dir, 'labels.npy'), np.array([label for _, label in items], dtype=np.int8))
+    with open(os.path.join(output_dir, 'index.json'), 'w') as handle:
+        json.dump({"columns": list(FEATURE_COLUMNS), "sources": paths, "face_size": face_size}, handle)
+
+
+def load_features(store_dir):
+    """(colunas {nome: array memory-mapped}, rótulos, índice) de um diretório de características
+
+    O índice traz `columns`, `sources` (caminhos) e `face_size` da extração.
+    """
+    with open(os.path.join(store_dir, 'index.json')) as handle:
+        index = json.load(handle)
+    features = np.load(os.path.join(store_dir, 'features.npy'), mmap_mode='r')
+    labels = np.load(os.path.join(store_dir, 'labels.npy'), mmap_mode='r')
+    columns = {name: features[row] for row, name in enumerate(index['columns'])}
+    return columns, labels, index
+
+
+def image_descriptor(path, face_params=None, face_size=CANONICAL_FACE_SIZE):
+    """Descritor da boca (classifier.mouth_descriptors) da maior face (NaN se não houver face)"""
+    batch = largest_face(path, face_params, face_size)
+    if batch is None:
+        return np.full(DESCRIPTOR_SIZE, np.nan, dtype=np.float32)
+    with batch:
+        return mouth_descriptors(batch.mouths)[0]
+
+
+def extract_descriptors(items, output_dir, executor=None, face_params=None, face_size=CANONICAL_FACE_SIZE):
+    """Grava os descritores da boca de [(caminho, rótulo), ...] em `output_dir`
+
+    Mesmo formato de `extract_features`, mas com uma linha por imagem em
+    `descriptors.npy` (N x DESCRIPTOR_SIZE), que é como o treino os consome.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    count = len(items)
+    descriptors = np.lib.format.open_memmap(
+        os.path.join(output_dir, 'descriptors.npy'), mode='w+', dtype=np.float32,
+        shape=(count, DESCRIPTOR_SIZE)
+    )
+    paths = [path for path, _ in items]
+    rows = executor.map(image_descriptor, paths, [face_params] * count, [face_size] * count, chunksize=16) \
+        if executor else (image_descriptor(path, face_params, face_size) for path in paths)
+    for index, row in enumerate(rows):
+        descriptors[index] = row
+    descriptors.flush()
+    del descriptors
+
+    np.save(os.path.join(output_dir, 'labels.npy'), np.array([label for _, label in items], dtype=np.int8))
+    with open(os.path.join(output_dir, 'index.json'), 'w') as handle:
+        json.dump({"descriptor": DESCRIPTOR, "sources": paths, "face_size": face_size}, handle)
+
+
+def load_descriptors(store_dir):
+    """(descritores memory-mapped N x D, rótulos, índice) de um diretório de `extract_descriptors`"""
+    with open(os.path.join(store_dir, 'index.json')) as handle:
+        index = json.load(handle)
+    if index.get('descriptor') != DESCRIPTOR:
+        raise ValueError(f"{store_dir} has no descriptors for the current mouth descriptor")
+    descriptors = np.load(os.path.join(store_dir, 'descriptors.npy'), mmap_mode='r')
+    labels = np.load(os.path.join(store_dir, 'labels.npy'), mmap_mode='r')
+    return descriptors, labels, index
+
+
+def best_thresholds(scores, labels, metric='f1'):
+    """Melhor threshold e valor da métrica para cada linha de `scores` (M configs x N imagens)
+
+    Ordena os scores de cada config uma vez e avalia todos os cortes
+    possíveis com somas acumuladas, em vez de testar thresholds um a um.
+    """
+    labels = np.asarray(labels, dtype=np.float64)
+    positives = labels.sum()
+    negatives = labels.size - positives
+
+    order = np.argsort(-scores, axis=1, kind='stable')
+    ranked = np.take_along_axis(scores, order, axis=1)
+    true_pos = np.cumsum(labels[order], axis=1)
+    false_pos = np.arange(1, labels.size + 1) - true_pos
+
+    if metric == 'f1':
+        values = 2 * true_pos / (true_pos + false_pos + positives)
+    elif metric == 'balanced_accuracy':
+        values = 0.5 * (true_pos / max(positives, 1) + (negatives - false_pos) / max(negatives, 1))
+    else:
+        values = (true_pos + negatives - false_pos) / labels.size
+
+    # Só vale cortar onde o score muda (empates ficam do mesmo lado)
+    following = np.concatenate([ranked[:, 1:], np.full((ranked.shape[0], 1), -np.inf)], axis=1)
+    values = np.where(ranked > following, values, -np.inf)
+
+    best = np.argmax(values, axis=1)
+    rows = np.arange(scores.shape[0])
+    upper = ranked[rows, best]
+    lower = np.maximum(following[rows, best], upper - 0.05)
+    return values[rows, best], np.clip((upper + lower) / 2, 0.0, 1.0)
+
+
+def _combine(sub_scores, weights, strong, boost2, boost3):
+    """Score combinado como em engine.score_faces, para várias configs de uma vez
+
+    `sub_scores` é (S, N); `weights` (M, S) já normalizados; boosts (M,).
+    """
+    partial = weights @ sub_scores
+    boost = np.where(strong >= 3, boost3[:, None], np.where(strong >= 2, boost2[:, None], 0.0))
+    return np.clip(partial + boost, 0.0, 1.0)
+
+
+def calibrate(columns, labels, selection, metric='f1', samples=2000, rounds=2,
+              validation=0.2, seed=0, chunk=256, log=None):
+    """Busca pesos, cortes, boosts e threshold que maximizam `metric`
+
+    1. Cortes: coordenada a coordenada, cada corte é testado com todos os
+       CUTOFF_MULTIPLIERS de uma vez (os demais ficam fixos).
+    2. Pesos e boosts: `samples` combinações aleatórias (Dirichlet) avaliadas
+       em bloco, cada uma com o seu melhor threshold.
+
+    A config atual entra sempre como candidata, então o resultado no treino
+    nunca é pior que ela. Retorna a config (formato de config.py).
+    """
+    log = log or (lambda message: None)
+    rng = np.random.default_rng(seed)
+    valid = ~np.isnan(np.asarray(columns['smile_detected']))
+    indices = np.flatnonzero(valid)
+    rng.shuffle(indices)
+    split = int(len(indices) * (1 - validation))
+    train, held_out = np.sort(indices[:split]), np.sort(indices[split:])
+    if len(train) == 0 or len(np.unique(labels[train])) < 2:
+        raise ValueError("Calibration needs faces from both classes in the training split")
+
+    def subset(rows):
+        return {name: np.asarray(values[rows], dtype=np.float64) for name, values in columns.items()}
+
+    train_columns, train_labels = subset(train), np.asarray(labels[train])
+    strategies = [strategy for strategy, _ in selection]
+    weights = np.array([weight for _, weight in selection], dtype=np.float64)
+    weights /= weights.sum()
+    params = [dict(strategy.params) for strategy in strategies]
+    boost2, boost3 = BOOST[2], BOOST[3]
+
+    def evaluate(data, data_labels, params, weights, boost2, boost3):
+        sub = np.array([s.score(data, p) * np.ones(len(data_labels)) for s, p in zip(strategies, params)])
+        strong = sum(sub[i] > s.strong_above for i, s in enumerate(strategies))
+        combined = _combine(sub, weights[None, :], strong, np.array([boost2]), np.array([boost3]))
+        return sub, strong, combined
+
+    started = time.perf_counter()
+    sub, strong, combined = evaluate(train_columns, train_labels, params, weights, boost2, boost3)
+    baseline_metric, _ = best_thresholds(combined, train_labels, metric)
+    log(f"baseline ({metric}): {baseline_metric[0]:.4f} em {len(train)} faces de treino")
+
+    # 1. Cortes, um de cada vez com todos os candidatos vetorizados
+    for round_index in range(rounds):
+        for position, strategy in enumerate(strategies):
+            for name, value in params[position].items():
+                candidates = value * CUTOFF_MULTIPLIERS
+                trial = dict(params[position], **{name: candidates[:, None]})
+                scores = np.broadcast_to(strategy.score(train_columns, trial), (len(candidates), len(train)))
+                # Score combinado com esta estratégia variando e as outras fixas
+                rest = weights @ sub - weights[position] * sub[position]
+                rest_strong = strong - (sub[position] > strategy.strong_above)
+                candidate_strong = rest_strong + (scores > strategy.strong_above)
+                boost = np.where(candidate_strong >= 3, boost3, np.where(candidate_strong >= 2, boost2, 0.0))
+                combined = np.clip(rest + weights[position] * scores + boost, 0.0, 1.0)
+                values, _ = best_thresholds(combined, train_labels, metric)
+                best = int(np.argmax(values))
+                params[position][name] = float(candidates[best])
+                sub[position] = scores[best]
+                strong = candidate_strong[best]
+        log(f"cortes, rodada {round_index + 1}: {values[best]:.4f}")
+
+    # 2. Pesos + boosts: amostras aleatórias avaliadas em blocos de `chunk`
+    sampled_weights = np.vstack([weights, rng.dirichlet(np.ones(len(strategies)), size=samples)])
+    sampled_boost2 = np.concatenate([[boost2], rng.choice([0.0, 0.05, 0.1, 0.15], size=samples)])
+    sampled_boost3 = sampled_boost2 + np.concatenate([[boost3 - boost2], rng.choice([0.0, 0.05, 0.1], size=samples)])
+    best_value, best_index, best_threshold = -np.inf, 0, 0.5
+    for start in range(0, len(sampled_weights), chunk):
+        stop = start + chunk
+        combined = _combine(sub, sampled_weights[start:stop], strong,
+                            sampled_boost2[start:stop], sampled_boost3[start:stop])
+        values, thresholds = best_thresholds(combined, train_labels, metric)
+        position = int(np.argmax(values))
+        if values[position] > best_value:
+            best_value, best_index, best_threshold = values[position], start + position, thresholds[position]
+    log(f"pesos e boosts: {best_value:.4f} ({time.perf_counter() - started:.1f}s no total)")
+
+    weights = sampled_weights[best_index]
+    boost2, boost3 = float(sampled_boost2[best_index]), float(sampled_boost3[best_index])
+    report = {"metric": metric, "train_faces": int(len(train)), "train": round(float(best_value), 4),
+              "train_baseline": round(float(baseline_metric[0]), 4)}
+
+    if len(held_out) and len(np.unique(labels[held_out])) == 2:
+        held_columns, held_labels = subset(held_out), np.asarray(labels[held_out])
+        original = [dict(strategy.params) for strategy in strategies]
+        original_weights = np.array([weight for _, weight in selection], dtype=np.float64)
+        _, _, base = evaluate(held_columns, held_labels, original, original_weights / original_weights.sum(),
+                              BOOST[2], BOOST[3])
+        _, _, tuned = evaluate(held_columns, held_labels, params, weights, boost2, boost3)
+        report.update(
+            validation_faces=int(len(held_out)),
+            validation=round(metric_at(tuned[0], held_labels, best_threshold, metric), 4),
+            validation_baseline=round(metric_at(base[0], held_labels, 0.5, metric), 4),
+        )
+
+    return {
+        "version": CONFIG_VERSION,
+        "threshold": round(float(best_threshold), 4),
+        "strategies": {
+            strategy.name: {"weight": round(float(weight), 4),
+                            "params": {key: float(f'{value:.6g}') for key, value in params[position].items()}}
+            for position, (strategy, weight) in enumerate(zip(strategies, weights))
+        },
+        "boost": {"2": round(boost2, 4), "3": round(boost3, 4)},
+        "calibration": dict(report, created=time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                            faces_without_detection=int((~valid).sum())),
+    }
+
+
+def metric_at(scores, labels, threshold, metric):
+    """Métrica com um threshold fixo (avaliação na validação)"""
+    predicted = scores > threshold
+    labels = np.asarray(labels).astype(bool)
+    true_pos = float(np.sum(predicted & labels))
+    false_pos = float(np.sum(predicted & ~labels))
+    positives, negatives = float(labels.sum()), float((~labels).sum())
+    if metric == 'f1':
+        return 2 * true_pos / (true_pos + false_pos + positives) if positives else 0.0
+    if metric == 'balanced_accuracy':
+        return 0.5 * (true_pos / max(positives, 1) + (negatives - false_pos) / max(negatives, 1))
+    return (true_pos + negatives - false_pos) / labels.size
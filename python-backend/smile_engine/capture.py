@@ -0,0 +1,258 @@
+"""Janela de captura: escolha do melhor frame no servidor
+
+O quiosque envia frames durante uma janela curta; cada um é pontuado em
+paralelo (threads do servidor ou pool de workers) e só os `top_k` melhores
+ficam guardados num heap limitado. No fim, o servidor devolve o melhor frame
+já com a caixa de recorte, sem outro upload para o backend Node.
+"""
+import base64
+import heapq
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from .presence import real_face
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOP_K = 3
+MAX_TOP_K = 16
+DEFAULT_WINDOW_SECONDS = 3.0
+MAX_WINDOW_SECONDS = 30.0
+# Frames aguardando pontuação por janela; acima disso o frame é descartado
+MAX_PENDING = 8
+
+# Peso do tamanho da face e da nitidez no ranking (o score de sorriso pesa 1)
+SIZE_WEIGHT = 0.2
+SHARPNESS_WEIGHT = 0.2
+# Face com o lado igual a esta fração do menor lado do frame conta como tamanho ideal
+FACE_FILL = 0.5
+# Variância do Laplaciano em que a nitidez vale metade (~100 separa foco de borrão)
+SHARPNESS_REFERENCE = 100.0
+# Margem do recorte quadrado em volta da face (a mesma do imageProcessor.ts)
+CROP_PADDING = 1.1
+# Espera máxima pelos frames pendentes ao fechar a janela
+FINISH_TIMEOUT = 10.0
+
+
+def parse_window_params(source):
+    """(top_k, duração em segundos) a partir de `top_k` e `window_ms`; ValueError se inválidos"""
+    try:
+        top_k = int(source.get('top_k') or DEFAULT_TOP_K)
+        window_seconds = float(source.get('window_ms') or DEFAULT_WINDOW_SECONDS * 1000) / 1000
+    except (TypeError, ValueError):
+        raise ValueError("top_k and window_ms must be numbers")
+    if not 1 <= top_k <= MAX_TOP_K:
+        raise ValueError(f"top_k must be between 1 and {MAX_TOP_K}")
+    if not 0 < window_seconds <= MAX_WINDOW_SECONDS:
+        raise ValueError(f"window_ms must be between 1 and {int(MAX_WINDOW_SECONDS * 1000)}")
+    return top_k, window_seconds
+
+
+def laplacian_variance(gray):
+    """Nitidez de uma região: variância do Laplaciano (baixa = borrada)"""
+    if gray.size == 0:
+        return 0.0
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def crop_box(region, width, height, padding=CROP_PADDING):
+    """Recorte quadrado centrado na face, limitado ao frame"""
+    size = max(region['width'], region['height']) * padding
+    center_x = region['x'] + region['width'] / 2
+    center_y = region['y'] + region['height'] / 2
+    x = max(0.0, center_x - size / 2)
+    y = max(0.0, center_y - size / 2)
+    size = min(size, width - x, height - y)
+    return {"x": int(round(x)), "y": int(round(y)), "width": int(round(size)), "height": int(round(size))}
+
+
+def rank_frame(frame, result, scale=1):
+    """Candidato (dict com rank, nitidez e recorte) para um resultado com face real, ou None
+
+    `frame` é o frame analisado (reduzido se `scale` > 1); as regiões do
+    resultado já estão na escala original.
+    """
+    region = result.get('face_region')
+    if not real_face(result) or not region:
+        return None
+
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    x, y, w, h = (region[key] // scale for key in ('x', 'y', 'width', 'height'))
+    sharpness = laplacian_variance(gray[y:y+h, x:x+w])
+
+    height, width = gray.shape[0] * scale, gray.shape[1] * scale
+    size_term = min(1.0, max(region['width'], region['height']) / (FACE_FILL * min(width, height)))
+    sharpness_term = sharpness / (sharpness + SHARPNESS_REFERENCE)
+    smile_score = float(result.get('smile_score', 0.0))
+    return {
+        "rank": round(smile_score + SIZE_WEIGHT * size_term + SHARPNESS_WEIGHT * sharpness_term, 4),
+        "smile_score": smile_score,
+        "smiling": bool(result.get('smiling')),
+        "sharpness": round(sharpness, 2),
+        "face_region": region,
+        "crop_box": crop_box(region, width, height),
+    }
+
+
+class CaptureWindow:
+    """Frames de uma janela pontuados em paralelo; só os `top_k` melhores ficam na memória"""
+
+    def __init__(self, top_k=DEFAULT_TOP_K, window_seconds=DEFAULT_WINDOW_SECONDS, max_pending=MAX_PENDING):
+        self.top_k = top_k
+        self.window_seconds = window_seconds
+        self.max_pending = max_pending
+        self.deadline = time.monotonic() + window_seconds
+        self.received = 0
+        self.scored = 0
+        self.dropped = 0
+        self.without_face = 0
+        self.errors = 0
+        self.last_seen = time.monotonic()
+        self._pending = 0
+        self._heap = []
+        self._condition = threading.Condition()
+
+    @property
+    def is_open(self):
+        return time.monotonic() < self.deadline
+
+    def submit(self, executor, score, frame, payload, scale=1):
+        """Agenda a pontuação de um frame; retorna "queued", "dropped" ou "closed"
+
+        `score(frame)` roda a detecção; `payload` é (bytes, mimetype) ou, para
+        frames crus, (bytes, (largura, altura)) e só é guardado se o frame
+        entrar no top-K.
+        """
+        with self._condition:
+            self.last_seen = time.monotonic()
+            if not self.is_open:
+                return "closed"
+            index = self.received
+            self.received += 1
+            if self._pending >= self.max_pending:
+                # Mesmo backpressure do stream: frame novo não forma fila
+                self.dropped += 1
+                return "dropped"
+            self._pending += 1
+        executor.submit(self._score, score, frame, payload, scale, index)
+        return "queued"
+
+    def _score(self, score, frame, payload, scale, index):
+        candidate, failed = None, False
+        try:
+            candidate = rank_frame(frame, score(frame), scale)
+        except Exception:
+            logger.exception("Erro ao pontuar o frame %d da janela de captura", index)
+            failed = True
+        with self._condition:
+            self._pending -= 1
+            if failed:
+                self.errors += 1
+            else:
+                self.scored += 1
+            if candidate is None:
+                self.without_face += not failed
+            else:
+                candidate["frame_index"] = index
+                # (rank, índice) nunca empata, então os dicts não são comparados
+                entry = (candidate["rank"], index, candidate, payload)
+                if len(self._heap) < self.top_k:
+                    heapq.heappush(self._heap, entry)
+                else:
+                    heapq.heappushpop(self._heap, entry)
+            self._condition.notify_all()
+
+    def finish(self, timeout=None):
+        """Fecha a janela, espera os frames pendentes e devolve o resultado"""
+        with self._condition:
+            self.deadline = min(self.deadline, time.monotonic())
+            self._condition.wait_for(lambda: self._pending == 0, timeout)
+            ranked = sorted(self._heap, key=lambda entry: entry[:2], reverse=True)
+            summary = {
+                "frames": self.received,
+                "scored": self.scored,
+                "dropped": self.dropped,
+                "without_face": self.without_face,
+                "errors": self.errors,
+                "pending": self._pending,
+            }
+
+        best = None
+        if ranked:
+            _, _, candidate, payload = ranked[0]
+            best = dict(candidate, image=_data_url(*payload))
+        return dict(summary, best=best, top=[entry[2] for entry in ranked])
+
+
+def _data_url(data, kind):
+    """Frame vencedor como data URL (frames crus são codificados em JPEG só aqui)"""
+    if isinstance(kind, tuple):
+        width, height = kind
+        pixels = np.frombuffer(data, np.uint8)
+        frame = pixels.reshape(height, width, -1) if pixels.size != width * height else pixels.reshape(height, width)
+        _, encoded = cv2.imencode('.jpg', frame)
+        data, kind = encoded.tobytes(), 'image/jpeg'
+    return f"data:{kind};base64,{base64.b64encode(data).decode()}"
+
+
+class CaptureStore:
+    """Janelas de captura abertas por id, com expiração por inatividade
+
+    Os ids fechados por `pop` (o /finish) ficam lembrados por `ttl_seconds`:
+    um frame atrasado ou repetido do quiosque não abre uma janela nova com
+    o mesmo id (`get` retorna None e a API responde 409).
+    """
+
+    def __init__(self, ttl_seconds=60.0, max_windows=64, max_finished=1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_windows = max_windows
+        self.max_finished = max_finished
+        self._windows = OrderedDict()
+        # id -> momento do fechamento, em ordem de fechamento
+        self._finished = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, capture_id, create=None):
+        """Janela existente ou, com `create`, uma nova criada por `create()` (None se o id já fechou)"""
+        with self._lock:
+            self._expire()
+            window = self._windows.get(capture_id)
+            if window is None and capture_id in self._finished:
+                return None
+            if window is None and create is not None:
+                window = create()
+                while len(self._windows) >= self.max_windows:
+                    self._windows.popitem(last=False)
+                self._windows[capture_id] = window
+            return window
+
+    def pop(self, capture_id):
+        """Remove a janela e lembra o id como fechado; None se não há janela aberta"""
+        with self._lock:
+            window = self._windows.pop(capture_id, None)
+            if window is not None:
+                self._finished[capture_id] = time.monotonic()
+                while len(self._finished) > self.max_finished:
+                    self._finished.popitem(last=False)
+            return window
+
+    def is_finished(self, capture_id):
+        with self._lock:
+            self._expire()
+            return capture_id in self._finished
+
+    def _expire(self):
+        deadline = time.monotonic() - self.ttl_seconds
+        stale = [key for key, window in self._windows.items() if window.last_seen < deadline]
+        for key in stale:
+            del self._windows[key]
+        while self._finished and next(iter(self._finished.values())) < deadline:
+            self._finished.popitem(last=False)
+
+    def __len__(self):
+        return len(self._windows)
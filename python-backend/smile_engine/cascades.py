@@ -0,0 +1,64 @@
+import queue
+from contextlib import contextmanager
+
+import cv2
+
+FACE_CASCADE = 'haarcascade_frontalface_default.xml'
+FACE_CASCADE_ALT = 'haarcascade_frontalface_alt.xml'
+SMILE_CASCADE = 'haarcascade_smile.xml'
+
+
+def load_cascade(filename):
+    """Carrega um classificador Haar distribuído com o OpenCV"""
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + filename)
+    if cascade.empty():
+        raise RuntimeError(f"Não foi possível carregar o cascade {filename}")
+    return cascade
+
+
+class CascadePool:
+    """Instâncias reutilizáveis de um cascade, uma por thread em uso
+
+    `detectMultiScale` não é thread-safe; em vez de compartilhar um único
+    classificador entre as threads do servidor, cada chamada pega uma
+    instância livre (carregando outra só se todas estiverem ocupadas).
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._idle = queue.LifoQueue()
+
+    @property
+    def idle(self):
+        return self._idle.qsize()
+
+    def preload(self, count=1):
+        """Deixa `count` instâncias carregadas e livres (antes do fork, os workers as herdam)"""
+        while self._idle.qsize() < count:
+            self._idle.put(load_cascade(self.filename))
+        return self
+
+    @contextmanager
+    def acquire(self):
+        try:
+            cascade = self._idle.get_nowait()
+        except queue.Empty:
+            cascade = load_cascade(self.filename)
+        try:
+            yield cascade
+        finally:
+            self._idle.put(cascade)
+
+
+# Um pool por arquivo, compartilhado pelos módulos que usam o mesmo cascade
+_pools = {}
+
+
+def cascade_pool(filename):
+    if filename not in _pools:
+        _pools[filename] = CascadePool(filename)
+    return _pools[filename]
+
+
+def cascade_pools():
+    return dict(_pools)
@@ -0,0 +1,282 @@
+"""Classificador de sorriso treinado offline (só NumPy) sobre descritores da boca
+
+Alternativa ao engine de estratégias: em vez de cinco heurísticas com cortes
+fixos, cada face vira um descritor compacto da boca canônica (histogramas de
+LBP uniforme + orientações de gradiente no estilo HOG) e um modelo pequeno
+(regressão logística ou MLP com uma camada oculta) dá a probabilidade de
+sorriso. Todas as faces do frame são pontuadas juntas, com poucas
+multiplicações de matrizes e sem o cascade de sorriso.
+
+Arquivo do modelo (`.npz`, gerado por `train_classifier.py fit`):
+
+    meta      JSON com version, kind, descriptor, face_size e o relatório do treino
+    mean, std normalização do descritor
+    w0, b0    pesos da primeira camada (+ w1, b1 no MLP)
+
+O threshold escolhido no treino já vem embutido no último bias: a
+probabilidade cruza 0.5 exatamente nele. Por isso o engine compara sempre com
+DECISION_THRESHOLD e ignora o `threshold` da config ou da requisição, que
+deslocaria a fronteira escolhida na validação.
+
+Nenhum modelo acompanha o repositório (não há dataset rotulado nele): o
+engine só existe com um modelo treinado por `train_classifier.py`.
+"""
+import json
+import time
+import zipfile
+
+import cv2
+import numpy as np
+
+from . import metrics
+from .engine import CANONICAL_FACE_SIZE
+
+MODEL_VERSION = 1
+MODEL_KINDS = ('logistic', 'mlp')
+# Probabilidade em que o modelo decide "sorrindo" (o threshold do treino está no bias)
+DECISION_THRESHOLD = 0.5
+# Sem modelo carregado não há engine classifier: o servidor não traz um modelo pronto
+NO_MODEL_ERROR = ("Engine 'classifier' needs a trained model: none ships with the server, "
+                  "train one with train_classifier.py and start with --model")
+
+# Boca canônica (altura, largura) com 1 pixel de borda para o LBP e os gradientes
+MOUTH_SHAPE = (34, 66)
+# Células do LBP (linhas, colunas) sobre o interior 32x64 e células 8x8 do HOG
+LBP_GRID = (2, 4)
+LBP_BINS = 59
+HOG_CELL = 8
+HOG_BINS = 9
+
+DESCRIPTOR = {"mouth": list(MOUTH_SHAPE), "lbp_grid": list(LBP_GRID), "hog_cell": HOG_CELL, "hog_bins": HOG_BINS}
+DESCRIPTOR_SIZE = (
+    LBP_GRID[0] * LBP_GRID[1] * LBP_BINS
+    + ((MOUTH_SHAPE[0] - 2) // HOG_CELL) * ((MOUTH_SHAPE[1] - 2) // HOG_CELL) * HOG_BINS
+)
+
+# Vizinhos do LBP (dy, dx), um bit cada, em sentido horário
+_NEIGHBOURS = ((-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1))
+
+
+def _uniform_table():
+    """Código LBP -> bin: os 58 padrões com até 2 transições e um bin para o resto"""
+    table = np.full(256, LBP_BINS - 1, dtype=np.intp)
+    uniform = 0
+    for code in range(256):
+        bits = [(code >> i) & 1 for i in range(8)]
+        if sum(bits[i] != bits[(i + 1) % 8] for i in range(8)) <= 2:
+            table[code] = uniform
+            uniform += 1
+    return table
+
+
+_UNIFORM = _uniform_table()
+
+
+def _cell_index(height, width, cell_height, cell_width):
+    """Índice da célula de cada pixel (grade em ordem de linhas)"""
+    columns = width // cell_width
+    return (np.arange(height)[:, None] // cell_height) * columns + np.arange(width)[None, :] // cell_width
+
+
+def canonical_mouths(mouths):
+    """Recortes da boca redimensionados para MOUTH_SHAPE num único array (n, h, w)"""
+    stacked = np.empty((len(mouths),) + MOUTH_SHAPE, np.uint8)
+    for index, mouth in enumerate(mouths):
+        cv2.resize(mouth, MOUTH_SHAPE[::-1], dst=stacked[index], interpolation=cv2.INTER_AREA)
+    return stacked
+
+
+def lbp_histograms(mouths):
+    """Histogramas de LBP uniforme por célula, normalizados pela área (n, células * 59)"""
+    count, height, width = mouths.shape
+    center = mouths[:, 1:-1, 1:-1]
+    codes = np.zeros(center.shape, np.uint8)
+    for bit, (dy, dx) in enumerate(_NEIGHBOURS):
+        codes |= (mouths[:, 1 + dy:height - 1 + dy, 1 + dx:width - 1 + dx] >= center).astype(np.uint8) << bit
+
+    inner_height, inner_width = center.shape[1:]
+    cell_height, cell_width = inner_height // LBP_GRID[0], inner_width // LBP_GRID[1]
+    cells = LBP_GRID[0] * LBP_GRID[1]
+    cell = _cell_index(inner_height, inner_width, cell_height, cell_width)
+    # Um único bincount para todas as faces, células e bins
+    index = (np.arange(count)[:, None, None] * cells + cell) * LBP_BINS + _UNIFORM[codes]
+    hist = np.bincount(index.ravel(), minlength=count * cells * LBP_BINS).astype(np.float32)
+    return hist.reshape(count, -1) / (cell_height * cell_width)
+
+
+def gradient_histograms(mouths):
+    """Orientações do gradiente (0-180°) pesadas pela magnitude, por célula 8x8 com norma L2"""
+    pixels = mouths.astype(np.float32)
+    grad_x = pixels[:, 1:-1, 2:] - pixels[:, 1:-1, :-2]
+    grad_y = pixels[:, 2:, 1:-1] - pixels[:, :-2, 1:-1]
+    magnitude = np.hypot(grad_x, grad_y)
+    angle = np.arctan2(grad_y, grad_x) % np.pi
+    bins = np.minimum((angle * (HOG_BINS / np.pi)).astype(np.intp), HOG_BINS - 1)
+
+    count, height, width = magnitude.shape
+    cells = (height // HOG_CELL) * (width // HOG_CELL)
+    cell = _cell_index(height, width, HOG_CELL, HOG_CELL)
+    index = (np.arange(count)[:, None, None] * cells + cell) * HOG_BINS + bins
+    hist = np.bincount(index.ravel(), weights=magnitude.ravel(), minlength=count * cells * HOG_BINS)
+    hist = hist.reshape(count, cells, HOG_BINS)
+    hist /= np.linalg.norm(hist, axis=2, keepdims=True) + 1e-6
+    return hist.reshape(count, -1).astype(np.float32)
+
+
+def mouth_descriptors(mouths):
+    """Descritores (n, DESCRIPTOR_SIZE) de uma lista de recortes da boca em cinza"""
+    if len(mouths) == 0:
+        return np.empty((0, DESCRIPTOR_SIZE), np.float32)
+    canonical = canonical_mouths(mouths)
+    return np.hstack([lbp_histograms(canonical), gradient_histograms(canonical)])
+
+
+def _sigmoid(values):
+    # Forma com tanh: estável para logits grandes nos dois sentidos
+    return 0.5 * (1.0 + np.tanh(0.5 * values))
+
+
+class SmileClassifier:
+    """Modelo treinado: normalização + camadas [(pesos, bias), ...] com ReLU entre elas"""
+
+    def __init__(self, kind, layers, mean, std, face_size=CANONICAL_FACE_SIZE, meta=None):
+        if kind not in MODEL_KINDS:
+            raise ValueError(f"Unknown model kind: {kind!r} (available: {', '.join(MODEL_KINDS)})")
+        self.kind = kind
+        self.layers = layers
+        self.mean = mean
+        self.std = std
+        self.face_size = face_size
+        self.meta = dict(meta or {})
+
+    def logits(self, descriptors):
+        hidden = (descriptors - self.mean) / self.std
+        for weights, bias in self.layers[:-1]:
+            hidden = np.maximum(hidden @ weights + bias, 0.0)
+        weights, bias = self.layers[-1]
+        return hidden @ weights + bias
+
+    def predict(self, descriptors):
+        """Probabilidade de sorriso por linha de `descriptors`"""
+        return _sigmoid(self.logits(descriptors))
+
+    def score_faces(self, batch):
+        """Mesmo retorno de engine.score_faces: (sub_scores, combined, strong)"""
+        with metrics.stage('classifier'):
+            probabilities = self.predict(mouth_descriptors(batch.mouths))
+        return {"classifier": probabilities}, probabilities, np.zeros(len(batch), dtype=int)
+
+    def save(self, path):
+        meta = dict(self.meta, version=MODEL_VERSION, kind=self.kind, descriptor=DESCRIPTOR, face_size=self.face_size)
+        arrays = {"mean": self.mean, "std": self.std}
+        for index, (weights, bias) in enumerate(self.layers):
+            arrays[f"w{index}"] = weights
+            arrays[f"b{index}"] = np.asarray(bias)
+        # Com o arquivo aberto o NumPy não acrescenta ".npz" ao nome
+        with open(path, 'wb') as handle:
+            np.savez(handle, meta=np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Lê um arquivo de modelo; ValueError se for de outra versão ou outro descritor"""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data['meta']))
+                if meta.get('version') != MODEL_VERSION:
+                    raise ValueError(f"Unsupported model version {meta.get('version')!r} in {path} "
+                                     f"(expected {MODEL_VERSION})")
+                if meta.get('descriptor') != DESCRIPTOR:
+                    raise ValueError(f"Model {path} was trained on a different mouth descriptor")
+                depth = 2 if meta.get('kind') == 'mlp' else 1
+                layers = [(data[f"w{index}"], data[f"b{index}"]) for index in range(depth)]
+                return cls(meta.get('kind'), layers, data['mean'], data['std'], meta.get('face_size'), meta)
+        except (KeyError, zipfile.BadZipFile) as e:
+            raise ValueError(f"Invalid model file {path}: {e}")
+
+
+def train_classifier(descriptors, labels, kind='logistic', hidden=32, epochs=400,
+                     learning_rate=0.01, l2=1e-3, seed=0, log=None):
+    """Treina com Adam sobre o lote inteiro e perda logística balanceada por classe"""
+    if kind not in MODEL_KINDS:
+        raise ValueError(f"Unknown model kind: {kind!r} (available: {', '.join(MODEL_KINDS)})")
+    labels = np.asarray(labels, dtype=np.float64)
+    positives = labels.sum()
+    if positives == 0 or positives == labels.size:
+        raise ValueError("Training needs examples from both classes")
+
+    rng = np.random.default_rng(seed)
+    mean = descriptors.mean(axis=0)
+    std = descriptors.std(axis=0) + 1e-6
+    inputs = (descriptors - mean) / std
+    count, size = inputs.shape
+    # Cada classe pesa metade da perda, qualquer que seja o balanço do dataset
+    sample_weights = np.where(labels > 0, 0.5 / positives, 0.5 / (count - positives))
+
+    if kind == 'mlp':
+        params = [rng.normal(0.0, np.sqrt(2.0 / size), (size, hidden)), np.zeros(hidden),
+                  rng.normal(0.0, np.sqrt(1.0 / hidden), hidden), np.zeros(())]
+    else:
+        params = [np.zeros(size), np.zeros(())]
+    moments = [np.zeros_like(param) for param in params]
+    velocities = [np.zeros_like(param) for param in params]
+    beta1, beta2 = 0.9, 0.999
+
+    for epoch in range(1, epochs + 1):
+        if kind == 'mlp':
+            pre_activation = inputs @ params[0] + params[1]
+            activation = np.maximum(pre_activation, 0.0)
+            logits = activation @ params[2] + params[3]
+        else:
+            logits = inputs @ params[0] + params[1]
+        probabilities = _sigmoid(logits)
+        error = sample_weights * (probabilities - labels)
+
+        if kind == 'mlp':
+            back = np.outer(error, params[2]) * (pre_activation > 0)
+            grads = [inputs.T @ back + l2 * params[0], back.sum(axis=0),
+                     activation.T @ error + l2 * params[2], error.sum()]
+        else:
+            grads = [inputs.T @ error + l2 * params[0], error.sum()]
+
+        for index, grad in enumerate(grads):
+            moments[index] = beta1 * moments[index] + (1 - beta1) * grad
+            velocities[index] = beta2 * velocities[index] + (1 - beta2) * grad * grad
+            step = moments[index] / (1 - beta1 ** epoch)
+            scale = np.sqrt(velocities[index] / (1 - beta2 ** epoch)) + 1e-8
+            params[index] = params[index] - learning_rate * step / scale
+
+        if log is not None and (epoch % 100 == 0 or epoch == epochs):
+            clipped = np.clip(probabilities, 1e-7, 1 - 1e-7)
+            loss = -np.sum(sample_weights * (labels * np.log(clipped) + (1 - labels) * np.log(1 - clipped)))
+            log(f"época {epoch}: perda {loss:.4f}")
+
+    layers = [(params[0].astype(np.float32), params[1].astype(np.float32))]
+    if kind == 'mlp':
+        layers.append((params[2].astype(np.float32), params[3].astype(np.float32)))
+    return SmileClassifier(kind, layers, mean.astype(np.float32), std.astype(np.float32),
+                           meta={"trained_at": time.strftime('%Y-%m-%dT%H:%M:%S%z')})
+
+
+def set_threshold(model, threshold):
+    """Desloca o último bias para que a probabilidade cruze 0.5 em `threshold`"""
+    threshold = float(np.clip(threshold, 1e-4, 1 - 1e-4))
+    weights, bias = model.layers[-1]
+    shift = np.log(threshold / (1 - threshold))
+    model.layers[-1] = (weights, (bias - shift).astype(np.float32))
+    model.meta['trained_threshold'] = round(threshold, 4)
+    return model
+
+
+# Modelo do engine `classifier` neste processo (carregado com --model)
+_model = None
+
+
+def load_model(path):
+    """Carrega o modelo do engine `classifier` (os workers com fork o herdam)"""
+    global _model
+    _model = SmileClassifier.load(path)
+    return _model
+
+
+def current_model():
+    return _model
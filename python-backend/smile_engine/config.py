@@ -0,0 +1,52 @@
+"""Configuração calibrada do engine (pesos, cortes, boosts e threshold)
+
+Gerada por `calibrate.py sweep` e carregada pelo servidor com `--config`:
+
+    {
+      "version": 1,
+      "threshold": 0.47,
+      "strategies": {"haar": {"weight": 0.28, "params": {}}, "pixel": {...}},
+      "boost": {"2": 0.1, "3": 0.15},
+      "face_size": 160
+    }
+
+`face_size` só aparece quando as características foram extraídas com faces
+normalizadas (`calibrate.py extract --face-size`); os cortes só valem nesse tamanho.
+"""
+import json
+
+from . import engine
+from .strategies import STRATEGIES, update_strategy
+
+CONFIG_VERSION = 1
+
+
+def load_config(path):
+    with open(path) as handle:
+        config = json.load(handle)
+    if config.get('version') != CONFIG_VERSION:
+        raise ValueError(f"Unsupported config version {config.get('version')!r} in {path} (expected {CONFIG_VERSION})")
+    return config
+
+
+def apply_config(config):
+    """Aplica a config neste processo e devolve os padrões de opções correspondentes
+
+    Pesos e cortes passam a ser os padrões das estratégias registradas, e o
+    boost vale para todo o engine. O retorno ({"threshold", "strategies", "face_size"})
+    entra nos padrões do servidor; cada requisição ainda pode sobrescrevê-los.
+    """
+    strategies = config.get('strategies', {})
+    for name, values in strategies.items():
+        update_strategy(name, values.get('weight'), values.get('params'))
+    for count, value in config.get('boost', {}).items():
+        engine.BOOST[int(count)] = float(value)
+
+    defaults = {}
+    if 'threshold' in config:
+        defaults['threshold'] = float(config['threshold'])
+    if config.get('face_size'):
+        defaults['face_size'] = int(config['face_size'])
+    if strategies:
+        defaults['strategies'] = [(name, STRATEGIES[name].weight) for name in strategies]
+    return defaults
@@ -0,0 +1,324 @@
+import logging
+
+import cv2
+import numpy as np
+
+from . import metrics
+from .cascades import FACE_CASCADE, cascade_pool
+from .classifier import NO_MODEL_ERROR, current_model
+from .engine import FaceBatch, score_faces
+from .face_detection import DEFAULT_FACE_PARAMS, detect_faces, scale_face_params
+from .memory import buffers
+from .options import decision_threshold
+from .presence import next_poll, poll_state
+from .strategies import parse_strategies
+
+logger = logging.getLogger(__name__)
+
+face_cascades = cascade_pool(FACE_CASCADE)
+
+# Características mostradas em `details` (quando chegaram a ser calculadas)
+DETAIL_FIELDS = ('mean_brightness', 'brightness_variance', 'brightness_std', 'iqr', 'gradient_mean', 'gradient_std')
+
+
+class ImprovedSmileDetector:
+    def __init__(self, model=None):
+        # Com um modelo treinado (engine `classifier`) ele substitui as estratégias
+        self.model = model
+
+    def detect_smile(self, frame, threshold=0.5, session=None, multi_face=False, face_params=None,
+                     strategies=None, short_circuit=False, verbosity='full', face_size=None,
+                     presence=False): # Threshold mais rigoroso
+        logger.debug("Processing frame: %s", frame.shape)
+        args = (threshold, session, multi_face, face_params, strategies, short_circuit, verbosity,
+                face_size, presence)
+        # Frames em escala de cinza já chegam com um único canal; os coloridos são
+        # convertidos num buffer do pool, devolvido quando a resposta está pronta
+        if frame.ndim == 2:
+            return self._detect_gray(frame, *args)
+        with metrics.stage('grayscale'):
+            base, gray = buffers.checkout(frame.shape[:2])
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+        try:
+            return self._detect_gray(gray, *args)
+        finally:
+            buffers.checkin(base)
+
+    def _detect_gray(self, gray, threshold, session, multi_face, face_params, strategies, short_circuit,
+                     verbosity, face_size, presence):
+        if presence and session is not None:
+            # Cabine parada e ninguém rastreado: nem passa pelo detectMultiScale
+            with metrics.stage('presence'):
+                session.presence.update(gray)
+            if not session.presence.should_detect(bool(session.tracker.boxes)):
+                session.smoother.reset()
+                response = {
+                    "face_detected": False,
+                    "smiling": False,
+                    "confidence": 0.0,
+                    "smile_score": 0.0,
+                    "threshold": threshold,
+                    "presence": session.presence.state(skipped=True),
+                }
+                if verbosity != 'minimal':
+                    response["details"] = "No presence detected"
+                return response
+
+        # Parâmetros otimizados para detecção de faces
+        face_params = face_params or DEFAULT_FACE_PARAMS
+        with metrics.stage('face_detect'), face_cascades.acquire() as face_cascade:
+            if session is not None:
+                # Com sessão, o frame inteiro só é varrido periodicamente
+                faces, tracking_mode = session.tracker.detect(gray, face_cascade, **face_params)
+            else:
+                # Detecção numa cópia reduzida; a boca é analisada no frame original
+                faces = detect_faces(gray, face_cascade, **face_params)
+                tracking_mode = 'full'
+        metrics.observe('faces_per_frame', len(faces))
+        logger.debug("Faces detected: %d (%s) %s", len(faces), tracking_mode, faces)
+
+        results = []
+        
+        if len(faces) == 0:
+            # Fallback: detectar qualquer região com características de rosto
+            # Usar uma região central da imagem como "face" para teste
+            h, w = gray.shape
+            center_x, center_y = w // 2, h // 2
+            face_size = min(w, h) // 3
+            
+            # Criar uma face simulada no centro da imagem
+            simulated_face = (center_x - face_size//2, center_y - face_size//2, face_size, face_size)
+            faces = [simulated_face]
+            logger.debug("Using simulated face: %s", simulated_face)
+            if session is not None:
+                session.smoother.reset()
+            
+            simulated_result = {
+                "face_detected": True,
+                "smiling": False,  # Não simular sorriso - usar detecção real
+                "confidence": 0.5,
+                "smile_score": 0.0,
+                "threshold": 0.5,
+                "simulated": True,
+                "details": "Simulated face - no smile detection",
+                "face_region": {
+                    "x": int(simulated_face[0]),
+                    "y": int(simulated_face[1]), 
+                    "width": int(simulated_face[2]),
+                    "height": int(simulated_face[3])
+                }
+            }
+            if verbosity == 'minimal':
+                del simulated_result["details"]
+            if multi_face:
+                # Face simulada não conta como pessoa no modo de grupo
+                simulated_result.update(faces=[], face_count=0, smiling_count=0, all_smiling=False)
+            return simulated_result
+
+        if self.model is not None:
+            # Modelo treinado: todas as faces de uma vez, na face canônica do treino
+            batch = FaceBatch(gray, faces, self.model.face_size)
+            sub_scores, combined_scores, strong_counts = self.model.score_faces(batch)
+        else:
+            # Características calculadas sob demanda, estratégias da mais barata à mais cara
+            selection = parse_strategies(strategies)
+            batch = FaceBatch(gray, faces, face_size)
+            sub_scores, combined_scores, strong_counts = score_faces(batch, selection, threshold, short_circuit)
+
+        for index, (x, y, w, h) in enumerate(batch.boxes):
+            combined_score = combined_scores[index]
+            is_smiling = combined_score > threshold
+
+            result = {
+                "boundingBox": {"x": int(x), "y": int(y), "width": int(w), "height": int(h)},
+                "score": 1.0, # Assume 1.0 if face detected
+                "smileScore": float(combined_score),
+                "smiling": bool(is_smiling),
+            }
+            if verbosity != 'minimal':
+                # Diagnóstico só é montado quando o cliente pede por ele
+                result["details"] = self._details(batch, index, sub_scores, combined_scores,
+                                                  strong_counts, threshold, verbosity, self.model)
+            results.append(result)
+        # Daqui em diante o lote não é usado: as faces normalizadas voltam ao pool
+        # (se algo falhar antes, os buffers ficam para o coletor de lixo)
+        batch.close()
+        
+        if results:
+            best_result = max(results, key=lambda r: r['smileScore'])
+            response = {
+                "face_detected": True,
+                "smiling": bool(best_result['smiling']),
+                "confidence": float(best_result['score']),
+                "smile_score": float(best_result['smileScore']),
+                "threshold": float(threshold),
+                "tracking_mode": tracking_mode,
+                "face_region": {
+                    "x": int(best_result['boundingBox']['x']),
+                    "y": int(best_result['boundingBox']['y']),
+                    "width": int(best_result['boundingBox']['width']),
+                    "height": int(best_result['boundingBox']['height'])
+                }
+            }
+            if 'details' in best_result:
+                response["details"] = best_result['details']
+            if multi_face:
+                response["faces"] = [
+                    dict({
+                        "face_region": result['boundingBox'],
+                        "smiling": result['smiling'],
+                        "smile_score": result['smileScore'],
+                    }, **({"details": result['details']} if 'details' in result else {}))
+                    for result in results
+                ]
+                response["face_count"] = len(results)
+                response["smiling_count"] = sum(result['smiling'] for result in results)
+                # Gatilho da foto em grupo: todo mundo sorrindo ao mesmo tempo
+                response["all_smiling"] = response["smiling_count"] == len(results)
+            if session is not None:
+                response["temporal"] = session.smoother.update(best_result['smileScore'], threshold)
+            return response
+        else:
+            if session is not None:
+                session.smoother.reset()
+            response = {
+                "face_detected": False,
+                "smiling": False,
+                "confidence": 0.0,
+                "smile_score": 0.0,
+                "threshold": threshold,
+            }
+            if verbosity != 'minimal':
+                response["details"] = "No face detected"
+            return response
+
+    @staticmethod
+    def _details(batch, index, sub_scores, combined_scores, strong_counts, threshold, verbosity, model=None):
+        """Bloco `details` de uma face: scores por estratégia e, em "full", as características"""
+        full = verbosity == 'full'
+        details = {}
+        if full:
+            details["method"] = f"Trained {model.kind} classifier" if model else "Advanced multi-method detection"
+        skipped = []
+        for name, scores in sub_scores.items():
+            score = scores[index]
+            if np.isnan(score):
+                skipped.append(name)
+            details[f"{name}_score"] = None if np.isnan(score) else float(score)
+        details["combined_score"] = float(combined_scores[index])
+        if full:
+            x, y, w, h = batch.boxes[index]
+            mouth = batch.mouths[index]
+            details.update({
+                "threshold": float(threshold),
+                "face_size": f"{int(w)}x{int(h)}",
+                "mouth_region_size": f"{int(mouth.shape[1])}x{int(mouth.shape[0])}",
+            })
+            # Só aparecem as características que as estratégias chegaram a calcular
+            for field in DETAIL_FIELDS:
+                values = batch.computed(field)
+                if values is not None and not np.isnan(values[index]):
+                    details[field] = f"{values[index]:.2f}"
+            contour_counts = batch.computed('contour_count')
+            if contour_counts is not None and not np.isnan(contour_counts[index]):
+                details["contour_count"] = int(contour_counts[index])
+        details["strong_indicators"] = int(strong_counts[index])
+        if skipped:
+            # Decisão tomada antes das estratégias caras (short-circuit)
+            details["skipped_strategies"] = skipped
+        return details
+
+
+# Detectores legados são criados só quando algum cliente pede por eles
+_detectors = {}
+
+
+def get_detector(engine='improved'):
+    if engine not in _detectors:
+        if engine == 'improved':
+            _detectors[engine] = ImprovedSmileDetector()
+        elif engine == 'multi_method':
+            from .legacy import MultiMethodSmileDetector
+            _detectors[engine] = MultiMethodSmileDetector()
+        elif engine == 'simple':
+            from .legacy import SimpleSmileDetector
+            _detectors[engine] = SimpleSmileDetector()
+        elif engine != 'classifier':
+            raise ValueError(f"Unknown engine: {engine!r}")
+    if engine == 'classifier':
+        # Segue o modelo carregado no momento (load_model pode trocá-lo)
+        model = current_model()
+        if model is None:
+            raise ValueError(NO_MODEL_ERROR)
+        if engine not in _detectors or _detectors[engine].model is not model:
+            _detectors[engine] = ImprovedSmileDetector(model)
+    return _detectors[engine]
+
+
+def run_engine(frame, options, session=None):
+    """Roda o engine pedido nas opções da requisição (ver options.parse_detection_options)
+
+    Os detectores legados só fazem detecção quadro a quadro da primeira face e
+    ignoram sessão, modo multi-face, parâmetros de face e estratégias.
+
+    Com `face_size` cada face é pontuada no tamanho canônico (ver FaceBatch).
+    Com `presence` a detecção é pulada sem movimento na sessão e a resposta
+    traz `next_poll` (ver presence.py); os detectores legados não pulam
+    frames, mas atualizam o fundo da sessão para o `next_poll` acompanhar a cena.
+    Com `decode_scale` > 1 o frame já chega reduzido: os tamanhos mínimos de
+    face são convertidos para essa escala e as regiões da resposta voltam
+    para a escala original (os `details` descrevem o frame analisado).
+    """
+    engine = options.get('engine', 'improved')
+    detector = get_detector(engine)
+    verbosity = options.get('verbosity', 'full')
+    scale = options.get('decode_scale', 1)
+    if engine in ('multi_method', 'simple') and options.get('presence') and session is not None:
+        with metrics.stage('presence'):
+            session.presence.update(frame)
+    # O engine `classifier` é o improved com o modelo treinado no lugar das estratégias
+    if engine == 'multi_method':
+        result = _trim_details(detector.detect_smile_improved(frame), verbosity)
+    elif engine == 'simple':
+        result = _trim_details(detector.detect_smile_simple(frame), verbosity)
+    else:
+        result = detector.detect_smile(
+            frame, decision_threshold(options), session, options['multi_face'],
+            scale_face_params(options['face_params'], scale),
+            options['strategies'], options['short_circuit'], verbosity, options.get('face_size'),
+            options.get('presence', False)
+        )
+    if options.get('presence'):
+        result = with_presence(result, session)
+    return _scale_regions(result, scale) if scale > 1 else result
+
+
+def with_presence(result, session=None):
+    """Acrescenta `presence` (com sessão) e o ritmo sugerido `next_poll` ao resultado"""
+    present = None
+    if session is not None:
+        result.setdefault('presence', session.presence.state())
+        present = result['presence']['present']
+    result['next_poll'] = next_poll(poll_state(result, present))
+    return result
+
+
+def _scale_regions(result, scale):
+    """Leva `face_region` (e as regiões de `faces`) de volta à escala do frame original"""
+    def scaled(region):
+        return {key: int(value) * scale for key, value in region.items()}
+
+    if result.get('face_region'):
+        result['face_region'] = scaled(result['face_region'])
+    for face in result.get('faces') or ():
+        face['face_region'] = scaled(face['face_region'])
+    return result
+
+
+def _trim_details(result, verbosity):
+    """Aplica `verbosity` à resposta de um detector legado (que calcula tudo de qualquer forma)"""
+    if verbosity == 'minimal':
+        result.pop('details', None)
+    elif verbosity == 'scores' and isinstance(result.get('details'), dict):
+        result['details'] = {key: value for key, value in result['details'].items() if key.endswith('_score')}
+    return result
@@ -0,0 +1,202 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from . import metrics
+from .cascades import SMILE_CASCADE, cascade_pool
+from .memory import buffers
+from .mouth_features import FEATURE_GROUP_OF, FEATURE_GROUPS, mouth_region
+
+smile_cascades = cascade_pool(SMILE_CASCADE)
+
+# Tamanho canônico da face (`face_size`): lado sugerido e limites aceitos
+CANONICAL_FACE_SIZE = 160
+# (abaixo de 64 a faixa da boca fica menor que o minSize 30x30 do cascade)
+FACE_SIZE_RANGE = (64, 512)
+# Na face canônica o cascade de sorriso só varre a metade de baixo (a boca fica em 60-90%)
+SMILE_BAND_TOP = 0.5
+
+
+def _create_face_pool():
+    return ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1))
+
+
+# Pool para analisar várias faces do mesmo frame em paralelo (OpenCV libera o GIL)
+face_pool = _create_face_pool()
+
+
+def _reset_face_pool():
+    # Threads não sobrevivem ao fork: workers de detecção recriam o pool
+    global face_pool
+    face_pool = _create_face_pool()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_face_pool)
+
+
+def haar_stats(face_roi):
+    """Número de sorrisos que o Haar Cascade encontra na face"""
+    with smile_cascades.acquire() as cascade:
+        smiles = cascade.detectMultiScale(face_roi, scaleFactor=1.3, minNeighbors=15, minSize=(30, 30))
+    return (float(len(smiles)),)
+
+
+# Características calculadas sobre a face inteira (as demais usam a boca)
+FACE_GROUPS = {
+    'haar': (haar_stats, ('smile_detected',)),
+}
+
+GROUP_OF = dict(FEATURE_GROUP_OF, smile_detected='haar')
+
+
+def normalize_face(face_roi, face_size, dst=None):
+    """Face redimensionada para face_size x face_size (INTER_AREA ao reduzir)"""
+    interpolation = cv2.INTER_AREA if face_roi.shape[0] > face_size else cv2.INTER_LINEAR
+    return cv2.resize(face_roi, (face_size, face_size), dst=dst, interpolation=interpolation)
+
+
+class FaceBatch:
+    """Faces de um frame com características calculadas sob demanda e em cache
+
+    Faces cuja região da boca fica vazia são descartadas. Cada grupo de
+    características só é calculado para as faces que uma estratégia pedir,
+    em paralelo quando há mais de uma face.
+
+    Com `face_size` cada face é levada ao tamanho canônico antes de pontuar:
+    o custo por face deixa de depender da distância até a câmera, os cortes
+    valem igual para faces grandes e pequenas e o cascade de sorriso só
+    varre a faixa inferior da face. `boxes` continua em pixels do frame.
+    As faces normalizadas ocupam buffers do pool (memory.buffers), devolvidos
+    por `close()` ou no fim de um bloco `with`.
+    """
+
+    def __init__(self, gray, boxes, face_size=None):
+        self._buffers = []
+        self.boxes = []
+        # Região onde o cascade de sorriso procura (a face ou a faixa inferior da canônica)
+        self.face_rois = []
+        self.mouths = []
+        for box in boxes:
+            x, y, w, h = (int(v) for v in box)
+            face_roi = gray[y:y+h, x:x+w]
+            if face_size and face_roi.size:
+                base, canonical = buffers.checkout((face_size, face_size))
+                self._buffers.append(base)
+                face_roi = normalize_face(face_roi, face_size, canonical)
+            mouth = mouth_region(face_roi)
+            if mouth.size == 0:
+                continue
+            self.boxes.append((x, y, w, h))
+            self.face_rois.append(face_roi[int(face_size * SMILE_BAND_TOP):] if face_size else face_roi)
+            self.mouths.append(mouth)
+        self._values = {}
+        self._computed = {}
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Devolve os buffers das faces normalizadas; o lote não pode mais ser usado"""
+        buffers_used, self._buffers = self._buffers, []
+        for base in buffers_used:
+            buffers.checkin(base)
+
+    def columns(self, fields, indices):
+        """Valores das características pedidas para as faces em `indices`"""
+        for group in {GROUP_OF[field] for field in fields}:
+            self._compute(group, indices)
+        if len(indices) == 0:
+            return {field: np.empty(0) for field in fields}
+        return {field: self._values[field][indices] for field in fields}
+
+    def computed(self, field):
+        """Valores de uma característica (NaN onde não foi calculada) ou None"""
+        return self._values.get(field)
+
+    def _compute(self, group, indices):
+        done = self._computed.setdefault(group, np.zeros(len(self), dtype=bool))
+        missing = [int(i) for i in indices if not done[i]]
+        if not missing:
+            return
+
+        if group in FACE_GROUPS:
+            func, names = FACE_GROUPS[group]
+            sources = self.face_rois
+            stage = 'smile_cascade'
+        else:
+            func, names = FEATURE_GROUPS[group]
+            sources = self.mouths
+            stage = f'features_{group}'
+
+        with metrics.stage(stage):
+            if len(missing) > 1:
+                rows = list(face_pool.map(lambda i: func(sources[i]), missing))
+            else:
+                rows = [func(sources[missing[0]])]
+
+        for name, column in zip(names, np.asarray(rows, dtype=np.float64).T):
+            values = self._values.setdefault(name, np.full(len(self), np.nan))
+            values[missing] = column
+        done[missing] = True
+
+
+# Boost por número de indicadores fortes (recalibrável, ver config.py)
+BOOST = {2: 0.1, 3: 0.15}
+
+
+def strong_indicator_boost(strong):
+    """Boost apenas se múltiplos indicadores fortes estão presentes"""
+    return np.where(strong >= 3, BOOST[3], np.where(strong >= 2, BOOST[2], 0.0))
+
+
+def score_faces(batch, selection, threshold, short_circuit=False):
+    """Pontua todas as faces do lote com as estratégias escolhidas
+
+    `selection` é a lista [(estratégia, peso), ...] de `parse_strategies`.
+    As estratégias rodam da mais barata para a mais cara; com
+    `short_circuit`, uma face sai do lote assim que nenhum resultado das
+    estratégias restantes pode mudar a decisão (o score final dela passa a
+    ser um limite inferior). Retorna (sub_scores, combined, strong), com
+    NaN nos sub-scores que não foram calculados.
+    """
+    count = len(batch)
+    total_weight = float(sum(weight for _, weight in selection))
+    ordered = sorted(selection, key=lambda item: item[0].cost)
+
+    sub_scores = {strategy.name: np.full(count, np.nan) for strategy, _ in selection}
+    partial = np.zeros(count)
+    strong = np.zeros(count, dtype=int)
+    remaining_weight = 1.0
+    remaining = len(ordered)
+    pending = np.arange(count)
+
+    for strategy, weight in ordered:
+        if pending.size == 0:
+            break
+        columns = batch.columns(strategy.fields, pending)
+        with metrics.stage(f'score_{strategy.name}'):
+            scores = np.broadcast_to(np.asarray(strategy.score(columns, strategy.params), dtype=np.float64), pending.shape)
+
+        sub_scores[strategy.name][pending] = scores
+        partial[pending] += scores * (weight / total_weight)
+        strong[pending] += scores > strategy.strong_above
+        remaining_weight -= weight / total_weight
+        remaining -= 1
+
+        if short_circuit and remaining:
+            # Limites do score final: restantes todas 0 ou todas 1 (e fortes)
+            low = partial[pending] + strong_indicator_boost(strong[pending])
+            high = partial[pending] + remaining_weight + strong_indicator_boost(strong[pending] + remaining)
+            pending = pending[(low <= threshold) & (high > threshold)]
+
+    combined = np.clip(partial + strong_indicator_boost(strong), 0.0, 1.0)
+    return sub_scores, combined, strong
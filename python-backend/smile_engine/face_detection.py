@@ -0,0 +1,96 @@
+import cv2
+import numpy as np
+
+# Parâmetros padrão do detectMultiScale de faces (tamanhos em pixels do frame original)
+DEFAULT_FACE_PARAMS = {
+    "scaleFactor": 1.1,
+    "minNeighbors": 5,
+    "minSize": (30, 30),
+    # Menor face esperada; se definida, a detecção roda numa cópia reduzida
+    "min_face_size": None,
+}
+
+# Lado (em pixels da cópia reduzida) que a menor face esperada passa a ocupar
+DETECTION_WINDOW = 30
+
+# Nome aceito na API (JSON, query string, opções do stream) -> parâmetro interno
+_REQUEST_FIELDS = {
+    "scale_factor": "scaleFactor",
+    "min_neighbors": "minNeighbors",
+    "min_size": "minSize",
+    "min_face_size": "min_face_size",
+}
+
+
+def parse_face_params(source, defaults=None):
+    """Lê parâmetros de detecção de um dict da requisição, validando os valores
+
+    `source` pode ser o JSON, `request.args` ou as opções do stream. Lança
+    ValueError com uma mensagem para o cliente se algum valor for inválido.
+    """
+    params = dict(defaults or DEFAULT_FACE_PARAMS)
+    for field, name in _REQUEST_FIELDS.items():
+        value = source.get(field)
+        if value is None or value == '':
+            continue
+        try:
+            if name == "scaleFactor":
+                value = float(value)
+                if value <= 1.0:
+                    raise ValueError
+            elif name == "minNeighbors":
+                value = int(value)
+                if value < 0:
+                    raise ValueError
+            else:
+                value = int(value)
+                if value <= 0:
+                    raise ValueError
+                if name == "minSize":
+                    value = (value, value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid value for {field}: {source.get(field)!r}")
+        params[name] = value
+    return params
+
+
+def scale_face_params(params, scale):
+    """Tamanhos (em pixels do frame original) convertidos para um frame decodificado em 1/scale"""
+    if scale == 1:
+        return params
+    params = dict(params)
+    params['minSize'] = tuple(max(1, side // scale) for side in params['minSize'])
+    if params.get('maxSize'):
+        params['maxSize'] = tuple(side // scale for side in params['maxSize'])
+    if params.get('min_face_size'):
+        params['min_face_size'] = max(1, params['min_face_size'] // scale)
+    return params
+
+
+def detect_faces(gray, cascade, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30),
+                 maxSize=None, min_face_size=None):
+    """detectMultiScale com redução prévia da imagem; caixas voltam na escala original
+
+    A escala é escolhida para que a menor face procurada (o maior entre
+    `minSize` e `min_face_size`) ocupe DETECTION_WINDOW pixels na cópia
+    reduzida. Sem `min_face_size` a detecção roda na resolução original.
+    """
+    min_side = max(max(minSize), min_face_size or 0)
+    scale = min(1.0, DETECTION_WINDOW / float(min_side)) if min_face_size else 1.0
+
+    if scale < 1.0:
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        small_min = max(1, int(min_side * scale))
+        small_max = (int(maxSize[0] * scale), int(maxSize[1] * scale)) if maxSize else (0, 0)
+        faces = cascade.detectMultiScale(
+            small, scaleFactor=scaleFactor, minNeighbors=minNeighbors,
+            minSize=(small_min, small_min), maxSize=small_max
+        )
+        if len(faces) == 0:
+            return faces
+        return np.round(np.asarray(faces) / scale).astype(int)
+
+    return cascade.detectMultiScale(
+        gray, scaleFactor=scaleFactor, minNeighbors=minNeighbors,
+        minSize=minSize, maxSize=maxSize or (0, 0)
+    )
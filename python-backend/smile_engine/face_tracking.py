@@ -0,0 +1,89 @@
+from .face_detection import detect_faces
+
+
+class FaceTracker:
+    """Rastreamento temporal de faces entre frames consecutivos de uma sessão
+
+    A detecção completa (frame inteiro) só roda a cada `redetect_interval`
+    frames ou quando alguma face rastreada é perdida. Nos frames
+    intermediários o cascade procura apenas numa janela com margem ao redor
+    de cada face conhecida, numa faixa estreita de escalas.
+    """
+
+    def __init__(self, redetect_interval=10, roi_padding=0.4, scale_tolerance=1.3):
+        self.redetect_interval = redetect_interval
+        self.roi_padding = roi_padding
+        self.scale_tolerance = scale_tolerance
+        self.boxes = []
+        self.frames_since_full = 0
+        self.full_detections = 0
+        self.roi_detections = 0
+
+    def reset(self):
+        self.boxes = []
+        self.frames_since_full = 0
+
+    def repeat(self, boxes):
+        """Conta um frame respondido pelo cache, sem rodar o cascade
+
+        As faces rastreadas continuam valendo; sem nenhuma, adota `boxes`
+        (as da resposta reaproveitada) para o próximo frame seguir por ROI.
+        """
+        if not self.boxes:
+            self.boxes = [tuple(int(v) for v in box) for box in boxes]
+        self.frames_since_full += 1
+
+    def detect(self, gray, cascade, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30), min_face_size=None):
+        """Retorna (faces, modo) onde modo é 'full' ou 'roi'"""
+        if self.boxes and self.frames_since_full < self.redetect_interval:
+            tracked = self._detect_in_rois(gray, cascade, scaleFactor, minNeighbors, bool(min_face_size))
+            if tracked is not None:
+                self.boxes = tracked
+                self.frames_since_full += 1
+                self.roi_detections += 1
+                return tracked, 'roi'
+
+        faces = detect_faces(
+            gray, cascade, scaleFactor=scaleFactor, minNeighbors=minNeighbors,
+            minSize=minSize, min_face_size=min_face_size
+        )
+        self.boxes = [tuple(int(v) for v in face) for face in faces]
+        self.frames_since_full = 0
+        self.full_detections += 1
+        return self.boxes, 'full'
+
+    def _detect_in_rois(self, gray, cascade, scaleFactor, minNeighbors, downscale):
+        """Procura cada face rastreada na sua janela; None se alguma se perdeu"""
+        frame_h, frame_w = gray.shape[:2]
+        tracked = []
+
+        for (x, y, w, h) in self.boxes:
+            pad_x = int(w * self.roi_padding)
+            pad_y = int(h * self.roi_padding)
+            x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+            x1, y1 = min(frame_w, x + w + pad_x), min(frame_h, y + h + pad_y)
+
+            min_side = int(min(w, h) / self.scale_tolerance)
+            max_side = int(max(w, h) * self.scale_tolerance)
+            candidates = detect_faces(
+                gray[y0:y1, x0:x1],
+                cascade,
+                scaleFactor=scaleFactor,
+                minNeighbors=minNeighbors,
+                minSize=(min_side, min_side),
+                maxSize=(max_side, max_side),
+                # No modo reduzido a janela também é reduzida até o tamanho da face
+                min_face_size=min_side if downscale else None
+            )
+            if len(candidates) == 0:
+                return None
+
+            # Ficar com o candidato mais próximo do centro anterior
+            center_x, center_y = x + w / 2 - x0, y + h / 2 - y0
+            cx, cy, cw, ch = min(
+                candidates,
+                key=lambda c: (c[0] + c[2] / 2 - center_x) ** 2 + (c[1] + c[3] / 2 - center_y) ** 2
+            )
+            tracked.append((int(cx) + x0, int(cy) + y0, int(cw), int(ch)))
+
+        return tracked
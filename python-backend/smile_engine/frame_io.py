@@ -0,0 +1,194 @@
+import base64
+
+import cv2
+import numpy as np
+
+# Limite de segurança para o corpo de um frame (16 MB cobre PNG 4K)
+MAX_FRAME_BYTES = 16 * 1024 * 1024
+# Limites de /api/detect-smile/batch
+MAX_BATCH_FRAMES = 64
+MAX_BATCH_BYTES = 64 * 1024 * 1024
+
+ENCODED_CONTENT_TYPES = ('image/jpeg', 'image/png')
+RAW_CONTENT_TYPE = 'application/octet-stream'
+
+# Fatores de redução na decodificação (`decode_scale`) -> flag do imdecode
+DECODE_SCALES = (1, 2, 4)
+_GRAY_FLAGS = {1: cv2.IMREAD_GRAYSCALE, 2: cv2.IMREAD_REDUCED_GRAYSCALE_2, 4: cv2.IMREAD_REDUCED_GRAYSCALE_4}
+_COLOR_FLAGS = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4}
+
+PNG_SIGNATURE = b'\x89PNG'
+
+
+class FrameDecodeError(ValueError):
+    """Frame inválido ou impossível de decodificar (vira HTTP 400 na API)"""
+
+
+def read_stream_into_buffer(stream, length, max_bytes=MAX_FRAME_BYTES):
+    """Lê exatamente `length` bytes do stream direto para um buffer NumPy"""
+    if not length:
+        raise FrameDecodeError("Missing Content-Length")
+    if length > max_bytes:
+        raise FrameDecodeError(f"Frame too large ({length} bytes)")
+
+    buffer = np.empty(length, dtype=np.uint8)
+    view = memoryview(buffer)
+    received = 0
+    while received < length:
+        count = stream.readinto(view[received:])
+        if not count:
+            break
+        received += count
+
+    if received != length:
+        raise FrameDecodeError(f"Incomplete frame body ({received}/{length} bytes)")
+    return buffer
+
+
+def decode_encoded_frame(buffer, color=False, scale=1):
+    """Decodifica JPEG/PNG de um buffer uint8 direto para cinza (ou BGR, com `color`)
+
+    O detector só usa cinza, então o frame colorido só é montado para quem
+    pede recortes. Com `scale` 2 ou 4 o OpenCV já decodifica em 1/2 ou 1/4
+    da resolução (no JPEG, sem nem montar a imagem inteira). PNG com canal
+    alfa é achatado aqui mesmo.
+    """
+    if buffer.size == 0:
+        # O imdecode falha numa asserção (cv2.error) com buffer vazio
+        raise FrameDecodeError("Empty frame")
+    # PNG em cinza direto da libpng arredonda para baixo (~0.5 de viés no brilho);
+    # via BGR + cvtColor os scores ficam iguais aos do JPEG e não custa mais
+    png = not color and buffer[:4].tobytes() == PNG_SIGNATURE
+    image = cv2.imdecode(buffer, (_COLOR_FLAGS if color or png else _GRAY_FLAGS)[scale])
+    if image is None:
+        raise FrameDecodeError("Could not decode image")
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if png else image
+
+
+def read_image(path, color=False, scale=1):
+    """Lê um arquivo de imagem como `decode_encoded_frame` (None se não der para ler)"""
+    try:
+        return decode_encoded_frame(np.fromfile(path, np.uint8), color, scale)
+    except (OSError, FrameDecodeError):
+        return None
+
+
+def decode_raw_frame(buffer, width, height, scale=1):
+    """Interpreta bytes crus como frame BGR (3 canais) ou cinza (1 canal), sem cópia
+
+    Com `scale` > 1 o frame é reduzido (INTER_AREA), como na decodificação reduzida.
+    """
+    pixels = width * height
+    if width <= 0 or height <= 0:
+        raise FrameDecodeError("Invalid frame dimensions")
+    if buffer.size == pixels:
+        frame = buffer.reshape(height, width)
+    elif buffer.size == pixels * 3:
+        frame = buffer.reshape(height, width, 3)
+    else:
+        raise FrameDecodeError(
+            f"Raw frame size {buffer.size} does not match {width}x{height} gray or BGR"
+        )
+    return reduce_frame(frame, scale)
+
+
+def reduce_frame(frame, scale):
+    """Frame já decodificado reduzido para 1/`scale` (INTER_AREA); FrameDecodeError se sumir"""
+    if scale <= 1:
+        return frame
+    height, width = frame.shape[:2]
+    if width < scale or height < scale:
+        raise FrameDecodeError(f"Frame {width}x{height} is too small for decode_scale {scale}")
+    return cv2.resize(frame, (width // scale, height // scale), interpolation=cv2.INTER_AREA)
+
+
+def decode_data_url(data_url, color=False, scale=1):
+    """Decodifica o formato legado `data:image/jpeg;base64,...` enviado em JSON"""
+    encoded = data_url.split(',', 1)[-1]
+    try:
+        image_bytes = base64.b64decode(encoded)
+    except ValueError:
+        raise FrameDecodeError("Invalid base64 image data")
+    return decode_encoded_frame(np.frombuffer(image_bytes, np.uint8), color, scale)
+
+
+def read_request_body(request):
+    """Corpo de uma requisição de frame único, ainda codificado
+
+    Aceita `image/jpeg`, `image/png` ou `application/octet-stream` com os
+    cabeçalhos `X-Frame-Width` e `X-Frame-Height` (BGR ou cinza cru).
+    """
+    content_type = request.mimetype
+    if content_type not in ENCODED_CONTENT_TYPES and content_type != RAW_CONTENT_TYPE:
+        raise FrameDecodeError(f"Unsupported content type: {content_type or 'none'}")
+    return read_stream_into_buffer(request.stream, request.content_length)
+
+
+def decode_request_body(buffer, request, color=False, scale=1):
+    """Decodifica um corpo lido por `read_request_body` conforme o Content-Type"""
+    if request.mimetype in ENCODED_CONTENT_TYPES:
+        return decode_encoded_frame(buffer, color, scale)
+    width, height = _raw_frame_size(request.headers)
+    return decode_raw_frame(buffer, width, height, scale)
+
+
+def read_request_frame(request, color=False, scale=1):
+    """Lê e decodifica o frame binário de uma requisição Flask (ver read_request_body)"""
+    return decode_request_body(read_request_body(request), request, color, scale)
+
+
+def payload_kind(buffer, request):
+    """Como devolver um frame recebido: mimetype do JPEG/PNG ou (largura, altura) se cru"""
+    if request.mimetype == RAW_CONTENT_TYPE:
+        return _raw_frame_size(request.headers)
+    return 'image/png' if buffer[:4].tobytes() == PNG_SIGNATURE else 'image/jpeg'
+
+
+def _raw_frame_size(headers):
+    """(largura, altura) dos cabeçalhos X-Frame-Width/X-Frame-Height"""
+    try:
+        return int(headers['X-Frame-Width']), int(headers['X-Frame-Height'])
+    except (KeyError, ValueError):
+        raise FrameDecodeError("Raw frames require X-Frame-Width and X-Frame-Height headers")
+
+
+def read_request_batch(request, color=False, scale=1):
+    """Lê os frames (ainda codificados) de uma requisição de lote
+
+    Aceita `multipart/form-data` com um arquivo por frame (na ordem do
+    corpo) ou os frames concatenados num corpo binário com o índice no
+    cabeçalho `X-Frame-Lengths` (tamanhos em bytes separados por vírgula).
+    Retorna (buffers, decode), onde `decode(buffer)` gera o frame; os
+    buffers do corpo concatenado são fatias do mesmo array, sem cópia.
+    """
+    content_type = request.mimetype
+    if content_type == 'multipart/form-data':
+        buffers = [np.frombuffer(upload.read(), np.uint8) for _, upload in request.files.items(multi=True)]
+        decode = lambda buffer: decode_encoded_frame(buffer, color, scale)
+    elif content_type in ENCODED_CONTENT_TYPES or content_type == RAW_CONTENT_TYPE:
+        try:
+            lengths = [int(value) for value in request.headers['X-Frame-Lengths'].split(',')]
+        except (KeyError, ValueError):
+            raise FrameDecodeError("Concatenated batches require an X-Frame-Lengths header")
+        if any(length <= 0 for length in lengths):
+            raise FrameDecodeError("Invalid frame length in X-Frame-Lengths")
+
+        body = read_stream_into_buffer(request.stream, request.content_length, MAX_BATCH_BYTES)
+        if sum(lengths) != body.size:
+            raise FrameDecodeError(f"X-Frame-Lengths adds up to {sum(lengths)} bytes, body has {body.size}")
+        offsets = np.cumsum([0] + lengths)
+        buffers = [body[start:end] for start, end in zip(offsets, offsets[1:])]
+
+        if content_type == RAW_CONTENT_TYPE:
+            width, height = _raw_frame_size(request.headers)
+            decode = lambda buffer: decode_raw_frame(buffer, width, height, scale)
+        else:
+            decode = lambda buffer: decode_encoded_frame(buffer, color, scale)
+    else:
+        raise FrameDecodeError(f"Unsupported content type: {content_type or 'none'}")
+
+    if not buffers:
+        raise FrameDecodeError("Empty batch")
+    if len(buffers) > MAX_BATCH_FRAMES:
+        raise FrameDecodeError(f"Too many frames in batch ({len(buffers)} > {MAX_BATCH_FRAMES})")
+    return buffers, decode
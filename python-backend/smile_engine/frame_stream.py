@@ -0,0 +1,154 @@
+import json
+import logging
+import threading
+import time
+
+import numpy as np
+from simple_websocket import ConnectionClosed
+
+from . import metrics
+from .frame_io import FrameDecodeError, decode_encoded_frame, decode_raw_frame
+from .options import parse_decode_scale
+from .responses import encode_stream_result, response_format
+
+logger = logging.getLogger(__name__)
+
+
+class LatestFrameSlot:
+    """Caixa de um único frame: o mais novo substitui o que ainda não foi processado
+
+    Isso dá o backpressure do stream: se a detecção for mais lenta que a
+    captura, os frames velhos são descartados em vez de formar fila.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._pending = None
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, payload):
+        with self._condition:
+            self.received += 1
+            if self._pending is not None:
+                self.dropped += 1
+                metrics.registry.increment('stream_dropped_frames_total')
+            self._pending = (self.received, payload)
+            self._condition.notify()
+
+    def take(self):
+        """Bloqueia até haver frame; retorna (seq, payload) ou None se fechado"""
+        with self._condition:
+            while self._pending is None and not self._closed:
+                self._condition.wait()
+            item, self._pending = self._pending, None
+            return item
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+
+class StreamOptions:
+    """Opções da conexão, trocadas inteiras pela thread que recebe as mensagens
+
+    Cada atualização cria um dict novo; o laço de detecção pega o atual com
+    `current()` e o usa no frame inteiro sem risco de vê-lo mudar no meio.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._options = {}
+
+    def update(self, changes):
+        with self._lock:
+            self._options = dict(self._options, **changes)
+
+    def current(self):
+        with self._lock:
+            return self._options
+
+
+def _receive_loop(ws, slot, options):
+    """Recebe mensagens do cliente: binário = frame, texto = opções em JSON"""
+    try:
+        while True:
+            message = ws.receive()
+            if isinstance(message, (bytes, bytearray)):
+                slot.put(message)
+            elif message:
+                try:
+                    options.update(json.loads(message))
+                except (ValueError, TypeError):
+                    pass
+    except ConnectionClosed:
+        pass
+    finally:
+        slot.close()
+
+
+def _decode_stream_frame(payload, options, scale=1):
+    buffer = np.frombuffer(payload, np.uint8)
+    if 'width' in options and 'height' in options:
+        try:
+            width, height = int(options['width']), int(options['height'])
+        except (TypeError, ValueError):
+            raise FrameDecodeError(f"Invalid raw frame size: {options['width']!r}x{options['height']!r}")
+        return decode_raw_frame(buffer, width, height, scale)
+    return decode_encoded_frame(buffer, scale=scale)
+
+
+def serve_frame_stream(ws, process_frame, decode_scale=1):
+    """Atende uma conexão WebSocket de detecção contínua
+
+    O cliente envia frames JPEG/PNG (ou crus, após enviar `{"width", "height"}`)
+    como mensagens binárias e pode ajustar opções como `{"threshold": 0.6}`
+    com mensagens de texto. Cada resultado de `process_frame(frame, options)`
+    volta acrescido de `frame_seq`, `dropped_frames` e `latency_ms`, como texto
+    JSON ou, com `{"format": "msgpack"}` / `{"format": "binary"}`, como
+    mensagem binária (ver responses.py).
+    """
+    slot = LatestFrameSlot()
+    stream_options = StreamOptions()
+    receiver = threading.Thread(target=_receive_loop, args=(ws, slot, stream_options), daemon=True)
+    receiver.start()
+
+    try:
+        while True:
+            item = slot.take()
+            if item is None:
+                break
+            seq, payload = item
+            started = time.perf_counter()
+            options = stream_options.current()
+
+            metrics.observe('request_bytes', len(payload), endpoint='stream')
+            try:
+                fmt = response_format(options)
+                scale = parse_decode_scale(options, decode_scale)
+            except ValueError as e:
+                fmt, result = 'json', {"error": str(e)}
+            else:
+                try:
+                    with metrics.stage('decode'):
+                        frame = _decode_stream_frame(payload, options, scale)
+                    result = process_frame(frame, dict(options))
+                except FrameDecodeError as e:
+                    result = {"error": str(e)}
+                except Exception as e:
+                    # Falha de um frame (OpenCV, vaga reciclada, engine) não derruba a conexão
+                    logger.exception("Erro ao processar o frame %d do stream", seq)
+                    result = {"error": f"Detection failed: {e}"}
+
+            result["frame_seq"] = seq
+            result["dropped_frames"] = slot.dropped
+            result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            with metrics.stage(fmt):
+                message = encode_stream_result(result, fmt)
+            ws.send(message)
+    except ConnectionClosed:
+        pass
+    finally:
+        slot.close()
@@ -0,0 +1,368 @@
+"""Detectores heurísticos originais, mantidos como engines selecionáveis
+
+Reproduzem as regras de smile_detector.py ("multi_method") e de
+simple_smile_detector.py ("simple"), que antes eram servidores separados.
+"""
+import logging
+
+import cv2
+import numpy as np
+
+from . import metrics
+from .cascades import FACE_CASCADE_ALT, SMILE_CASCADE, cascade_pool
+from .mouth_features import mouth_region
+
+logger = logging.getLogger(__name__)
+
+# Os detectores são compartilhados entre as threads do servidor: cada chamada
+# pega uma instância livre do pool em vez de usar um cascade só do detector
+face_cascades = cascade_pool(FACE_CASCADE_ALT)
+smile_cascades = cascade_pool(SMILE_CASCADE)
+
+
+class MultiMethodSmileDetector:
+    """Detector de quatro métodos do antigo smile_detector.py (engine "multi_method")"""
+
+    def __init__(self):
+        # Carregar classificadores Haar de faces e de sorriso (antes do fork dos workers)
+        face_cascades.preload()
+        smile_cascades.preload()
+        
+        logger.info("✅ Multi-method Smile Detector inicializado!")
+
+    def detect_smile_improved(self, image):
+        """Detecção de sorriso MELHORADA usando múltiplas técnicas"""
+        try:
+            # Converter para escala de cinza (frames crus podem já vir em cinza)
+            with metrics.stage('grayscale'):
+                gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            
+            # Detectar faces
+            with metrics.stage('face_detect'), face_cascades.acquire() as face_cascade:
+                faces = face_cascade.detectMultiScale(
+                    gray,
+                    scaleFactor=1.1,
+                    minNeighbors=5,
+                    minSize=(30, 30)
+                )
+            metrics.observe('faces_per_frame', len(faces))
+            
+            if len(faces) == 0:
+                return {
+                    "face_detected": False,
+                    "smiling": False,
+                    "confidence": 0.0,
+                    "reason": "Nenhuma face detectada"
+                }
+            
+            # Usar a primeira face detectada
+            (x, y, w, h) = faces[0]
+            
+            # Extrair região da face
+            face_roi = gray[y:y+h, x:x+w]
+            
+            # MÉTODO 1: Detecção de sorriso com Haar Cascade
+            with metrics.stage('smile_cascade'):
+                smile_score_1 = self.detect_smile_haar(face_roi)
+            
+            # MÉTODO 2: Análise de pixels da boca
+            with metrics.stage('score_pixel'):
+                smile_score_2 = self.analyze_mouth_pixels(face_roi)
+            
+            # MÉTODO 3: Análise de contornos
+            with metrics.stage('score_contour'):
+                smile_score_3 = self.analyze_mouth_contours(face_roi)
+            
+            # MÉTODO 4: Análise de brilho e variação
+            with metrics.stage('score_brightness'):
+                smile_score_4 = self.analyze_mouth_brightness(face_roi)
+            
+            # Combinar scores com pesos
+            combined_score = (
+                smile_score_1 * 0.3 +  # Haar Cascade
+                smile_score_2 * 0.3 +  # Análise de pixels
+                smile_score_3 * 0.2 +  # Contornos
+                smile_score_4 * 0.2    # Brilho
+            )
+            
+            return {
+                "face_detected": True,
+                "smiling": combined_score > 0.4,  # Threshold mais baixo
+                "confidence": combined_score,
+                "smile_score": combined_score,
+                "face_region": {
+                    "x": int(x),
+                    "y": int(y),
+                    "width": int(w),
+                    "height": int(h)
+                },
+                "details": {
+                    "method": "Multi-method detection (Haar + Pixels + Contours + Brightness)",
+                    "haar_score": smile_score_1,
+                    "pixel_score": smile_score_2,
+                    "contour_score": smile_score_3,
+                    "brightness_score": smile_score_4,
+                    "combined_score": combined_score,
+                    "threshold": 0.4
+                }
+            }
+            
+        except Exception as e:
+            logger.exception("❌ Erro na detecção: %s", e)
+            return {
+                "face_detected": False,
+                "smiling": False,
+                "confidence": 0.0,
+                "error": str(e)
+            }
+
+    def detect_smile_haar(self, face_roi):
+        """Detecção de sorriso usando Haar Cascade"""
+        try:
+            with smile_cascades.acquire() as smile_cascade:
+                smiles = smile_cascade.detectMultiScale(
+                    face_roi,
+                    scaleFactor=1.8,
+                    minNeighbors=20,
+                    minSize=(25, 25)
+                )
+            
+            if len(smiles) > 0:
+                return 0.8  # Alto score se detectou sorriso
+            else:
+                return 0.2  # Baixo score se não detectou
+        except:
+            return 0.0
+
+    def analyze_mouth_pixels(self, face_roi):
+        """Análise de pixels da região da boca"""
+        # Região da boca (parte inferior da face)
+        mouth = mouth_region(face_roi)
+        
+        if mouth.size == 0:
+            return 0.0
+        
+        # Análise de brilho
+        mean_brightness = np.mean(mouth)
+        brightness_variance = np.var(mouth)
+        
+        # Análise de bordas
+        edges = cv2.Canny(mouth, 50, 150)
+        edge_density = np.sum(edges > 0) / mouth.size
+        
+        # Calcular score baseado em múltiplos fatores
+        score = 0.0
+        
+        # Fator 1: Brilho (boca aberta = mais escura)
+        if mean_brightness < 100:
+            score += 0.3
+        
+        # Fator 2: Variação (boca aberta = mais variação)
+        if brightness_variance > 500:
+            score += 0.3
+        
+        # Fator 3: Bordas (boca aberta = mais bordas)
+        if edge_density > 0.1:
+            score += 0.4
+        
+        return min(1.0, score)
+
+    def analyze_mouth_contours(self, face_roi):
+        """Análise de contornos da região da boca"""
+        # Região da boca (parte inferior da face)
+        mouth = mouth_region(face_roi)
+        
+        if mouth.size == 0:
+            return 0.0
+        
+        # Aplicar blur e detecção de bordas
+        blurred = cv2.GaussianBlur(mouth, (5, 5), 0)
+        edges = cv2.Canny(blurred, 50, 150)
+        
+        # Encontrar contornos
+        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        
+        # Calcular score baseado em contornos
+        score = 0.0
+        
+        # Fator 1: Número de contornos
+        if len(contours) > 3:
+            score += 0.3
+        
+        # Fator 2: Área total dos contornos
+        total_area = sum(cv2.contourArea(c) for c in contours)
+        area_ratio = total_area / (mouth.shape[0] * mouth.shape[1])
+        if area_ratio > 0.1:
+            score += 0.4
+        
+        # Fator 3: Contornos grandes
+        large_contours = [c for c in contours if cv2.contourArea(c) > 50]
+        if len(large_contours) > 0:
+            score += 0.3
+        
+        return min(1.0, score)
+
+    def analyze_mouth_brightness(self, face_roi):
+        """Análise de brilho da região da boca"""
+        # Região da boca (parte inferior da face)
+        mouth = mouth_region(face_roi)
+        
+        if mouth.size == 0:
+            return 0.0
+        
+        # Análise de brilho
+        mean_brightness = np.mean(mouth)
+        brightness_variance = np.var(mouth)
+        
+        # Análise de histograma
+        hist = cv2.calcHist([mouth], [0], None, [256], [0, 256])
+        
+        # Calcular score
+        score = 0.0
+        
+        # Fator 1: Brilho médio (boca aberta = mais escura)
+        if mean_brightness < 120:
+            score += 0.4
+        
+        # Fator 2: Variação (boca aberta = mais variação)
+        if brightness_variance > 300:
+            score += 0.3
+        
+        # Fator 3: Distribuição de brilho
+        dark_pixels = np.sum(mouth < 100)
+        total_pixels = mouth.size
+        dark_ratio = dark_pixels / total_pixels
+        
+        if dark_ratio > 0.3:  # 30% de pixels escuros
+            score += 0.3
+        
+        return min(1.0, score)
+
+
+class SimpleSmileDetector:
+    """Detector de contornos do antigo simple_smile_detector.py (engine "simple")"""
+
+    def __init__(self):
+        # Carregar classificador Haar para detecção de faces (antes do fork dos workers)
+        face_cascades.preload()
+        logger.info("✅ Simple Smile Detector inicializado com sucesso!")
+
+    def detect_smile_simple(self, image):
+        """Detecção de sorriso simples mas eficaz usando OpenCV"""
+        try:
+            # Converter para escala de cinza (frames crus podem já vir em cinza)
+            with metrics.stage('grayscale'):
+                gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            
+            # Detectar faces
+            with metrics.stage('face_detect'), face_cascades.acquire() as face_cascade:
+                faces = face_cascade.detectMultiScale(
+                    gray,
+                    scaleFactor=1.1,
+                    minNeighbors=5,
+                    minSize=(30, 30)
+                )
+            metrics.observe('faces_per_frame', len(faces))
+            
+            if len(faces) == 0:
+                return {
+                    "face_detected": False,
+                    "smiling": False,
+                    "confidence": 0.0,
+                    "reason": "Nenhuma face detectada"
+                }
+            
+            # Usar a primeira face detectada
+            (x, y, w, h) = faces[0]
+            
+            # Extrair região da face
+            face_roi = gray[y:y+h, x:x+w]
+            
+            # Analisar sorriso na região da face
+            with metrics.stage('score_simple'):
+                smile_score = self.analyze_smile_in_face(face_roi)
+            
+            return {
+                "face_detected": True,
+                "smiling": smile_score > 0.3,  # Threshold mais baixo
+                "confidence": smile_score,
+                "smile_score": smile_score,
+                "face_region": {
+                    "x": int(x),
+                    "y": int(y),
+                    "width": int(w),
+                    "height": int(h)
+                },
+                "details": {
+                    "method": "OpenCV + Análise de pixels",
+                    "face_size": f"{w}x{h}",
+                    "threshold": 0.3
+                }
+            }
+            
+        except Exception as e:
+            logger.exception("❌ Erro na detecção: %s", e)
+            return {
+                "face_detected": False,
+                "smiling": False,
+                "confidence": 0.0,
+                "error": str(e)
+            }
+
+    def analyze_smile_in_face(self, face_roi):
+        """Analisa sorriso na região da face usando análise de pixels"""
+        # Região da boca (parte inferior da face)
+        mouth = mouth_region(face_roi)
+        
+        if mouth.size == 0:
+            return 0.0
+        
+        # Aplicar filtros para realçar características da boca
+        # 1. Blur para suavizar
+        blurred = cv2.GaussianBlur(mouth, (5, 5), 0)
+        
+        # 2. Detecção de bordas
+        edges = cv2.Canny(blurred, 50, 150)
+        
+        # 3. Análise de contornos
+        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        
+        # Calcular score de sorriso MAIS RIGOROSO
+        smile_score = 0.0
+        
+        # Fator 1: Número de contornos (boca aberta = mais contornos) - MAIS RIGOROSO
+        contour_count = len(contours)
+        if contour_count > 8:  # Aumentado de 3 para 8
+            smile_score += 0.2  # Reduzido de 0.3 para 0.2
+        
+        # Fator 2: Área total dos contornos - MAIS RIGOROSO
+        total_area = sum(cv2.contourArea(c) for c in contours)
+        area_ratio = total_area / (mouth.shape[0] * mouth.shape[1])
+        if area_ratio > 0.2:  # Aumentado de 0.1 para 0.2 (20% da região)
+            smile_score += 0.2  # Reduzido de 0.3 para 0.2
+        
+        # Fator 3: Análise de brilho (boca aberta = mais escura) - MAIS RIGOROSO
+        mean_brightness = np.mean(mouth)
+        if mean_brightness < 80:  # Reduzido de 100 para 80 (mais escuro)
+            smile_score += 0.2
+        
+        # Fator 4: Variância de brilho (boca aberta = mais variação) - MAIS RIGOROSO
+        brightness_variance = np.var(mouth)
+        if brightness_variance > 800:  # Aumentado de 500 para 800
+            smile_score += 0.2
+        
+        # Fator 5: NOVO - Verificar se há variação suficiente (boca fechada = pouca variação)
+        if brightness_variance < 300:  # Pouca variação = boca fechada
+            smile_score *= 0.3  # Reduzir drasticamente se boca fechada
+        
+        # Fator 6: NOVO - Verificar brilho médio (boca fechada = mais clara)
+        if mean_brightness > 120:  # Muito claro = boca fechada
+            smile_score *= 0.2  # Reduzir drasticamente se muito claro
+        
+        # Fator 7: NOVO - Verificar proporção de contornos (muitos contornos pequenos = boca fechada)
+        if contour_count > 0:
+            avg_contour_area = total_area / contour_count
+            if avg_contour_area < 50:  # Contornos muito pequenos = boca fechada
+                smile_score *= 0.4  # Reduzir se contornos muito pequenos
+        
+        return min(1.0, smile_score)
@@ -0,0 +1,145 @@
+"""Memória limitada sob carga: buffers reaproveitados e limite de frames em processamento
+
+O cinza do frame, as faces normalizadas e os intermediários de gradiente
+e contornos são escritos com `dst=` em buffers emprestados de um pool
+comum a todas as threads do processo e devolvidos ao fim do uso, em vez
+de arrays novos a cada frame. O corpo da requisição e o frame decodificado
+continuam sendo alocados por frame (`cv2.imdecode` não aceita `dst`).
+`FrameSlots` limita quantos frames existem ao mesmo tempo no servidor
+(corpo lido, decodificado ou em detecção), de modo que o pico de memória
+não depende de quantos quiosques estão conectados.
+"""
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+# Espera por uma vaga antes de responder 503
+SLOT_WAIT_SECONDS = 1.0
+# Limites do pool de buffers livres (ver BufferPool)
+MAX_IDLE_BYTES = 64 * 2**20
+MIN_BUFFER_SIZE = 4096
+
+
+class BufferPool:
+    """Buffers de trabalho devolvidos explicitamente e reaproveitados entre threads
+
+    O servidor Flask cria uma thread por requisição, então buffers por
+    thread morreriam com ela. Aqui os buffers livres ficam num pool comum,
+    separados por dtype e classe de tamanho (potência de 2): o recorte da
+    boca muda alguns pixels de um frame para o outro e, com a forma exata
+    como chave, quase nunca haveria reaproveitamento. O pool é limitado:
+    no máximo `max_idle` buffers livres por classe e `max_idle_bytes` no
+    total; o que passar disso é descartado na devolução.
+    """
+
+    def __init__(self, max_idle=8, max_idle_bytes=MAX_IDLE_BYTES):
+        self.max_idle = max_idle
+        self.max_idle_bytes = max_idle_bytes
+        self._idle = {}
+        self._idle_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+
+    @staticmethod
+    def _key(size, dtype):
+        return np.dtype(dtype), max(MIN_BUFFER_SIZE, 1 << (max(size, 1) - 1).bit_length())
+
+    def checkout(self, shape, dtype=np.uint8):
+        """Buffer (base plana, view com a forma pedida); o conteúdo é indefinido"""
+        size = int(np.prod(shape))
+        key = self._key(size, dtype)
+        with self._lock:
+            free = self._idle.get(key)
+            if free:
+                base = free.pop()
+                self._idle_bytes -= base.nbytes
+                self.hits += 1
+            else:
+                base = None
+                self.misses += 1
+        if base is None:
+            base = np.empty(key[1], key[0])
+        return base, base[:size].reshape(shape)
+
+    def checkin(self, base):
+        """Devolve a base de `checkout`; nenhuma view dela pode continuar em uso"""
+        key = (base.dtype, base.size)
+        with self._lock:
+            free = self._idle.setdefault(key, [])
+            if len(free) >= self.max_idle or self._idle_bytes + base.nbytes > self.max_idle_bytes:
+                self.discarded += 1
+                return
+            free.append(base)
+            self._idle_bytes += base.nbytes
+
+    @contextmanager
+    def borrowed(self, shape, dtype=np.uint8):
+        """View com a forma pedida, devolvida ao pool no fim do bloco"""
+        base, view = self.checkout(shape, dtype)
+        try:
+            yield view
+        finally:
+            self.checkin(base)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "reuse_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "discarded": self.discarded,
+                "idle_buffers": sum(len(free) for free in self._idle.values()),
+                "idle_bytes": self._idle_bytes,
+            }
+
+
+# Pool do processo: threads do servidor, do pool de faces ou o processo worker
+buffers = BufferPool()
+
+
+class ServerBusy(RuntimeError):
+    """Nenhuma vaga de frame livre dentro do tempo de espera (vira HTTP 503 na API)"""
+
+
+class FrameSlots:
+    """Limite de frames em processamento ao mesmo tempo (`limit` None = sem limite)
+
+    Um lote pede uma vaga por frame; pedidos maiores que o limite ficam com
+    todas as vagas, de modo que um lote grande roda sozinho.
+    """
+
+    def __init__(self, limit=None, wait_seconds=SLOT_WAIT_SECONDS):
+        self.limit = limit
+        self.wait_seconds = wait_seconds
+        self.in_flight = 0
+        self.rejected = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, count=1, held=0):
+        """Reserva vagas esperando até `wait_seconds`; retorna quantas (ServerBusy se não houver)
+
+        `held` são as vagas que o chamador já tem e contam para o limite.
+        """
+        if self.limit is not None:
+            count = min(count, self.limit - held)
+        if count <= 0:
+            return 0
+        with self._condition:
+            if self.limit is not None and not self._condition.wait_for(
+                    lambda: self.in_flight + count <= self.limit, self.wait_seconds):
+                self.rejected += 1
+                raise ServerBusy("Server busy: too many frames in flight")
+            self.in_flight += count
+            return count
+
+    def release(self, count=1):
+        with self._condition:
+            self.in_flight -= count
+            self._condition.notify_all()
+
+    def stats(self):
+        return {"in_flight": self.in_flight, "limit": self.limit, "rejected": self.rejected}
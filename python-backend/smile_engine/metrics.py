@@ -0,0 +1,180 @@
+"""Histogramas de latência por etapa, tamanho de requisição e faces por frame
+
+As medições são baratas (um `perf_counter` e um append) e ficam num registro
+global exposto em formato texto do Prometheus por `/api/metrics`. Dentro de
+um `trace()` elas são acumuladas numa lista em vez de irem direto ao
+registro, o que permite aos workers de processo devolvê-las ao front end.
+"""
+import bisect
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+PREFIX = 'smile'
+
+# Limites (le) dos buckets de cada histograma
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+FACE_BUCKETS = (0, 1, 2, 3, 4, 6, 8, 12, 16)
+
+# Janela das amostras recentes usadas nos percentis "rolling"
+RECENT_WINDOW = 1024
+RECENT_QUANTILES = (0.5, 0.95, 0.99)
+
+HISTOGRAMS = {
+    'stage_duration_seconds': ('Duração de cada etapa do pipeline de detecção', LATENCY_BUCKETS),
+    'request_duration_seconds': ('Duração total das requisições HTTP', LATENCY_BUCKETS),
+    'request_bytes': ('Tamanho do frame recebido (bytes)', SIZE_BUCKETS),
+    'faces_per_frame': ('Faces encontradas por frame', FACE_BUCKETS),
+}
+
+COUNTERS = {
+    'requests_total': 'Requisições atendidas por rota e status',
+    'stream_dropped_frames_total': 'Frames do WebSocket descartados por backpressure',
+    'cache_lookups_total': 'Consultas ao cache de resultados por frame (hit/miss)',
+    'frames_rejected_total': 'Frames recusados (503) por excesso de frames em processamento',
+    'capture_frames_total': 'Frames recebidos pelas janelas de captura (queued/dropped/closed)',
+    'worker_restarts_total': 'Pools de workers de detecção recriados depois que um worker morreu',
+}
+
+
+class Histogram:
+    """Histograma cumulativo (Prometheus) + janela das últimas amostras"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=RECENT_WINDOW)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def quantiles(self):
+        if not self.recent:
+            return {}
+        values = np.percentile(np.fromiter(self.recent, dtype=np.float64), [q * 100 for q in RECENT_QUANTILES])
+        return dict(zip(RECENT_QUANTILES, values))
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, name, value, labels=()):
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(HISTOGRAMS[name][1])
+            histogram.observe(value)
+
+    def increment(self, name, amount=1, labels=()):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def record(self, samples):
+        """Registra amostras (nome, labels, valor) vindas de um trace"""
+        for name, labels, value in samples:
+            self.observe(name, value, labels)
+
+    def render(self):
+        """Texto no formato de exposição do Prometheus (versão 0.0.4)"""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        lines = []
+        for name, help_text in COUNTERS.items():
+            family = [(labels, value) for (key, labels), value in counters if key == name]
+            if not family:
+                continue
+            lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{name} counter")
+            for labels, value in family:
+                lines.append(f"{PREFIX}_{name}{_labels(labels)} {value}")
+
+        for name, (help_text, _) in HISTOGRAMS.items():
+            family = [(labels, histogram) for (key, labels), histogram in histograms if key == name]
+            if not family:
+                continue
+            metric = f"{PREFIX}_{name}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+            for labels, histogram in family:
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{_labels(labels + (('le', _number(bound)),))} {cumulative}")
+                lines.append(f"{metric}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{metric}_sum{_labels(labels)} {_number(histogram.sum)}")
+                lines.append(f"{metric}_count{_labels(labels)} {histogram.count}")
+
+            # Percentis das últimas RECENT_WINDOW amostras (o histograma acumula desde o início)
+            lines.append(f"# HELP {metric}_recent Percentis das últimas {RECENT_WINDOW} amostras")
+            lines.append(f"# TYPE {metric}_recent gauge")
+            for labels, histogram in family:
+                for quantile, value in histogram.quantiles().items():
+                    lines.append(f"{metric}_recent{_labels(labels + (('quantile', str(quantile)),))} {_number(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) or not float(value).is_integer() else str(int(value))
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{key}="{str(value)}"' for key, value in labels)
+    return '{' + pairs + '}'
+
+
+registry = MetricsRegistry()
+_local = threading.local()
+
+
+def observe(name, value, **labels):
+    """Registra uma amostra (no trace da thread, se houver, ou no registro global)"""
+    samples = getattr(_local, 'samples', None)
+    sample = (name, tuple(sorted(labels.items())), value)
+    if samples is not None:
+        samples.append(sample)
+    else:
+        registry.record((sample,))
+
+
+@contextmanager
+def stage(name):
+    """Mede a duração de uma etapa do pipeline"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe('stage_duration_seconds', time.perf_counter() - started, stage=name)
+
+
+@contextmanager
+def trace():
+    """Acumula as amostras da thread numa lista (entregue no `as`) em vez do registro
+
+    Usado nos workers de processo: a lista volta junto com o resultado e o
+    front end a registra com `registry.record`.
+    """
+    previous = getattr(_local, 'samples', None)
+    samples = _local.samples = []
+    try:
+        yield samples
+    finally:
+        _local.samples = previous
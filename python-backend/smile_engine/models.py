@@ -0,0 +1,61 @@
+"""Carregamento antecipado dos modelos e aquecimento do pipeline
+
+Os cascades são carregados no processo principal antes de o pool de workers
+ser criado: com fork, os workers herdam as instâncias prontas (copy-on-write)
+em vez de ler e interpretar os XMLs de novo. O aquecimento roda o pipeline
+completo num frame sintético, para que a primeira requisição real não pague
+pelos caminhos frios do OpenCV e do NumPy.
+"""
+import time
+
+import cv2
+import numpy as np
+
+from . import metrics
+from .cascades import FACE_CASCADE, SMILE_CASCADE, cascade_pool, cascade_pools
+from .classifier import current_model
+from .detector import get_detector, run_engine
+from .engine import FaceBatch, score_faces
+from .options import DEFAULT_OPTIONS
+from .strategies import STRATEGIES
+
+
+def preload_models(engines=('improved',), instances=1):
+    """Carrega os cascades e cria os detectores dos engines; retorna o que está carregado"""
+    cascade_pool(FACE_CASCADE).preload(instances)
+    cascade_pool(SMILE_CASCADE).preload(instances)
+    for engine in engines:
+        get_detector(engine)
+    return {
+        "engines": list(engines),
+        "cascades": {filename: pool.idle for filename, pool in cascade_pools().items()},
+    }
+
+
+def synthetic_frame(width=640, height=480):
+    """Frame determinístico com textura suave (o cascade varre a imagem inteira)"""
+    noise = np.random.default_rng(0).integers(0, 256, (height // 8, width // 8, 3), dtype=np.uint8)
+    return cv2.resize(noise, (width, height), interpolation=cv2.INTER_LINEAR)
+
+
+def warm_up(engines=('improved',), options=None):
+    """Roda os engines e todas as estratégias num frame sintético; retorna a duração em ms
+
+    As medições do aquecimento são descartadas para não distorcer /api/metrics.
+    """
+    started = time.perf_counter()
+    frame = synthetic_frame()
+    height, width = frame.shape[:2]
+    with metrics.trace():
+        for engine in engines:
+            run_engine(frame, dict(options or DEFAULT_OPTIONS, engine=engine))
+        # O frame não tem rosto: as características são aquecidas numa caixa fixa
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        box = (width // 4, height // 4, width // 2, height // 2)
+        batch = FaceBatch(gray, [box])
+        score_faces(batch, [(strategy, strategy.weight) for strategy in STRATEGIES.values()], 0.5)
+        model = current_model()
+        if model is not None and 'classifier' in engines:
+            with FaceBatch(gray, [box], model.face_size) as model_batch:
+                model.score_faces(model_batch)
+    return round((time.perf_counter() - started) * 1000, 1)
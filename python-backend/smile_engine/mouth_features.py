@@ -0,0 +1,130 @@
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+
+from .memory import buffers
+
+# Níveis de cinza usados para tirar momentos direto do histograma
+_LEVELS = np.arange(256, dtype=np.float64)
+_LEVELS_SQUARED = _LEVELS ** 2
+_CLOSE_KERNEL = np.ones((2, 2), np.uint8)
+
+DARK_PIXEL_LEVEL = 100
+
+
+def mouth_region(face_roi):
+    """Região da boca: parte inferior central da face (60-90% da altura, 20-80% da largura)"""
+    h, w = face_roi.shape[:2]
+    return face_roi[int(h * 0.6):int(h * 0.9), int(w * 0.2):int(w * 0.8)]
+
+
+class MouthFeatures(NamedTuple):
+    """Vetor de características da região da boca (np.array(features) vira float64)"""
+    mean_brightness: float
+    brightness_variance: float
+    brightness_std: float
+    p25: float
+    p75: float
+    iqr: float
+    dark_ratio: float
+    gradient_mean: float
+    gradient_std: float
+    gradient_max: float
+    left_mean: float
+    right_mean: float
+    asymmetry: float
+    contour_count: float
+    largest_area_ratio: float
+    largest_perimeter: float
+    circularity: float
+
+
+FEATURE_NAMES = MouthFeatures._fields
+
+
+def histogram_stats(mouth_gray):
+    """Momentos, percentis e fração escura a partir de um único histograma"""
+    pixel_count = mouth_gray.size
+    hist = cv2.calcHist([mouth_gray], [0], None, [256], [0, 256]).ravel()
+
+    mean = float(hist @ _LEVELS) / pixel_count
+    variance = max(0.0, float(hist @ _LEVELS_SQUARED) / pixel_count - mean * mean)
+
+    # Mesmo resultado de np.sort(...)[int(n * q)], sem ordenar os pixels
+    cumulative = np.cumsum(hist)
+    p25 = float(np.searchsorted(cumulative, int(pixel_count * 0.25), side='right'))
+    p75 = float(np.searchsorted(cumulative, int(pixel_count * 0.75), side='right'))
+    dark_ratio = float(cumulative[DARK_PIXEL_LEVEL - 1]) / pixel_count
+
+    return mean, variance, variance ** 0.5, p25, p75, p75 - p25, dark_ratio
+
+
+def gradient_stats(mouth_gray):
+    """Média, desvio e máximo da magnitude Sobel (float32, buffers reaproveitados)"""
+    shape = mouth_gray.shape
+    with buffers.borrowed(shape, np.float32) as grad_x, buffers.borrowed(shape, np.float32) as grad_y, \
+            buffers.borrowed(shape, np.float32) as magnitude:
+        grad_x = cv2.Sobel(mouth_gray, cv2.CV_32F, 1, 0, dst=grad_x, ksize=3)
+        grad_y = cv2.Sobel(mouth_gray, cv2.CV_32F, 0, 1, dst=grad_y, ksize=3)
+        magnitude = cv2.magnitude(grad_x, grad_y, magnitude=magnitude)
+        mean, std = cv2.meanStdDev(magnitude)
+        return float(mean[0, 0]), float(std[0, 0]), float(magnitude.max())
+
+
+def asymmetry_stats(mouth_gray):
+    """Brilho médio das metades esquerda e direita a partir das somas por coluna"""
+    h, w = mouth_gray.shape
+    mid_x = w // 2
+    if mid_x == 0:
+        return 0.0, 0.0, 0.0
+    column_sums = cv2.reduce(mouth_gray, 0, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel()
+    left_mean = float(column_sums[:mid_x].sum()) / (mid_x * h)
+    right_mean = float(column_sums[mid_x:].sum()) / ((w - mid_x) * h)
+    return left_mean, right_mean, abs(left_mean - right_mean)
+
+
+def contour_stats(mouth_gray):
+    """Contornos após blur + Canny + fechamento morfológico"""
+    # Dois buffers alternados: blur -> Canny -> fechamento de volta no primeiro
+    shape = mouth_gray.shape
+    with buffers.borrowed(shape) as blurred, buffers.borrowed(shape) as edges:
+        blurred = cv2.GaussianBlur(mouth_gray, (3, 3), 0, dst=blurred)
+        edges = cv2.Canny(blurred, 30, 100, edges=edges)
+        closed = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, _CLOSE_KERNEL, dst=blurred)
+        # Os contornos são arrays próprios: os buffers podem voltar ao pool
+        contours, _ = cv2.findContours(closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    if len(contours) == 0:
+        return 0.0, 0.0, 0.0, 0.0
+
+    areas = [cv2.contourArea(c) for c in contours]
+    largest = int(np.argmax(areas))
+    largest_area = areas[largest]
+    perimeter = cv2.arcLength(contours[largest], True)
+    circularity = 4 * np.pi * largest_area / (perimeter * perimeter) if perimeter > 0 else 0.0
+    area_ratio = largest_area / mouth_gray.size
+
+    return float(len(contours)), float(area_ratio), float(perimeter), float(circularity)
+
+
+# Grupos de características calculados juntos, na ordem de FEATURE_NAMES.
+# Permitem calcular só o necessário (ex.: pular Sobel e contornos).
+FEATURE_GROUPS = {
+    'histogram': (histogram_stats, FEATURE_NAMES[0:7]),
+    'gradient': (gradient_stats, FEATURE_NAMES[7:10]),
+    'asymmetry': (asymmetry_stats, FEATURE_NAMES[10:13]),
+    'contour': (contour_stats, FEATURE_NAMES[13:17]),
+}
+
+FEATURE_GROUP_OF = {name: group for group, (_, names) in FEATURE_GROUPS.items() for name in names}
+
+
+def extract_mouth_features(mouth_gray):
+    """Extrai todas as estatísticas da boca com um histograma e um gradiente"""
+    return MouthFeatures(
+        *histogram_stats(mouth_gray),
+        *gradient_stats(mouth_gray),
+        *asymmetry_stats(mouth_gray),
+        *contour_stats(mouth_gray),
+    )
@@ -0,0 +1,125 @@
+from .classifier import DECISION_THRESHOLD, NO_MODEL_ERROR, current_model
+from .engine import FACE_SIZE_RANGE
+from .face_detection import DEFAULT_FACE_PARAMS, parse_face_params
+from .frame_io import DECODE_SCALES
+from .strategies import parse_strategies
+
+# Engines disponíveis: o engine de estratégias, o classificador treinado e os detectores legados
+ENGINES = ('improved', 'classifier', 'multi_method', 'simple')
+
+# Quanto de diagnóstico vai na resposta: só a decisão, + scores por estratégia, ou tudo
+VERBOSITY_LEVELS = ('minimal', 'scores', 'full')
+
+DEFAULT_OPTIONS = {
+    "threshold": 0.5,
+    "multi_face": False,
+    "face_params": DEFAULT_FACE_PARAMS,
+    # None = combinação padrão de estratégias (DEFAULT_STRATEGIES)
+    "strategies": None,
+    "short_circuit": False,
+    "engine": "improved",
+    "verbosity": "full",
+    # Frame analisado em 1/N da resolução (decodificação reduzida); regiões voltam na escala original
+    "decode_scale": 1,
+    # Lado canônico (px) para o qual cada face é levada antes de pontuar; None = tamanho detectado
+    "face_size": None,
+    # Pula a detecção sem movimento (com sessão) e sugere o ritmo de envio (`next_poll`)
+    "presence": False,
+}
+
+
+def parse_flag(value):
+    """Booleano vindo de JSON (true/false) ou de query string ('1', 'true', 'yes')"""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+
+def parse_decode_scale(source, default=1):
+    """`decode_scale` da requisição (1, 2 ou 4); ValueError se inválido"""
+    value = source.get('decode_scale')
+    if value is None or value == '':
+        return default
+    try:
+        scale = int(value)
+    except (TypeError, ValueError):
+        scale = None
+    if scale not in DECODE_SCALES:
+        raise ValueError(f"Invalid value for decode_scale: {value!r} (available: 1, 2, 4)")
+    return scale
+
+
+def parse_face_size(source, default=None):
+    """`face_size` da requisição (0 desliga a normalização); ValueError se inválido"""
+    value = source.get('face_size')
+    if value is None or value == '':
+        return default
+    low, high = FACE_SIZE_RANGE
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        size = -1
+    if size == 0:
+        return None
+    if not low <= size <= high:
+        raise ValueError(f"Invalid value for face_size: {value!r} (0 or {low}-{high})")
+    return size
+
+
+def decision_threshold(options):
+    """Threshold que decide o sorriso: o da requisição, exceto no engine classifier
+
+    O classificador traz o threshold do treino embutido (ver classifier.py);
+    o `threshold` das opções continua valendo para os outros engines.
+    """
+    if options.get('engine') == 'classifier':
+        return DECISION_THRESHOLD
+    return options['threshold']
+
+
+def parse_detection_options(source, defaults=None):
+    """Opções de detecção de uma requisição (JSON, query string ou opções do stream)
+
+    Campos ausentes ficam com os padrões do servidor. Lança ValueError com
+    uma mensagem para o cliente se algum valor for inválido.
+    """
+    defaults = defaults or DEFAULT_OPTIONS
+    options = dict(defaults)
+
+    threshold = source.get('threshold')
+    if threshold is not None and threshold != '':
+        try:
+            options['threshold'] = float(threshold)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid value for threshold: {threshold!r}")
+
+    for flag in ('multi_face', 'short_circuit', 'presence'):
+        if source.get(flag) is not None:
+            options[flag] = parse_flag(source.get(flag))
+
+    options['face_params'] = parse_face_params(source, defaults['face_params'])
+
+    if source.get('strategies'):
+        # Guardado como pares simples para poder viajar até os workers
+        options['strategies'] = [
+            (strategy.name, weight) for strategy, weight in parse_strategies(source.get('strategies'))
+        ]
+
+    engine = source.get('engine')
+    if engine:
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine!r} (available: {', '.join(ENGINES)})")
+        if engine == 'classifier' and current_model() is None:
+            raise ValueError(NO_MODEL_ERROR)
+        options['engine'] = engine
+
+    options['decode_scale'] = parse_decode_scale(source, defaults.get('decode_scale', 1))
+    options['face_size'] = parse_face_size(source, defaults.get('face_size'))
+
+    verbosity = source.get('verbosity')
+    if verbosity:
+        if verbosity not in VERBOSITY_LEVELS:
+            raise ValueError(f"Unknown verbosity: {verbosity!r} (available: {', '.join(VERBOSITY_LEVELS)})")
+        options['verbosity'] = verbosity
+
+    return options
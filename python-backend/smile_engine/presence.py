@@ -0,0 +1,105 @@
+"""Presença diante do quiosque e ritmo de envio sugerido ao cliente
+
+Antes da detecção de faces, o frame é reduzido e comparado a um modelo de
+fundo da sessão (média móvel do cinza). Sem movimento e sem face rastreada,
+a detecção é pulada. Cada resposta traz `next_poll`: em quanto tempo e em
+que resolução mandar o próximo frame, devagar e pequeno com a cabine vazia
+e mais rápido quando há alguém, principalmente com um sorriso começando.
+"""
+import cv2
+import numpy as np
+
+# Ritmo sugerido por estado: (intervalo em ms, largura e altura máximas do frame)
+POLL_PLAN = {
+    'idle': (1000, 320, 240),
+    'motion': (300, 640, 480),
+    'face': (200, 640, 480),
+    'smiling': (100, 640, 480),
+}
+
+# Fração do threshold a partir da qual o sorriso conta como "começando"
+SMILE_BUILDING_RATIO = 0.8
+
+
+class PresenceDetector:
+    """Movimento por diferença entre o frame reduzido e um fundo aprendido
+
+    Há movimento quando mais de `min_changed` dos pixels do frame reduzido
+    (`size`) diferem do fundo em mais de `pixel_threshold` níveis. O fundo
+    aprende rápido com a cena parada e devagar com movimento, para não
+    absorver quem acabou de chegar. Mesmo parado, um frame a cada
+    `recheck_every` passa pela detecção completa.
+    """
+
+    def __init__(self, size=(64, 48), pixel_threshold=15, min_changed=0.02,
+                 learning_rate=0.1, busy_learning_rate=0.01, recheck_every=15):
+        self.size = size
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.learning_rate = learning_rate
+        self.busy_learning_rate = busy_learning_rate
+        self.recheck_every = recheck_every
+        self.background = None
+        self.aspect = None
+        self.changed = 0.0
+        self.moving = True
+        self.idle_frames = 0
+
+    def update(self, frame):
+        """Compara o frame (cinza ou BGR) com o fundo e atualiza o fundo; retorna se houve movimento"""
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            # Frames coloridos (detectores legados, cache) viram cinza já reduzidos
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        small = small.astype(np.float32)
+        # O fundo é reduzido: só outra proporção (não outra resolução, ver next_poll) o invalida
+        aspect = round(frame.shape[1] / frame.shape[0], 2)
+        if self.background is None or aspect != self.aspect:
+            # Primeiro frame (ou outra proporção): vira o fundo e conta como movimento
+            self.background = small
+            self.aspect = aspect
+            self.changed, self.moving = 1.0, True
+            return True
+
+        difference = cv2.absdiff(small, self.background)
+        self.changed = float(np.count_nonzero(difference > self.pixel_threshold)) / difference.size
+        self.moving = self.changed >= self.min_changed
+        rate = self.busy_learning_rate if self.moving else self.learning_rate
+        cv2.accumulateWeighted(small, self.background, rate)
+        return self.moving
+
+    def should_detect(self, tracking=False):
+        """Se o frame deve passar pela detecção de faces (movimento, face rastreada ou recheck)"""
+        if self.moving or tracking:
+            self.idle_frames = 0
+            return True
+        self.idle_frames += 1
+        return self.idle_frames % self.recheck_every == 0
+
+    def state(self, skipped=False):
+        """Bloco `presence` da resposta"""
+        return {"present": self.moving, "motion": round(self.changed, 4), "skipped": skipped}
+
+
+def real_face(result):
+    """Se o resultado traz uma face encontrada de verdade, em qualquer engine
+
+    Sem face, o engine improved responde com uma face simulada no centro do
+    frame (`face_detected` true, `simulated` true), que não conta como pessoa.
+    """
+    return bool(result.get('face_detected')) and not result.get('simulated')
+
+
+def poll_state(result, present=None):
+    """Estado do quiosque a partir do resultado: 'idle', 'motion', 'face' ou 'smiling'"""
+    if real_face(result):
+        temporal = result.get('temporal') or {}
+        building = result.get('smile_score', 0.0) >= SMILE_BUILDING_RATIO * result.get('threshold', 0.5)
+        return 'smiling' if building or temporal.get('smiling') else 'face'
+    return 'motion' if present else 'idle'
+
+
+def next_poll(state):
+    """Bloco `next_poll` da resposta para um estado de POLL_PLAN"""
+    interval_ms, max_width, max_height = POLL_PLAN[state]
+    return {"state": state, "interval_ms": interval_ms, "max_width": max_width, "max_height": max_height}
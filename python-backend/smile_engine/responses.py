@@ -0,0 +1,155 @@
+"""Codificação das respostas de detecção: JSON, msgpack ou binário compacto
+
+O formato vem do campo `format` (JSON, query string ou opções do stream) ou
+do cabeçalho Accept. msgpack é opcional (`pip install msgpack`). O formato
+binário não depende de nada e tem layout fixo (little-endian), fácil de ler
+com um DataView no navegador:
+
+    resultado
+      u8  versão (BINARY_VERSION)
+      u8  flags (FLAG_*)
+      u16 número de registros de face a seguir (só no modo multi-face)
+      f32 smile_score
+      f32 threshold
+      i16 x, y, width, height da face_region (zeros sem face)
+      [temporal, se FLAG_TEMPORAL]
+        f32 smoothed_score, f32 median_score, u16 stable_frames,
+        u8 (1 = smiling, 2 = stable, 4 = stable_smile), u8 reservado
+      [faces]
+        i16 x, y, width, height, f32 smile_score, u8 smiling
+
+    lote (/api/detect-smile/batch): u16 frames, u16 erros, resultados em ordem
+    stream (WebSocket): u32 frame_seq, u32 dropped_frames, f32 latency_ms, resultado
+
+Os `details` e mensagens de erro só existem em JSON e msgpack; no binário um
+frame com erro tem apenas FLAG_ERROR.
+"""
+import json
+import struct
+
+try:
+    import msgpack
+except ImportError:  # Dependência opcional
+    msgpack = None
+
+RESPONSE_FORMATS = ('json', 'msgpack', 'binary')
+
+MIMETYPES = {
+    'json': 'application/json',
+    'msgpack': 'application/msgpack',
+    'binary': 'application/octet-stream',
+}
+
+# Tipos aceitos no cabeçalho Accept para cada formato
+_ACCEPT = (
+    ('application/msgpack', 'msgpack'),
+    ('application/x-msgpack', 'msgpack'),
+    ('application/octet-stream', 'binary'),
+)
+
+BINARY_VERSION = 1
+
+FLAG_FACE_DETECTED = 1
+FLAG_SMILING = 2
+FLAG_FACE_REGION = 4
+FLAG_MULTI_FACE = 8
+FLAG_ALL_SMILING = 16
+FLAG_TEMPORAL = 32
+FLAG_ERROR = 64
+FLAG_CACHE_HIT = 128
+
+_RESULT = struct.Struct('<BBHff4h')
+_TEMPORAL = struct.Struct('<ffHBx')
+_FACE = struct.Struct('<4hfB')
+_BATCH = struct.Struct('<HH')
+_STREAM = struct.Struct('<IIf')
+
+
+def response_format(source, accept=''):
+    """Formato pedido pelo cliente (campo `format` ou cabeçalho Accept); ValueError se inválido
+
+    Só um `format=msgpack` explícito falha sem msgpack instalado; pelo Accept
+    o servidor passa para o próximo tipo aceito (ou JSON).
+    """
+    value = source.get('format')
+    if not value:
+        value = next((name for mimetype, name in _ACCEPT
+                      if mimetype in (accept or '') and (name != 'msgpack' or msgpack is not None)), 'json')
+    if value not in RESPONSE_FORMATS:
+        raise ValueError(f"Unknown format: {value!r} (available: {', '.join(RESPONSE_FORMATS)})")
+    if value == 'msgpack' and msgpack is None:
+        raise ValueError("msgpack is not installed on the server (pip install msgpack)")
+    return value
+
+
+def _region(region):
+    return (int(region['x']), int(region['y']), int(region['width']), int(region['height']))
+
+
+def pack_result(result):
+    """Resultado de detecção no formato binário"""
+    flags = 0
+    if result.get('face_detected'):
+        flags |= FLAG_FACE_DETECTED
+    if result.get('smiling'):
+        flags |= FLAG_SMILING
+    region = result.get('face_region')
+    if region:
+        flags |= FLAG_FACE_REGION
+    faces = result.get('faces')
+    if faces is not None:
+        flags |= FLAG_MULTI_FACE
+        if result.get('all_smiling'):
+            flags |= FLAG_ALL_SMILING
+    temporal = result.get('temporal')
+    if temporal:
+        flags |= FLAG_TEMPORAL
+    if 'error' in result:
+        flags |= FLAG_ERROR
+    if (result.get('cache') or {}).get('hit'):
+        flags |= FLAG_CACHE_HIT
+
+    parts = [_RESULT.pack(
+        BINARY_VERSION, flags, len(faces or ()),
+        float(result.get('smile_score') or 0.0), float(result.get('threshold') or 0.0),
+        *(_region(region) if region else (0, 0, 0, 0))
+    )]
+    if temporal:
+        parts.append(_TEMPORAL.pack(
+            temporal['smoothed_score'], temporal['median_score'], min(temporal['stable_frames'], 0xFFFF),
+            temporal['smiling'] | temporal['stable'] << 1 | temporal['stable_smile'] << 2
+        ))
+    for face in faces or ():
+        parts.append(_FACE.pack(*_region(face['face_region']), face['smile_score'], face['smiling']))
+    return b''.join(parts)
+
+
+def _packb(payload):
+    # Escalares NumPy que escaparem viram tipos nativos
+    return msgpack.packb(payload, default=lambda value: value.item())
+
+
+def encode_result(result, fmt):
+    """Bytes de um resultado no formato pedido"""
+    if fmt == 'binary':
+        return pack_result(result)
+    if fmt == 'msgpack':
+        return _packb(result)
+    return json.dumps(result).encode()
+
+
+def encode_batch(payload, fmt):
+    """Bytes da resposta de lote ({"count", "errors", "results"}) no formato pedido"""
+    if fmt == 'binary':
+        return _BATCH.pack(payload['count'], payload['errors']) + b''.join(
+            pack_result(result) for result in payload['results'])
+    return encode_result(payload, fmt)
+
+
+def encode_stream_result(result, fmt):
+    """Mensagem do WebSocket: texto JSON ou bytes (msgpack / binário com prefixo do stream)"""
+    if fmt == 'json':
+        return json.dumps(result)
+    if fmt == 'binary':
+        return _STREAM.pack(result['frame_seq'], result['dropped_frames'], result['latency_ms']) + pack_result(result)
+    return _packb(result)
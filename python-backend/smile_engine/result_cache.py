@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def average_hash(frame, hash_size=16):
+    """Hash perceptual (aHash): frame reduzido a hash_size² pixels, bit = acima da média
+
+    A redução é feita direto no frame colorido (INTER_AREA já tira a média
+    dos blocos), sem converter o frame inteiro para cinza.
+    """
+    small = cv2.resize(frame, (hash_size, hash_size), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = small.mean(axis=2)
+    return np.packbits(small > small.mean())
+
+
+def options_key(options):
+    """Parte da chave que depende das opções da requisição (threshold, engine...)"""
+    strategies = options.get('strategies')
+    return (
+        float(options['threshold']),
+        options.get('engine'),
+        options.get('verbosity'),
+        options.get('decode_scale', 1),
+        options.get('face_size'),
+        bool(options.get('multi_face')),
+        bool(options.get('short_circuit')),
+        bool(options.get('presence')),
+        tuple(tuple(item) for item in strategies) if strategies else None,
+        tuple(sorted(options['face_params'].items())),
+    )
+
+
+class ResultCache:
+    """Cache LRU de resultados de detecção para frames quase idênticos
+
+    A chave é o aHash do frame decodificado + dimensões + opções da
+    requisição. Com `max_distance` > 0, hashes a até essa distância de
+    Hamming também contam como acerto. Entradas mais velhas que
+    `max_age_seconds` não são reaproveitadas, o que limita quanto tempo um
+    resultado pode ficar defasado em relação à câmera.
+    """
+
+    def __init__(self, max_entries=256, max_age_seconds=1.0, hash_size=16, max_distance=0):
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.hash_size = hash_size
+        self.max_distance = max_distance
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def key(self, frame, options):
+        return (frame.shape, options_key(options)), average_hash(frame, self.hash_size)
+
+    def get(self, key):
+        """Retorna (resultado, idade em segundos) ou None"""
+        scope, frame_hash = key
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry_key = (scope, frame_hash.tobytes())
+            entry = self._entries.get(entry_key)
+            if entry is None and self.max_distance > 0:
+                entry_key, entry = self._nearest(scope, frame_hash)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(entry_key)
+            self.hits += 1
+            _, result, created = entry
+            return result, now - created
+
+    def put(self, key, result):
+        scope, frame_hash = key
+        entry_key = (scope, frame_hash.tobytes())
+        with self._lock:
+            self._entries[entry_key] = (frame_hash, result, time.monotonic())
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _nearest(self, scope, frame_hash):
+        best_key, best_entry, best_distance = None, None, self.max_distance + 1
+        for entry_key, entry in self._entries.items():
+            if entry_key[0] != scope:
+                continue
+            distance = int(np.unpackbits(np.bitwise_xor(entry[0], frame_hash)).sum())
+            if distance < best_distance:
+                best_key, best_entry, best_distance = entry_key, entry, distance
+        return best_key, best_entry
+
+    def _expire(self, now):
+        # Entradas ficam em ordem de uso, não de criação: varre tudo (o cache é pequeno)
+        deadline = now - self.max_age_seconds
+        stale = [entry_key for entry_key, entry in self._entries.items() if entry[2] < deadline]
+        for entry_key in stale:
+            del self._entries[entry_key]
+        self.expirations += len(stale)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "max_age_seconds": self.max_age_seconds,
+                "hash_size": self.hash_size,
+                "max_distance": self.max_distance,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,571 @@
+import argparse
+import functools
+import logging
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+from flask import Flask, Response, g, request, jsonify
+from flask_cors import CORS
+from flask_sock import Sock
+
+from . import metrics
+from .capture import FINISH_TIMEOUT, MAX_WINDOW_SECONDS, CaptureStore, CaptureWindow, parse_window_params
+from .classifier import load_model
+from .config import apply_config, load_config
+from .frame_io import (DECODE_SCALES, FrameDecodeError, decode_data_url, decode_request_body, payload_kind,
+                       read_request_batch, read_request_body, read_request_frame)
+from .frame_stream import serve_frame_stream
+from .memory import FrameSlots, ServerBusy, buffers
+from .models import preload_models, warm_up
+from .detector import run_engine, with_presence
+from .result_cache import ResultCache
+from .options import DEFAULT_OPTIONS, ENGINES, VERBOSITY_LEVELS, parse_detection_options
+from .responses import MIMETYPES, encode_batch, encode_result, response_format
+from .sessions import DetectionSession, SessionStore
+from .shared_frames import DEFAULT_SLOT_BYTES
+from .workers import DetectionPool
+
+app = Flask(__name__)
+CORS(app)
+sock = Sock(app)
+
+sessions = SessionStore()
+# Pool de processos de detecção (ativado com --workers)
+detection_pool = None
+# Opções de detecção do servidor; cada requisição pode sobrescrevê-las
+server_options = dict(DEFAULT_OPTIONS)
+# Cache de resultados para frames quase idênticos (ativado com --cache-size)
+result_cache = None
+# Threads que decodificam e despacham os frames de /api/detect-smile/batch
+batch_pool = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1))
+# Janelas de captura abertas (/api/capture/<id>/...)
+captures = CaptureStore()
+# Limite de frames em processamento (--max-in-flight); sem limite no modo de desenvolvimento
+frame_slots = FrameSlots()
+# Estado de /api/ready: modelos carregados e pipeline aquecido
+readiness = {"ready": False, "models": None, "workers": None, "warmup_ms": None}
+
+
+# Marcado no primeiro SIGTERM (ver _handle_sigterm)
+shutdown_requested = threading.Event()
+
+
+def _handle_sigterm(signum, frame):
+    """SIGTERM (docker stop, systemd): remove o anel de frames e encerra, uma vez só
+
+    Um segundo SIGTERM chegaria durante o encerramento (join das threads,
+    atexit) e um novo SystemExit ali quebraria a limpeza: é ignorado.
+    """
+    if shutdown_requested.is_set():
+        return
+    shutdown_requested.set()
+    if detection_pool is not None and detection_pool.ring is not None:
+        detection_pool.ring.close()
+    raise SystemExit(0)
+
+
+# Campos da resposta que dependem da sessão e não do frame
+SESSION_FIELDS = ('temporal', 'presence', 'next_poll')
+
+
+def run_detection(img, options, session=None):
+    """Roda a detecção (ou reaproveita a de um frame quase idêntico)"""
+    if result_cache is None:
+        return _detect(img, options, session)
+
+    with metrics.stage('cache_lookup'):
+        key = result_cache.key(img, options)
+        cached = result_cache.get(key)
+    metrics.registry.increment('cache_lookups_total', labels=(('result', 'miss' if cached is None else 'hit'),))
+
+    if cached is None:
+        result = _detect(img, options, session)
+        # Blocos da sessão (temporal, presença, ritmo) não são do frame: não vão para o cache,
+        # e um frame pulado por falta de movimento não diz nada sobre faces
+        if not result.get('presence', {}).get('skipped'):
+            result_cache.put(key, {k: v for k, v in result.items() if k not in SESSION_FIELDS})
+        result = dict(result, cache={"hit": False, "age_ms": 0.0})
+        return result
+
+    result, age = cached
+    result = dict(result, cache={"hit": True, "age_ms": round(age * 1000, 2)})
+    if session is not None:
+        _repeat_session(result, options, session)
+    if options.get('presence'):
+        if session is not None:
+            # O frame repetido também alimenta o fundo, senão o next_poll não desacelera
+            with metrics.stage('presence'):
+                session.presence.update(img)
+        result = with_presence(result, session)
+    return result
+
+
+def _repeat_session(result, options, session):
+    """Avança rastreamento e suavização da sessão com um resultado vindo do cache"""
+    if options['engine'] not in ('improved', 'classifier'):
+        return  # Os engines legados não usam o estado temporal
+    if result.get('tracking_mode') is None:
+        session.tracker.reset()
+        session.smoother.reset()
+        return
+    # Regiões da resposta estão na escala do frame original; o rastreador usa a analisada
+    scale = options.get('decode_scale', 1)
+    regions = [face['face_region'] for face in result.get('faces') or ()] or [result['face_region']]
+    session.tracker.repeat(
+        (r['x'] // scale, r['y'] // scale, r['width'] // scale, r['height'] // scale) for r in regions
+    )
+    # O frame repetido ainda conta para a suavização e para a estabilidade do sorriso
+    result['temporal'] = session.smoother.update(result['smile_score'], result['threshold'])
+
+
+def _detect(img, options, session=None):
+    """Roda a detecção neste processo ou no pool de workers, se configurado"""
+    with metrics.stage('detect'):
+        if detection_pool is not None:
+            return detection_pool.detect(img, options, session)
+        return run_engine(img, options, session)
+
+
+def detect_with_session(img, options, session_id):
+    """Detecta usando o estado temporal do cliente quando ele informa um session_id"""
+    if not session_id:
+        return run_detection(img, options)
+    session = sessions.get(session_id)
+    with session.lock:
+        return run_detection(img, options, session)
+
+
+def server_busy(error):
+    metrics.registry.increment('frames_rejected_total')
+    response = jsonify({"error": str(error)})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+def limit_frames(route):
+    """Reserva uma vaga de frame antes de ler o corpo; 503 se o servidor está cheio
+
+    A rota pode reservar mais vagas (lotes) com `g.frame_slots`, que são
+    devolvidas junto com a primeira ao fim da requisição.
+    """
+    @functools.wraps(route)
+    def wrapper(*args, **kwargs):
+        try:
+            g.frame_slots = frame_slots.acquire()
+            return route(*args, **kwargs)
+        except ServerBusy as e:
+            return server_busy(e)
+        finally:
+            frame_slots.release(g.pop('frame_slots', 0))
+    return wrapper
+
+
+def reserve_batch_slots(count):
+    """Completa as vagas da requisição até uma por frame do lote"""
+    g.frame_slots += frame_slots.acquire(count - g.frame_slots, held=g.frame_slots)
+
+
+def detection_response(result, fmt='json', batch=False):
+    """Resposta HTTP no formato pedido (JSON, msgpack ou binário compacto)"""
+    with metrics.stage(fmt):
+        if fmt == 'json':
+            return jsonify(result)
+        body = encode_batch(result, fmt) if batch else encode_result(result, fmt)
+        return Response(body, mimetype=MIMETYPES[fmt])
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request(response):
+    endpoint = request.endpoint or 'unknown'
+    metrics.registry.increment('requests_total', labels=(('endpoint', endpoint), ('status', str(response.status_code))))
+    started = g.get('request_started')
+    if started is not None:
+        metrics.observe('request_duration_seconds', time.perf_counter() - started, endpoint=endpoint)
+    return response
+
+
+@app.route('/api/health', methods=['GET'])
+def health():
+    return jsonify({
+        "status": "ok",
+        "message": "Improved Python Smile Detector running",
+        "engine": server_options['engine'],
+        "cache": result_cache.stats() if result_cache is not None else None,
+        "frames": frame_slots.stats(),
+        "buffers": buffers.stats(),
+        "frame_ring": detection_pool.ring.stats() if detection_pool is not None and detection_pool.ring else None
+    })
+
+
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 503 até os modelos estarem carregados e aquecidos"""
+    return jsonify(readiness), 200 if readiness['ready'] else 503
+
+
+def warm_up_server(engines):
+    """Aquece o pipeline (neste processo ou em cada worker) e marca o servidor como pronto"""
+    started = time.perf_counter()
+    if detection_pool is not None:
+        detection_pool.warm_up()
+        readiness['workers'] = detection_pool.processes
+    else:
+        warm_up(engines, server_options)
+    readiness['warmup_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    readiness['ready'] = True
+    print(f"✅ Pronto em {readiness['warmup_ms']:.0f}ms (readiness: /api/ready)")
+
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics_api():
+    """Latências por etapa, tamanhos de frame e faces por frame (formato Prometheus)"""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/detect-smile', methods=['POST'])
+@limit_frames
+def detect_smile_api():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    if 'image' not in data:
+        return jsonify({"error": "No image data provided"}), 400
+    if not isinstance(data['image'], str):
+        return jsonify({"error": "image must be a data URL or base64 string"}), 400
+
+    metrics.observe('request_bytes', len(data['image']), endpoint='json')
+    try:
+        options = parse_detection_options(data, server_options)
+        fmt = response_format(data, request.headers.get('Accept'))
+        with metrics.stage('decode'):
+            img = decode_data_url(data['image'], scale=options['decode_scale'])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    detection_result = detect_with_session(img, options, data.get('session_id'))
+    return detection_response(detection_result, fmt)
+
+
+@app.route('/api/detect-smile/binary', methods=['POST'])
+@limit_frames
+def detect_smile_binary_api():
+    """Mesmo resultado de /api/detect-smile, mas com o frame binário no corpo"""
+    metrics.observe('request_bytes', request.content_length or 0, endpoint='binary')
+    try:
+        options = parse_detection_options(request.args, server_options)
+        fmt = response_format(request.args, request.headers.get('Accept'))
+        with metrics.stage('decode'):
+            img = read_request_frame(request, scale=options['decode_scale'])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    session_id = request.args.get('session_id') or request.headers.get('X-Session-Id')
+    detection_result = detect_with_session(img, options, session_id)
+    return detection_response(detection_result, fmt)
+
+
+def _decode_batch_frame(decode, buffer):
+    try:
+        return decode(buffer)
+    except FrameDecodeError as e:
+        return e
+    except cv2.error as e:
+        # Asserção do OpenCV num frame malformado: erro só deste item
+        return FrameDecodeError(f"Could not decode image ({e.err})")
+
+
+def _detect_batch_frame(frame, options, session=None):
+    if isinstance(frame, FrameDecodeError):
+        return {"error": str(frame)}
+    return run_detection(frame, options, session)
+
+
+@app.route('/api/detect-smile/batch', methods=['POST'])
+@limit_frames
+def detect_smile_batch_api():
+    """Vários frames numa requisição: multipart ou binário concatenado com X-Frame-Lengths"""
+    metrics.observe('request_bytes', request.content_length or 0, endpoint='batch')
+    try:
+        options = parse_detection_options(request.values, server_options)
+        fmt = response_format(request.values, request.headers.get('Accept'))
+        buffers, decode = read_request_batch(request, scale=options['decode_scale'])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    reserve_batch_slots(len(buffers))
+
+    # Frames com erro de decodificação viram um item com "error", sem derrubar o lote
+    with metrics.stage('decode'):
+        frames = list(batch_pool.map(lambda buffer: _decode_batch_frame(decode, buffer), buffers))
+
+    session_id = request.values.get('session_id') or request.headers.get('X-Session-Id')
+    if session_id:
+        # Com sessão os frames são uma sequência: rastreamento e suavização em ordem
+        session = sessions.get(session_id)
+        with session.lock:
+            results = [_detect_batch_frame(frame, options, session) for frame in frames]
+    else:
+        # Sem sessão os frames são independentes e rodam em paralelo (threads ou workers)
+        results = list(batch_pool.map(lambda frame: _detect_batch_frame(frame, options), frames))
+
+    for index, result in enumerate(results):
+        result["index"] = index
+    return detection_response({
+        "count": len(results),
+        "errors": sum("error" in result for result in results),
+        "results": results
+    }, fmt, batch=True)
+
+
+def _capture_options(source):
+    # Só o score e a região interessam ao ranking: sem details nem multi-face
+    return dict(parse_detection_options(source, server_options), verbosity='minimal', multi_face=False)
+
+
+@app.route('/api/capture/<capture_id>/frames', methods=['POST'])
+def capture_frame_api(capture_id):
+    """Um frame da janela de captura (corpo como em /binary); a pontuação roda em segundo plano
+
+    A janela é aberta no primeiro frame com `top_k` e `window_ms` da query string.
+    A vaga do frame só é devolvida depois da pontuação em segundo plano.
+    """
+    metrics.observe('request_bytes', request.content_length or 0, endpoint='capture')
+    try:
+        frame_slots.acquire()
+    except ServerBusy as e:
+        return server_busy(e)
+
+    def score(img):
+        try:
+            return run_detection(img, options)
+        finally:
+            frame_slots.release()
+
+    status = None
+    try:
+        try:
+            options = _capture_options(request.args)
+            top_k, window_seconds = parse_window_params(request.args)
+            buffer = read_request_body(request)
+            kind = payload_kind(buffer, request)
+            with metrics.stage('decode'):
+                frame = decode_request_body(buffer, request, scale=options['decode_scale'])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        window = captures.get(capture_id, create=lambda: CaptureWindow(top_k, window_seconds))
+        if window is None:
+            status = "closed"
+        else:
+            status = window.submit(batch_pool, score, frame, (buffer, kind), options['decode_scale'])
+    finally:
+        if status != "queued":
+            frame_slots.release()
+
+    metrics.registry.increment('capture_frames_total', labels=(('status', status),))
+    if window is None:
+        # Retentativa atrasada de uma janela já finalizada: não abre outra com o mesmo id
+        return jsonify({"capture_id": capture_id, "status": status,
+                        "error": f"Capture window already finished: {capture_id}"}), 409
+    body = {
+        "capture_id": capture_id,
+        "status": status,
+        "frames": window.received,
+        "dropped": window.dropped,
+        "remaining_ms": max(0, round((window.deadline - time.monotonic()) * 1000)),
+    }
+    return jsonify(body), 409 if status == "closed" else 202
+
+
+@app.route('/api/capture/<capture_id>/finish', methods=['POST'])
+def capture_finish_api(capture_id):
+    """Fecha a janela e devolve o melhor frame (data URL + caixa de recorte) e o top-K"""
+    window = captures.pop(capture_id)
+    if window is None:
+        if captures.is_finished(capture_id):
+            return jsonify({"error": f"Capture window already finished: {capture_id}"}), 409
+        return jsonify({"error": f"Unknown capture window: {capture_id}"}), 404
+    return jsonify(dict(window.finish(FINISH_TIMEOUT), capture_id=capture_id))
+
+
+@app.route('/api/capture', methods=['POST'])
+@limit_frames
+def capture_batch_api():
+    """Janela inteira numa requisição (corpo como em /batch); devolve o melhor frame"""
+    metrics.observe('request_bytes', request.content_length or 0, endpoint='capture')
+    try:
+        options = _capture_options(request.values)
+        top_k, _ = parse_window_params(request.values)
+        buffers, decode = read_request_batch(request, scale=options['decode_scale'])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    reserve_batch_slots(len(buffers))
+
+    with metrics.stage('decode'):
+        frames = list(batch_pool.map(lambda buffer: _decode_batch_frame(decode, buffer), buffers))
+
+    # Todos os frames já chegaram: nada é descartado por backpressure
+    window = CaptureWindow(top_k, MAX_WINDOW_SECONDS, max_pending=max(1, len(frames)))
+    decode_errors = 0
+    for buffer, frame in zip(buffers, frames):
+        if isinstance(frame, FrameDecodeError):
+            decode_errors += 1
+            continue
+        window.submit(batch_pool, lambda img: run_detection(img, options), frame,
+                      (buffer, payload_kind(buffer, request)), options['decode_scale'])
+    result = window.finish(FINISH_TIMEOUT)
+    result["frames"] += decode_errors
+    result["errors"] += decode_errors
+    return jsonify(result)
+
+
+@sock.route('/api/detect-smile/stream')
+def detect_smile_stream(ws):
+    """Detecção contínua via WebSocket: frames binários entram, resultados JSON saem"""
+    # A própria conexão é a sessão: o rastreamento de faces vale enquanto ela durar
+    session = DetectionSession()
+
+    def process_frame(frame, options):
+        try:
+            options = parse_detection_options(options, server_options)
+        except ValueError as e:
+            return {"error": str(e)}
+        try:
+            frame_slots.acquire()
+        except ServerBusy as e:
+            metrics.registry.increment('frames_rejected_total')
+            return {"error": str(e)}
+        try:
+            return run_detection(frame, options, session)
+        except ServerBusy as e:
+            return {"error": str(e)}
+        finally:
+            frame_slots.release()
+
+    serve_frame_stream(ws, process_frame, server_options['decode_scale'])
+
+
+def main(default_port=5001, default_engine='improved', description='Improved Python Smile Detector'):
+    """Linha de comando comum aos três scripts de servidor"""
+    global detection_pool, server_options, result_cache, batch_pool
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--port', type=int, default=default_port)
+    parser.add_argument('--engine', choices=ENGINES, default=default_engine,
+                        help='engine de detecção padrão (cada requisição pode escolher outro)')
+    parser.add_argument('--strategies',
+                        help='estratégias padrão do engine improved, ex.: "haar,pixel:0.5,texture"')
+    parser.add_argument('--config',
+                        help='config calibrada por calibrate.py (pesos, cortes, boosts e threshold)')
+    parser.add_argument('--model',
+                        help='classificador treinado por train_classifier.py (habilita o engine classifier)')
+    parser.add_argument('--decode-scale', type=int, choices=DECODE_SCALES, default=1,
+                        help='analisa os frames em 1/N da resolução (decodificação reduzida)')
+    parser.add_argument('--face-size', type=int,
+                        help='normaliza cada face para este lado (px) antes de pontuar, ex.: 160')
+    parser.add_argument('--presence', action='store_true',
+                        help='pula a detecção sem movimento na sessão e sugere o ritmo de envio (next_poll)')
+    parser.add_argument('--verbosity', choices=VERBOSITY_LEVELS, default='full',
+                        help='diagnóstico padrão nas respostas (cada requisição pode escolher outro)')
+    parser.add_argument('--short-circuit', action='store_true',
+                        help='pula estratégias caras quando as baratas já decidem o resultado')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='processos de detecção (0 = servidor de desenvolvimento, sem pool)')
+    parser.add_argument('--opencv-threads', type=int, default=1,
+                        help='threads do OpenCV por processo worker')
+    parser.add_argument('--scale-factor', type=float, help='scaleFactor do detector de faces')
+    parser.add_argument('--min-neighbors', type=int, help='minNeighbors do detector de faces')
+    parser.add_argument('--min-size', type=int, help='minSize (lado, em pixels) do detector de faces')
+    parser.add_argument('--min-face-size', type=int,
+                        help='menor face esperada em pixels; ativa a detecção numa cópia reduzida')
+    parser.add_argument('--max-in-flight', type=int,
+                        help='frames em processamento ao mesmo tempo; acima disso 503 '
+                             '(padrão: 2 por worker; 0 = sem limite)')
+    parser.add_argument('--frame-ring', type=int,
+                        help='vagas em memória compartilhada para passar frames aos workers '
+                             '(padrão: uma por frame em processamento; 0 = pickle)')
+    parser.add_argument('--frame-ring-slot-bytes', type=int, default=DEFAULT_SLOT_BYTES,
+                        help='maior frame (bytes) que cabe numa vaga; maiores vão por pickle')
+    parser.add_argument('--cache-size', type=int, default=0,
+                        help='resultados guardados para frames quase idênticos (0 = sem cache)')
+    parser.add_argument('--cache-max-age', type=float, default=1.0,
+                        help='idade máxima (s) de um resultado reaproveitado')
+    parser.add_argument('--cache-hash-size', type=int, default=16,
+                        help='lado do aHash; menor = mais frames considerados iguais')
+    parser.add_argument('--cache-max-distance', type=int, default=0,
+                        help='distância de Hamming aceita entre hashes (0 = hash idêntico)')
+    parser.add_argument('--log-level', default='WARNING',
+                        choices=('DEBUG', 'INFO', 'WARNING', 'ERROR'),
+                        help='nível de log (DEBUG mostra cada frame; desligado por padrão)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    config = None
+    defaults = DEFAULT_OPTIONS
+    try:
+        if args.config:
+            config = load_config(args.config)
+            defaults = dict(DEFAULT_OPTIONS, **apply_config(config))
+        if args.model:
+            model = load_model(args.model)
+        server_options = parse_detection_options(vars(args), defaults)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    max_in_flight = args.max_in_flight
+    if max_in_flight is None and args.workers > 0:
+        max_in_flight = 2 * args.workers
+    if max_in_flight:
+        frame_slots.limit = max_in_flight
+
+    if args.cache_size > 0:
+        result_cache = ResultCache(args.cache_size, args.cache_max_age, args.cache_hash_size, args.cache_max_distance)
+
+    print(f"🚀 Iniciando {description} (engine: {args.engine})...")
+    if config is not None:
+        print(f"🎛️  Config calibrada: {args.config} (threshold {server_options['threshold']})")
+    if args.model:
+        print(f"🧠 Classificador {model.kind}: {args.model} (engine classifier, threshold do modelo)")
+    print(f"📊 Health check: http://localhost:{args.port}/api/health")
+    print(f"🎯 Detect smile: http://localhost:{args.port}/api/detect-smile")
+    print(f"📈 Métricas: http://localhost:{args.port}/api/metrics")
+
+    # Cascades carregados uma vez aqui, antes do fork dos workers
+    engines = (server_options['engine'],)
+    if args.model and 'classifier' not in engines:
+        engines += ('classifier',)
+    readiness['models'] = preload_models(engines)
+
+    if args.workers > 0:
+        ring_slots = args.frame_ring if args.frame_ring is not None else (frame_slots.limit or 2 * args.workers)
+        detection_pool = DetectionPool(args.workers, args.opencv_threads, config, engines, args.model,
+                                       ring_slots, args.frame_ring_slot_bytes)
+        detection_pool.start()
+        # Um frame do lote em cada worker ao mesmo tempo
+        batch_pool = ThreadPoolExecutor(max_workers=max(args.workers, min(8, os.cpu_count() or 1)))
+        print(f"⚙️  Pool de detecção com {args.workers} workers")
+        if detection_pool.ring is not None:
+            ring = detection_pool.ring
+            print(f"🔁 Frames para os workers por memória compartilhada: {ring.slots} vagas de "
+                  f"{ring.slot_bytes / 2**20:.1f} MB")
+            signal.signal(signal.SIGTERM, _handle_sigterm)
+    if frame_slots.limit:
+        print(f"🧱 Até {frame_slots.limit} frames em processamento (acima disso 503)")
+
+    # O servidor já atende (health, ready) enquanto o aquecimento roda
+    threading.Thread(target=warm_up_server, args=(engines,), daemon=True).start()
+    if args.workers > 0:
+        # Ainda é o servidor do Werkzeug (uma thread por requisição), só que sem debug
+        # nem reloader: o flask-sock depende dele para o WebSocket
+        app.run(host='0.0.0.0', port=args.port, debug=False, threaded=True)
+    else:
+        app.run(host='0.0.0.0', port=args.port, debug=True)
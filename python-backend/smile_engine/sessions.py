@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import OrderedDict
+
+from .face_tracking import FaceTracker
+from .presence import PresenceDetector
+from .smile_smoothing import SmileSmoother
+
+
+class DetectionSession:
+    """Estado temporal de um cliente (quiosque) entre frames consecutivos"""
+
+    def __init__(self, session_id=None):
+        self.session_id = session_id
+        self.tracker = FaceTracker()
+        self.smoother = SmileSmoother()
+        self.presence = PresenceDetector()
+        # Frames da mesma sessão são processados em ordem, um por vez
+        self.lock = threading.Lock()
+        self.last_seen = time.monotonic()
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+    def __getstate__(self):
+        # A sessão viaja até os workers de detecção; o lock fica no front end
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+
+class SessionStore:
+    """Sessões por cliente com expiração por inatividade e limite de tamanho"""
+
+    def __init__(self, ttl_seconds=60.0, max_sessions=256):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """Retorna a sessão do cliente, criando uma nova se necessário"""
+        with self._lock:
+            self._expire()
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                session = DetectionSession(session_id)
+                while len(self._sessions) >= self.max_sessions:
+                    self._sessions.popitem(last=False)
+            self._sessions[session_id] = session
+            session.touch()
+            return session
+
+    def _expire(self):
+        deadline = time.monotonic() - self.ttl_seconds
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.last_seen >= deadline:
+                break
+            self._sessions.popitem(last=False)
+
+    def __len__(self):
+        return len(self._sessions)
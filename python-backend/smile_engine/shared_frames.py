@@ -0,0 +1,187 @@
+"""Transporte de frames entre o front end e os workers por memória compartilhada
+
+Sem isto, cada frame decodificado vai para o worker serializado com pickle
+(cópia para o pipe, cópia de volta e um array novo do outro lado). Com o
+anel, o front end copia o frame uma vez para uma vaga pré-alocada de um
+único `multiprocessing.shared_memory` e manda ao worker só um `SharedFrame`
+(nome, vaga, geração, forma); o worker monta uma view NumPy sobre a mesma
+memória e roda a detecção nela. Só o resultado (um dict pequeno) volta.
+
+Layout do segmento: um int64 por vaga com a geração atual (0 = livre),
+seguido das vagas, cada uma com `slot_bytes` alinhados a 64 bytes.
+
+Reciclagem: a vaga só volta para a lista livre quando o front end recebe o
+resultado (ou o erro) do worker. Cada uso grava uma geração nova no
+cabeçalho; o worker confere a geração antes e depois da detecção e falha
+com RuntimeError se a vaga foi reciclada no meio, em vez de devolver um
+resultado de outro frame.
+
+Sobrecarga: quem limita os frames no servidor é `FrameSlots` (503). O anel
+nunca bloqueia a requisição: sem vaga livre, ou com um frame maior que
+`slot_bytes`, o frame segue pelo caminho antigo (pickle) e a ocorrência é
+contada em `stats()`.
+"""
+import sys
+import threading
+from multiprocessing import resource_tracker, shared_memory
+from typing import NamedTuple
+
+import numpy as np
+
+# Maior frame que cabe numa vaga por padrão: Full HD em cinza (o decode padrão)
+DEFAULT_SLOT_BYTES = 1920 * 1080
+_ALIGN = 64
+
+
+def _aligned(size):
+    return -(-size // _ALIGN) * _ALIGN
+
+
+class SharedFrame(NamedTuple):
+    """Referência a um frame no anel: é só isto que vai para o worker"""
+    name: str
+    slots: int
+    slot_bytes: int
+    slot: int
+    generation: int
+    shape: tuple
+    dtype: str
+
+
+def _header(buffer, slots):
+    return np.ndarray((slots,), np.int64, buffer=buffer)
+
+
+def _slot_view(buffer, slots, slot_bytes, slot, shape, dtype):
+    offset = _aligned(slots * 8) + slot * slot_bytes
+    return np.ndarray(shape, dtype, buffer=buffer, offset=offset)
+
+
+class FrameRing:
+    """Vagas de frame em memória compartilhada, alocadas e liberadas pelo front end"""
+
+    def __init__(self, slots, slot_bytes=DEFAULT_SLOT_BYTES):
+        if slots < 1 or slot_bytes < 1:
+            raise ValueError("Frame ring needs at least one slot and a positive slot size")
+        self.slots = slots
+        self.slot_bytes = _aligned(slot_bytes)
+        self._memory = shared_memory.SharedMemory(create=True, size=_aligned(slots * 8) + slots * self.slot_bytes)
+        self.name = self._memory.name
+        self._header = _header(self._memory.buf, slots)
+        self._header[:] = 0
+        self._free = list(range(slots - 1, -1, -1))
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.shared = 0
+        self.full = 0
+        self.oversize = 0
+
+    def put(self, frame):
+        """Copia o frame para uma vaga livre e retorna o SharedFrame, ou None (ver docstring do módulo)"""
+        if frame.nbytes > self.slot_bytes:
+            with self._lock:
+                self.oversize += 1
+            return None
+        with self._lock:
+            if self._memory is None or not self._free:
+                self.full += 1
+                return None
+            slot = self._free.pop()
+            self._generation += 1
+            generation = self._generation
+            self.shared += 1
+        view = _slot_view(self._memory.buf, self.slots, self.slot_bytes, slot, frame.shape, frame.dtype)
+        np.copyto(view, frame)
+        # A geração só é publicada com os pixels já copiados
+        self._header[slot] = generation
+        return SharedFrame(self.name, self.slots, self.slot_bytes, slot, generation, frame.shape, frame.dtype.str)
+
+    def release(self, frame):
+        """Devolve a vaga (o worker já terminou de usá-la)"""
+        with self._lock:
+            if self._memory is None or self._header[frame.slot] != frame.generation:
+                return
+            self._header[frame.slot] = 0
+            self._free.append(frame.slot)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "slot_bytes": self.slot_bytes,
+                "in_use": self.slots - len(self._free),
+                "shared": self.shared,
+                "fallback_full": self.full,
+                "fallback_oversize": self.oversize,
+            }
+
+    def close(self):
+        """Libera e remove o segmento (idempotente)"""
+        with self._lock:
+            memory, self._memory = self._memory, None
+            self._free = []
+        if memory is None:
+            return
+        self._header = None
+        try:
+            memory.close()
+        except BufferError:
+            pass  # Uma view ainda viva (saída no meio de um frame): o unlink basta
+        memory.unlink()
+
+
+# Segmentos já anexados neste processo worker, por nome
+_attached = {}
+
+
+def _open_untracked(name):
+    """Abre um segmento existente sem registrá-lo no resource_tracker
+
+    Quem cria e remove o segmento é o front end. Antes do Python 3.13 anexar
+    também registra o segmento, e o rastreador do worker o removeria de
+    /dev/shm quando o worker terminasse. Um `unregister` depois de anexar não
+    serve com fork: o rastreador é o mesmo do front end e perderia o registro
+    dele.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    register = resource_tracker.register
+
+    def register_others(resource, rtype):
+        if rtype != 'shared_memory':
+            register(resource, rtype)
+
+    resource_tracker.register = register_others
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def attach(name):
+    """Anexa (uma vez por processo) o segmento do anel `name`, sem rastreá-lo"""
+    memory = _attached.get(name)
+    if memory is None:
+        memory = _attached[name] = _open_untracked(name)
+    return memory
+
+
+def frame_view(frame):
+    """View NumPy somente leitura do frame na vaga; RuntimeError se a vaga foi reciclada
+
+    A view não pode sobreviver à tarefa: depois de `check_generation` o
+    front end pode reaproveitar a vaga.
+    """
+    buffer = attach(frame.name).buf
+    check_generation(frame)
+    view = _slot_view(buffer, frame.slots, frame.slot_bytes, frame.slot, frame.shape, np.dtype(frame.dtype))
+    view.flags.writeable = False
+    return view
+
+
+def check_generation(frame):
+    """Confere que a vaga ainda guarda este frame"""
+    generation = int(_header(attach(frame.name).buf, frame.slots)[frame.slot])
+    if generation != frame.generation:
+        raise RuntimeError(f"Shared frame slot {frame.slot} was recycled "
+                           f"(generation {generation}, expected {frame.generation})")
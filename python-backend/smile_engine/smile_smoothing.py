@@ -0,0 +1,52 @@
+from collections import deque
+
+import numpy as np
+
+
+class SmileSmoother:
+    """Suavização temporal e histerese da decisão de sorriso de uma sessão
+
+    Mantém os últimos `window` smile scores, calcula EMA e mediana e só
+    troca o estado quando a EMA cruza `threshold ± hysteresis`. Um sorriso
+    é considerado estável depois de `stable_frames` frames seguidos sorrindo.
+    """
+
+    def __init__(self, window=5, ema_alpha=0.5, hysteresis=0.05, stable_frames=3):
+        self.scores = deque(maxlen=window)
+        self.ema_alpha = ema_alpha
+        self.hysteresis = hysteresis
+        self.stable_frames = stable_frames
+        self.ema = None
+        self.smiling = False
+        self.streak = 0
+
+    def reset(self):
+        self.scores.clear()
+        self.ema = None
+        self.smiling = False
+        self.streak = 0
+
+    def update(self, score, threshold):
+        """Registra o score do frame e retorna o bloco `temporal` da resposta"""
+        self.scores.append(score)
+        if self.ema is None:
+            self.ema = score
+        else:
+            self.ema = self.ema_alpha * score + (1 - self.ema_alpha) * self.ema
+
+        if self.smiling:
+            self.smiling = self.ema >= threshold - self.hysteresis
+        else:
+            self.smiling = self.ema > threshold + self.hysteresis
+
+        self.streak = self.streak + 1 if self.smiling else 0
+
+        return {
+            "smoothed_score": float(self.ema),
+            "median_score": float(np.median(self.scores)),
+            "smiling": self.smiling,
+            "stable_frames": self.streak,
+            "stable": self.streak >= self.stable_frames,
+            # Evento disparado uma única vez, no frame em que o sorriso estabiliza
+            "stable_smile": self.streak == self.stable_frames,
+        }
@@ -0,0 +1,138 @@
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+
+class ScoringStrategy(NamedTuple):
+    """Heurística de sorriso registrada no engine
+
+    `score(f, p)` recebe um mapeamento nome da característica -> array (uma
+    posição por face) e os parâmetros (cortes) da estratégia, e devolve um
+    score 0-1 por face. `cost` é o custo relativo de calcular as
+    características de que ela depende (estratégias baratas rodam primeiro).
+    `strong_above` define quando o score conta como indicador forte para o
+    boost. Os cortes em `params` podem ser recalibrados (ver calibrate.py).
+    """
+    name: str
+    cost: int
+    weight: float
+    strong_above: float
+    fields: tuple
+    score: Callable
+    params: dict
+
+
+STRATEGIES = {}
+
+# Combinação padrão (a do improved_smile_detector)
+DEFAULT_STRATEGIES = ('haar', 'pixel', 'contour', 'texture', 'asymmetry')
+
+
+def register_strategy(name, cost, weight, fields, strong_above=0.6, params=None):
+    def decorator(func):
+        STRATEGIES[name] = ScoringStrategy(name, cost, weight, strong_above, tuple(fields), func, dict(params or {}))
+        return func
+    return decorator
+
+
+def update_strategy(name, weight=None, params=None):
+    """Troca o peso padrão e/ou cortes de uma estratégia registrada (config calibrada)"""
+    strategy = STRATEGIES[name]
+    unknown = set(params or {}) - set(strategy.params)
+    if unknown:
+        raise ValueError(f"Unknown parameters for strategy {name!r}: {', '.join(sorted(unknown))}")
+    STRATEGIES[name] = strategy._replace(
+        weight=strategy.weight if weight is None else float(weight),
+        params=dict(strategy.params, **{key: float(value) for key, value in (params or {}).items()})
+    )
+
+
+def parse_strategies(spec=None):
+    """Converte 'haar,pixel:0.5' (ou uma lista de nomes/pares) em [(estratégia, peso), ...]"""
+    if spec is None or spec == '' or spec == []:
+        spec = DEFAULT_STRATEGIES
+    if isinstance(spec, str):
+        spec = spec.split(',')
+
+    selection = []
+    for item in spec:
+        if isinstance(item, (tuple, list)):
+            name, weight = item[0], str(item[1])
+        else:
+            name, _, weight = str(item).strip().partition(':')
+        if name not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {name!r} (available: {', '.join(sorted(STRATEGIES))})")
+        strategy = STRATEGIES[name]
+        try:
+            weight = float(weight) if weight else strategy.weight
+        except ValueError:
+            raise ValueError(f"Invalid weight for strategy {name!r}: {weight!r}")
+        if weight < 0:
+            raise ValueError(f"Invalid weight for strategy {name!r}: {weight!r}")
+        selection.append((strategy, weight))
+
+    if not any(weight > 0 for _, weight in selection):
+        raise ValueError("At least one strategy needs a positive weight")
+    return selection
+
+
+@register_strategy('haar', cost=3, weight=0.3, fields=('smile_detected',), strong_above=0.8)
+def haar_strategy(f, p):
+    """Haar Cascade de sorriso na face (scaleFactor=1.3, minNeighbors=15)"""
+    return 1.0 * (f['smile_detected'] > 0)
+
+
+@register_strategy('pixel', cost=1, weight=0.25,
+                   fields=('mean_brightness', 'brightness_variance', 'iqr', 'brightness_std'),
+                   params={'max_mean_brightness': 85, 'min_variance': 800, 'min_iqr': 40, 'min_std': 25})
+def pixel_strategy(f, p):
+    """Brilho, variância, IQR e desvio padrão da boca"""
+    return np.minimum(1.0, (
+        0.3 * (f['mean_brightness'] < p['max_mean_brightness'])  # Boca mais escura (aberta)
+        + 0.3 * (f['brightness_variance'] > p['min_variance'])   # Mais variação (textura da boca)
+        + 0.2 * (f['iqr'] > p['min_iqr'])                        # Maior dispersão de brilho
+        + 0.2 * (f['brightness_std'] > p['min_std'])             # Desvio padrão alto
+    ))
+
+
+@register_strategy('brightness', cost=1, weight=0.2,
+                   fields=('mean_brightness', 'brightness_variance', 'dark_ratio'),
+                   params={'max_mean_brightness': 120, 'min_variance': 300, 'min_dark_ratio': 0.3})
+def brightness_strategy(f, p):
+    """Brilho médio, variância e fração de pixels escuros (boca aberta = mais escura)"""
+    return np.minimum(1.0, (
+        0.4 * (f['mean_brightness'] < p['max_mean_brightness'])
+        + 0.3 * (f['brightness_variance'] > p['min_variance'])
+        + 0.3 * (f['dark_ratio'] > p['min_dark_ratio'])
+    ))
+
+
+@register_strategy('asymmetry', cost=1, weight=0.1, fields=('asymmetry',),
+                   params={'min_asymmetry': 10, 'high_asymmetry': 20})
+def asymmetry_strategy(f, p):
+    """Diferença de brilho entre as metades esquerda e direita (sorriso é assimétrico)"""
+    return np.minimum(1.0, 0.5 * (f['asymmetry'] > p['min_asymmetry']) + 0.3 * (f['asymmetry'] > p['high_asymmetry']))
+
+
+@register_strategy('texture', cost=4, weight=0.15,
+                   fields=('gradient_mean', 'gradient_std', 'gradient_max'),
+                   params={'min_gradient_mean': 15, 'min_gradient_std': 10, 'min_gradient_max': 50})
+def texture_strategy(f, p):
+    """Magnitude dos gradientes Sobel (mudanças de intensidade e bordas fortes)"""
+    return np.minimum(1.0, (
+        0.4 * (f['gradient_mean'] > p['min_gradient_mean'])
+        + 0.3 * (f['gradient_std'] > p['min_gradient_std'])
+        + 0.3 * (f['gradient_max'] > p['min_gradient_max'])
+    ))
+
+
+@register_strategy('contour', cost=5, weight=0.2,
+                   fields=('largest_area_ratio', 'circularity', 'contour_count', 'largest_perimeter'),
+                   params={'min_area_ratio': 0.15, 'max_circularity': 0.3, 'min_contour_count': 5})
+def contour_strategy(f, p):
+    """Maior contorno da boca: área, forma alongada e número de contornos"""
+    return np.minimum(1.0, (
+        0.4 * (f['largest_area_ratio'] > p['min_area_ratio'])  # Área significativa
+        + 0.3 * (f['circularity'] < p['max_circularity'])     # Forma alongada (não circular)
+        + 0.3 * (f['contour_count'] > p['min_contour_count'])  # Múltiplos contornos
+    ) * (f['largest_perimeter'] > 0))
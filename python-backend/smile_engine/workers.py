@@ -0,0 +1,165 @@
+import atexit
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import cv2
+
+from . import metrics
+from .classifier import current_model, load_model
+from .config import apply_config
+from .detector import run_engine
+from .memory import ServerBusy
+from .models import preload_models, warm_up
+from .shared_frames import DEFAULT_SLOT_BYTES, FrameRing, SharedFrame, attach, check_generation, frame_view
+
+
+def _init_worker(opencv_threads, config=None, engines=('improved',), warm=None, model_path=None, ring=None):
+    """Prepara um processo worker: threads do OpenCV, config calibrada, modelos e aquecimento"""
+    # O paralelismo vem dos processos; threads internas do OpenCV só competiriam por CPU
+    cv2.setNumThreads(opencv_threads)
+    if config is not None:
+        apply_config(config)
+    if model_path and current_model() is None:
+        # Sem fork (spawn) o classificador treinado não vem do processo principal
+        load_model(model_path)
+    # Com fork os cascades já vêm carregados do processo principal; aqui só se completa o que faltar
+    preload_models(engines)
+    if ring is not None:
+        attach(ring)
+    warm_up(engines)
+    if warm is not None:
+        warm.release()
+
+
+def _detect_in_worker(frame, options, session):
+    shared = frame if isinstance(frame, SharedFrame) else None
+    with metrics.trace() as samples:
+        if shared is not None:
+            frame = frame_view(shared)
+        result = run_engine(frame, options, session)
+        if shared is not None:
+            # A detecção não guarda a view; a vaga ainda tem que ser deste frame
+            del frame
+            check_generation(shared)
+    # A sessão volta atualizada (rastreamento, suavização e fundo) para o front end,
+    # junto com as medições das etapas feitas neste processo
+    return result, session, samples
+
+
+def _ping():
+    return os.getpid()
+
+
+class DetectionPool:
+    """Pool de processos de detecção atrás do front end Flask
+
+    Cada processo tem seus próprios `cv2.CascadeClassifier` e roda com
+    `opencv_threads` threads do OpenCV, de modo que requisições de vários
+    quiosques escalam com o número de núcleos em vez de disputar o GIL. No
+    Linux os processos são criados com fork e herdam os cascades que o
+    processo principal já carregou (ver models.preload_models).
+
+    Com `ring_slots`, os frames vão para os workers por um anel em memória
+    compartilhada (ver shared_frames) em vez de pickle.
+
+    Se um worker morre (OOM, segfault do OpenCV), o executor fica quebrado:
+    o pool recria o executor e o anel e repete o frame uma vez; se falhar de
+    novo, a requisição recebe ServerBusy (503).
+    """
+
+    def __init__(self, processes=None, opencv_threads=1, config=None, engines=('improved',), model_path=None,
+                 ring_slots=0, ring_slot_bytes=DEFAULT_SLOT_BYTES):
+        self.processes = processes or os.cpu_count() or 1
+        self.opencv_threads = opencv_threads
+        self._ring_size = (ring_slots, ring_slot_bytes)
+        self.ring = None
+        # Fork só no Linux: no macOS o padrão (spawn) é o único seguro com OpenCV
+        self._context = multiprocessing.get_context('fork') if sys.platform.startswith('linux') else None
+        # Cada worker libera uma vez ao terminar o aquecimento
+        self._warm = (self._context or multiprocessing).Semaphore(0)
+        self._initargs = (opencv_threads, config, tuple(engines), self._warm, model_path)
+        self._started = None
+        self._lock = threading.Lock()
+        self.restarts = 0
+        self._executor = self._create_executor()
+        if self.ring is not None:
+            # Remove de /dev/shm o anel atual (recriado a cada restart) mesmo sem shutdown explícito
+            atexit.register(self._close_ring)
+
+    def _create_executor(self):
+        ring_slots, ring_slot_bytes = self._ring_size
+        if ring_slots:
+            self.ring = FrameRing(ring_slots, ring_slot_bytes)
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=self._context,
+            initializer=_init_worker,
+            initargs=self._initargs + (self.ring.name if self.ring is not None else None,)
+        )
+
+    def _restart(self, broken):
+        """Troca o executor quebrado (e o anel dele) por um novo, uma vez por quebra"""
+        with self._lock:
+            if self._executor is not broken:
+                return  # Outra requisição já recriou
+            self.restarts += 1
+            metrics.registry.increment('worker_restarts_total')
+            broken.shutdown(wait=False, cancel_futures=True)
+            if self.ring is not None:
+                self.ring.close()
+            self._executor = self._create_executor()
+
+    def _close_ring(self):
+        if self.ring is not None:
+            self.ring.close()
+
+    def start(self):
+        """Cria os processos agora, antes das threads do servidor existirem"""
+        if self._started is None:
+            self._started = [self._executor.submit(_ping) for _ in range(self.processes)]
+
+    def warm_up(self):
+        """Espera todos os workers carregarem os modelos e aquecerem; retorna os PIDs"""
+        self.start()
+        for _ in range(self.processes):
+            self._warm.acquire()
+        return sorted({future.result() for future in self._started})
+
+    def detect(self, frame, options, session=None):
+        """Roda `run_engine` num worker com as opções já validadas da requisição"""
+        try:
+            result, updated, samples = self._submit(frame, options, session)
+        except BrokenProcessPool:
+            try:
+                result, updated, samples = self._submit(frame, options, session)
+            except BrokenProcessPool:
+                raise ServerBusy("Detection workers are restarting")
+        metrics.registry.record(samples)
+        if session is not None:
+            session.tracker = updated.tracker
+            session.smoother = updated.smoother
+            session.presence = updated.presence
+        return result
+
+    def _submit(self, frame, options, session):
+        with self._lock:
+            executor, ring = self._executor, self.ring
+        shared = ring.put(frame) if ring is not None else None
+        try:
+            future = executor.submit(_detect_in_worker, shared or frame, options, session)
+            return future.result()
+        except BrokenProcessPool:
+            self._restart(executor)
+            raise
+        finally:
+            # Só com a resposta (ou o erro) do worker a vaga pode ser reaproveitada
+            if shared is not None:
+                ring.release(shared)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+        self._close_ring()
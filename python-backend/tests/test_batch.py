@@ -0,0 +1,67 @@
+import io
+
+import cv2
+import numpy as np
+import pytest
+
+from smile_engine import server
+from smile_engine.server import app
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+def jpeg(width=64, height=48):
+    return cv2.imencode('.jpg', np.full((height, width, 3), 128, np.uint8))[1].tobytes()
+
+
+def test_bad_frames_become_error_items(client):
+    files = [(io.BytesIO(jpeg()), 'a.jpg'), (io.BytesIO(b''), 'b.jpg'), (io.BytesIO(b'garbage'), 'c.jpg')]
+    response = client.post('/api/detect-smile/batch', data={'frames': files}, content_type='multipart/form-data')
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["count"] == 3
+    assert body["errors"] == 2
+    assert [result["index"] for result in body["results"]] == [0, 1, 2]
+    assert "error" not in body["results"][0]
+    assert body["results"][1]["error"] == "Empty frame"
+    assert body["results"][2]["error"] == "Could not decode image"
+
+
+def test_concatenated_batch_keeps_frame_order(client):
+    frames = [jpeg(64, 48), jpeg(32, 24)]
+    response = client.post('/api/detect-smile/batch', data=b''.join(frames), content_type='image/jpeg',
+                           headers={'X-Frame-Lengths': ','.join(str(len(frame)) for frame in frames)})
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body["count"] == 2 and body["errors"] == 0
+
+
+@pytest.mark.parametrize("lengths", ["0,10", "abc", "5"])
+def test_invalid_frame_lengths_reject_the_batch(client, lengths):
+    response = client.post('/api/detect-smile/batch', data=b'x' * 10, content_type='image/jpeg',
+                           headers={'X-Frame-Lengths': lengths})
+    assert response.status_code == 400
+
+
+def test_session_batch_runs_frames_in_order(client, monkeypatch):
+    seen = []
+
+    def fake_detection(frame, options, session=None):
+        seen.append((frame.shape[1], session.session_id))
+        return {"face_detected": False}
+
+    monkeypatch.setattr(server, 'run_detection', fake_detection)
+    files = [(io.BytesIO(jpeg(64, 48)), 'a.jpg'), (io.BytesIO(b'garbage'), 'b.jpg'), (io.BytesIO(jpeg(32, 24)), 'c.jpg')]
+    response = client.post('/api/detect-smile/batch?session_id=kiosk-1', data={'frames': files},
+                           content_type='multipart/form-data')
+
+    body = response.get_json()
+    assert [result["index"] for result in body["results"]] == [0, 1, 2]
+    assert body["errors"] == 1 and "error" in body["results"][1]
+    # O frame com erro não chega à detecção; os demais seguem na ordem do lote, na mesma sessão
+    assert seen == [(64, 'kiosk-1'), (32, 'kiosk-1')]
@@ -0,0 +1,36 @@
+import cv2
+import numpy as np
+import pytest
+
+from smile_engine import server
+from smile_engine.capture import CaptureStore, CaptureWindow
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, 'captures', CaptureStore())
+    return server.app.test_client()
+
+
+def post_frame(client, capture_id):
+    frame = cv2.imencode('.jpg', np.full((48, 64), 128, np.uint8))[1].tobytes()
+    return client.post(f'/api/capture/{capture_id}/frames', data=frame, content_type='image/jpeg')
+
+
+def test_frame_after_finish_is_rejected(client):
+    assert post_frame(client, 'k1').status_code == 202
+    assert client.post('/api/capture/k1/finish').status_code == 200
+
+    late = post_frame(client, 'k1')
+    assert late.status_code == 409
+    assert late.get_json()["status"] == "closed"
+    assert client.post('/api/capture/k1/finish').status_code == 409
+    assert client.post('/api/capture/unknown/finish').status_code == 404
+
+
+def test_finished_ids_expire():
+    store = CaptureStore(ttl_seconds=0.0)
+    store.get('k1', create=lambda: CaptureWindow(3, 1.0))
+    store.pop('k1')
+
+    assert store.get('k1', create=lambda: CaptureWindow(3, 1.0)) is not None
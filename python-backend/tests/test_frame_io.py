@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from smile_engine.frame_io import FrameDecodeError, decode_data_url, decode_encoded_frame, reduce_frame
+from smile_engine.server import app
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+def test_empty_buffer_is_a_decode_error():
+    with pytest.raises(FrameDecodeError, match="Empty frame"):
+        decode_encoded_frame(np.empty(0, np.uint8))
+    with pytest.raises(FrameDecodeError, match="Empty frame"):
+        decode_data_url("data:image/jpeg;base64,")
+
+
+@pytest.mark.parametrize("image", ["", "data:image/jpeg;base64,"])
+def test_empty_json_image_is_rejected(client, image):
+    response = client.post('/api/detect-smile', json={"image": image})
+    assert response.status_code == 400
+
+
+def test_empty_binary_body_is_rejected(client):
+    response = client.post('/api/detect-smile/binary', data=b'', content_type='image/jpeg')
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("body, error", [
+    ([1, 2], "Request body must be a JSON object"),
+    ("text", "Request body must be a JSON object"),
+    ({}, "No image data provided"),
+    ({"image": 123}, "image must be a data URL or base64 string"),
+    ({"image": None}, "image must be a data URL or base64 string"),
+])
+def test_invalid_json_payload_is_rejected(client, body, error):
+    response = client.post('/api/detect-smile', json=body)
+    assert response.status_code == 400
+    assert response.get_json()["error"] == error
+
+
+def test_non_json_body_is_rejected(client):
+    response = client.post('/api/detect-smile', data=b'not json', content_type='application/json')
+    assert response.status_code == 400
+
+
+def test_raw_frame_smaller_than_decode_scale_is_rejected(client):
+    response = client.post('/api/detect-smile/binary?decode_scale=4', data=b'\0' * 4,
+                           content_type='application/octet-stream',
+                           headers={'X-Frame-Width': '2', 'X-Frame-Height': '2'})
+    assert response.status_code == 400
+    assert "too small for decode_scale 4" in response.get_json()["error"]
+
+
+def test_reduce_frame():
+    frame = np.zeros((9, 17), np.uint8)
+    assert reduce_frame(frame, 1) is frame
+    assert reduce_frame(frame, 4).shape == (2, 4)
+    with pytest.raises(FrameDecodeError):
+        reduce_frame(np.zeros((3, 17), np.uint8), 4)
@@ -0,0 +1,91 @@
+import json
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+from simple_websocket import ConnectionClosed
+
+from smile_engine.frame_stream import serve_frame_stream
+
+
+class FakeSocket:
+    """WebSocket em memória: o teste entrega mensagens e lê as respostas"""
+
+    def __init__(self):
+        self.incoming = queue.Queue()
+        self.sent = []
+
+    def receive(self):
+        message = self.incoming.get()
+        if message is None:
+            raise ConnectionClosed()
+        return message
+
+    def send(self, message):
+        self.sent.append(json.loads(message))
+
+    def exchange(self, message, timeout=5):
+        """Envia uma mensagem binária e espera a resposta dela"""
+        expected = len(self.sent) + 1
+        self.incoming.put(message)
+        deadline = time.monotonic() + timeout
+        while len(self.sent) < expected:
+            assert time.monotonic() < deadline, "no response from the stream"
+            time.sleep(0.01)
+        return self.sent[-1]
+
+
+@pytest.fixture
+def stream():
+    calls = []
+
+    def process_frame(frame, options):
+        if options.get('fail'):
+            raise RuntimeError("Shared frame slot 0 was recycled")
+        calls.append(frame.shape)
+        return {"shape": list(frame.shape)}
+
+    ws = FakeSocket()
+    handler = threading.Thread(target=serve_frame_stream, args=(ws, process_frame), daemon=True)
+    handler.start()
+    yield ws, calls
+    ws.incoming.put(None)
+    handler.join(5)
+    assert not handler.is_alive()
+
+
+def jpeg():
+    return cv2.imencode('.jpg', np.full((48, 64), 128, np.uint8))[1].tobytes()
+
+
+def test_bad_frames_do_not_close_the_stream(stream):
+    ws, calls = stream
+
+    assert ws.exchange(b'')["error"] == "Empty frame"
+    assert ws.exchange(b'garbage')["error"] == "Could not decode image"
+    result = ws.exchange(jpeg())
+
+    assert result["shape"] == [48, 64]
+    assert [message["frame_seq"] for message in ws.sent] == [1, 2, 3]
+    assert calls == [(48, 64)]
+
+
+def test_engine_failure_is_reported_per_frame(stream):
+    ws, calls = stream
+    ws.incoming.put(json.dumps({"fail": True}))
+
+    assert "recycled" in ws.exchange(jpeg())["error"]
+    ws.incoming.put(json.dumps({"fail": False}))
+    assert ws.exchange(jpeg())["shape"] == [48, 64]
+
+
+def test_invalid_raw_size_is_reported(stream):
+    ws, _ = stream
+    ws.incoming.put(json.dumps({"width": "abc", "height": 2}))
+
+    assert ws.exchange(b'\0' * 4)["error"] == "Invalid raw frame size: 'abc'x2"
+    ws.incoming.put(json.dumps({"width": 2}))
+    assert ws.exchange(b'\0' * 4)["shape"] == [2, 2]
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from smile_engine import detector
+from smile_engine.detector import run_engine
+from smile_engine.engine import FaceBatch, score_faces
+from smile_engine.options import parse_detection_options
+from smile_engine.strategies import parse_strategies
+
+BOXES = [(10, 10, 100, 100), (130, 10, 100, 100), (250, 10, 100, 100)]
+
+
+@pytest.fixture
+def gray():
+    return np.random.default_rng(6).integers(0, 256, (128, 360), dtype=np.uint8)
+
+
+@pytest.fixture
+def three_faces(monkeypatch):
+    monkeypatch.setattr(detector, 'detect_faces', lambda *args, **kwargs: list(BOXES))
+
+
+def test_multi_face_lists_every_face(gray, three_faces):
+    result = run_engine(gray, parse_detection_options({'multi_face': True}))
+
+    assert result["face_count"] == 3
+    assert [face["face_region"]["x"] for face in result["faces"]] == [10, 130, 250]
+    assert result["smiling_count"] == sum(face["smiling"] for face in result["faces"])
+    assert result["all_smiling"] == (result["smiling_count"] == 3)
+    # A resposta principal continua sendo a face de maior score
+    assert result["smile_score"] == max(face["smile_score"] for face in result["faces"])
+
+
+def test_single_face_output_has_no_face_list(gray, three_faces):
+    result = run_engine(gray, parse_detection_options({}))
+
+    assert result["face_detected"] is True
+    assert "faces" not in result and "face_count" not in result
+
+
+@pytest.mark.parametrize('threshold', [0.2, 0.5, 0.8])
+def test_short_circuit_keeps_decisions(gray, threshold):
+    selection = parse_strategies()
+    with FaceBatch(gray, BOXES) as batch:
+        _, full, _ = score_faces(batch, selection, threshold)
+    with FaceBatch(gray, BOXES) as batch:
+        _, short, _ = score_faces(batch, selection, threshold, short_circuit=True)
+
+    np.testing.assert_array_equal(short > threshold, full > threshold)
+    assert np.all(short <= full + 1e-12)
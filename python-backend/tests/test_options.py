@@ -0,0 +1,48 @@
+import pytest
+
+from smile_engine import classifier, server
+from smile_engine.options import DEFAULT_OPTIONS, parse_detection_options
+
+
+@pytest.mark.parametrize('source, message', [
+    ({'threshold': 'high'}, "Invalid value for threshold"),
+    ({'engine': 'magic'}, "Unknown engine"),
+    ({'verbosity': 'loud'}, "Unknown verbosity"),
+    ({'decode_scale': 3}, "Invalid value for decode_scale"),
+    ({'face_size': 16}, "Invalid value for face_size"),
+    ({'scale_factor': 1.0}, "Invalid value for scale_factor"),
+    ({'min_neighbors': -1}, "Invalid value for min_neighbors"),
+    ({'min_size': 'big'}, "Invalid value for min_size"),
+    ({'strategies': 'haar,nope'}, "nope"),
+])
+def test_invalid_options_raise_value_error(source, message):
+    with pytest.raises(ValueError, match=message):
+        parse_detection_options(source)
+
+
+def test_classifier_requires_a_model(monkeypatch):
+    monkeypatch.setattr(classifier, '_model', None)
+
+    with pytest.raises(ValueError, match=classifier.NO_MODEL_ERROR):
+        parse_detection_options({'engine': 'classifier'})
+
+
+def test_query_string_values_are_parsed():
+    options = parse_detection_options({
+        'threshold': '0.7', 'multi_face': 'true', 'short_circuit': '0',
+        'decode_scale': '2', 'face_size': '0', 'min_size': '40',
+    })
+
+    assert options['threshold'] == 0.7
+    assert options['multi_face'] is True and options['short_circuit'] is False
+    assert options['decode_scale'] == 2 and options['face_size'] is None
+    assert options['face_params']['minSize'] == (40, 40)
+    # Campos ausentes ficam com os padrões
+    assert options['engine'] == DEFAULT_OPTIONS['engine']
+
+
+def test_api_returns_400_for_invalid_options():
+    response = server.app.test_client().post('/api/detect-smile', json={'image': 'AAAA', 'engine': 'magic'})
+
+    assert response.status_code == 400
+    assert "Unknown engine" in response.get_json()["error"]
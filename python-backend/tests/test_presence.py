@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from smile_engine.detector import run_engine
+from smile_engine.options import parse_detection_options
+from smile_engine.presence import POLL_PLAN, PresenceDetector, next_poll, poll_state, real_face
+from smile_engine.sessions import DetectionSession
+
+
+def scene(value=100):
+    return np.full((240, 320), value, np.uint8)
+
+
+def test_motion_against_learned_background():
+    detector = PresenceDetector(recheck_every=3)
+
+    assert detector.update(scene()) is True  # O primeiro frame vira o fundo
+    assert detector.update(scene()) is False
+
+    moved = scene()
+    moved[:120] = 200
+    assert detector.update(moved) is True
+    assert detector.should_detect() is True
+
+
+def test_still_scene_is_rechecked_periodically():
+    detector = PresenceDetector(recheck_every=3)
+    detector.update(scene())
+    detector.update(scene())
+
+    assert [detector.should_detect() for _ in range(6)] == [False, False, True, False, False, True]
+    # Uma face rastreada mantém a detecção mesmo parada
+    assert detector.should_detect(tracking=True) is True
+
+
+def test_still_scene_skips_detection():
+    options = parse_detection_options({'presence': True})
+    session = DetectionSession('kiosk')
+
+    first = run_engine(scene(), options, session)
+    second = run_engine(scene(), options, session)
+
+    assert first["presence"]["skipped"] is False
+    assert second["presence"] == {"present": False, "motion": 0.0, "skipped": True}
+    assert second["face_detected"] is False
+    assert second["next_poll"] == next_poll('idle')
+
+
+def test_real_face_ignores_the_simulated_face():
+    assert real_face({"face_detected": True}) is True
+    assert real_face({"face_detected": True, "simulated": True}) is False
+    assert real_face({"face_detected": False}) is False
+
+
+@pytest.mark.parametrize('result, present, state', [
+    ({"face_detected": False}, False, 'idle'),
+    ({"face_detected": False}, True, 'motion'),
+    ({"face_detected": True, "simulated": True}, True, 'motion'),
+    ({"face_detected": True, "smile_score": 0.1, "threshold": 0.5}, True, 'face'),
+    ({"face_detected": True, "smile_score": 0.45, "threshold": 0.5}, True, 'smiling'),
+    ({"face_detected": True, "smile_score": 0.1, "threshold": 0.5, "temporal": {"smiling": True}}, True, 'smiling'),
+])
+def test_poll_state(result, present, state):
+    assert poll_state(result, present) == state
+
+
+def test_next_poll_follows_the_plan():
+    for state, (interval_ms, max_width, max_height) in POLL_PLAN.items():
+        assert next_poll(state) == {"state": state, "interval_ms": interval_ms,
+                                    "max_width": max_width, "max_height": max_height}
+    assert next_poll('idle')["interval_ms"] > next_poll('smiling')["interval_ms"]
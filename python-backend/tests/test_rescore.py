@@ -0,0 +1,59 @@
+import argparse
+import json
+import os
+
+import cv2
+import numpy as np
+
+import rescore
+from rescore import ResultWriter
+from smile_engine.options import parse_detection_options
+
+
+def write_lines(path, lines):
+    with open(path, 'w') as handle:
+        handle.write(''.join(line + '\n' for line in lines))
+
+
+def test_resume_retries_error_records(tmp_path):
+    output = tmp_path / "scores.jsonl"
+    write_lines(output, [
+        json.dumps({"source": "a.jpg", "frame": None, "error": None}),
+        json.dumps({"source": "b.jpg", "frame": None, "error": "Could not read image"}),
+        json.dumps({"source": "c.mp4", "frame": 5, "smiling": True}),
+    ])
+    writer = ResultWriter(str(output), resume=True)
+    writer.close()
+
+    assert writer.done == {("a.jpg", None), ("c.mp4", 5)}
+
+
+def test_resume_retries_error_rows_in_csv(tmp_path):
+    output = tmp_path / "scores.csv"
+    write_lines(output, [",".join(rescore.FIELDS), "a.jpg,,,True,False,False,0.1,,,", "b.jpg,,,,,,,,,boom"])
+    writer = ResultWriter(str(output), resume=True)
+    writer.close()
+
+    assert writer.done == {("a.jpg", None)}
+
+
+def crash_on_b(path, full):
+    if path.endswith("b.jpg"):
+        os._exit(1)
+    return {"face_detected": False, "smiling": False, "smile_score": 0.0}, None
+
+
+def test_dead_worker_stops_the_run_without_recording_pending_items(tmp_path, monkeypatch, capsys):
+    for name in ("a.jpg", "b.jpg"):
+        cv2.imwrite(str(tmp_path / name), np.zeros((8, 8), np.uint8))
+    output = tmp_path / "scores.jsonl"
+    monkeypatch.setattr(rescore, '_score_image', crash_on_b)
+    args = argparse.Namespace(inputs=[str(tmp_path / "*.jpg")], output=str(output), resume=False, recursive=False,
+                              every=1, full=False, workers=1, in_flight=1, opencv_threads=1, model=None,
+                              progress_every=500)
+
+    assert rescore.run(args, parse_detection_options({})) == 1
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert all(not record.get("error") for record in records)
+    assert "b.jpg" not in {os.path.basename(record["source"]) for record in records}
+    assert "--resume" in capsys.readouterr().err
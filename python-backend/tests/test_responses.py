@@ -0,0 +1,84 @@
+import json
+import struct
+
+import pytest
+
+from smile_engine import responses
+from smile_engine.responses import (FLAG_ALL_SMILING, FLAG_CACHE_HIT, FLAG_ERROR, FLAG_FACE_DETECTED,
+                                    FLAG_FACE_REGION, FLAG_MULTI_FACE, FLAG_SMILING, FLAG_TEMPORAL,
+                                    encode_batch, encode_stream_result, pack_result, response_format)
+
+RESULT = {
+    "face_detected": True, "smiling": True, "smile_score": 0.75, "threshold": 0.5,
+    "face_region": {"x": 10, "y": 20, "width": 30, "height": 40},
+    "temporal": {"smoothed_score": 0.5, "median_score": 0.25, "stable_frames": 3,
+                 "smiling": True, "stable": True, "stable_smile": True},
+    "faces": [
+        {"face_region": {"x": 10, "y": 20, "width": 30, "height": 40}, "smile_score": 0.75, "smiling": True},
+        {"face_region": {"x": -5, "y": 0, "width": 8, "height": 9}, "smile_score": 0.5, "smiling": False},
+    ],
+    "all_smiling": False,
+    "cache": {"hit": True, "age_ms": 1.0},
+}
+
+
+def test_pack_result_layout():
+    data = pack_result(RESULT)
+
+    version, flags, count, score, threshold, *region = struct.unpack_from('<BBHff4h', data)
+    assert version == responses.BINARY_VERSION
+    assert flags == (FLAG_FACE_DETECTED | FLAG_SMILING | FLAG_FACE_REGION | FLAG_MULTI_FACE
+                     | FLAG_TEMPORAL | FLAG_CACHE_HIT)
+    assert (count, score, threshold, region) == (2, 0.75, 0.5, [10, 20, 30, 40])
+
+    offset = struct.calcsize('<BBHff4h')
+    assert struct.unpack_from('<ffHBx', data, offset) == (0.5, 0.25, 3, 7)
+    offset += struct.calcsize('<ffHBx')
+    faces = [struct.unpack_from('<4hfB', data, offset + i * struct.calcsize('<4hfB')) for i in range(2)]
+    assert faces == [(10, 20, 30, 40, 0.75, 1), (-5, 0, 8, 9, 0.5, 0)]
+    assert len(data) == offset + 2 * struct.calcsize('<4hfB')
+
+
+def test_error_result_has_only_the_header():
+    data = pack_result({"error": "Empty frame", "all_smiling": True})
+
+    assert len(data) == struct.calcsize('<BBHff4h')
+    assert struct.unpack_from('<BBHff4h', data)[1:] == (FLAG_ERROR, 0, 0.0, 0.0, 0, 0, 0, 0)
+
+
+def test_batch_and_stream_prefixes():
+    batch = encode_batch({"count": 2, "errors": 1, "results": [RESULT, {"error": "x"}]}, 'binary')
+    assert struct.unpack_from('<HH', batch) == (2, 1)
+    assert batch[4:] == pack_result(RESULT) + pack_result({"error": "x"})
+
+    stream = encode_stream_result(dict(RESULT, frame_seq=7, dropped_frames=2, latency_ms=12.5), 'binary')
+    assert struct.unpack_from('<IIf', stream) == (7, 2, 12.5)
+    assert json.loads(encode_stream_result({"frame_seq": 1}, 'json')) == {"frame_seq": 1}
+
+
+def test_all_smiling_flag():
+    flags = struct.unpack_from('<BB', pack_result(dict(RESULT, all_smiling=True)))[1]
+    assert flags & FLAG_ALL_SMILING
+
+
+@pytest.mark.parametrize('source, accept, expected', [
+    ({}, None, 'json'),
+    ({'format': 'binary'}, 'application/json', 'binary'),
+    ({}, 'application/octet-stream', 'binary'),
+    ({}, 'text/html, */*', 'json'),
+])
+def test_response_format_negotiation(source, accept, expected):
+    assert response_format(source, accept) == expected
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError, match="Unknown format"):
+        response_format({'format': 'xml'})
+
+
+def test_msgpack_accept_falls_back_without_msgpack(monkeypatch):
+    monkeypatch.setattr(responses, 'msgpack', None)
+
+    assert response_format({}, 'application/msgpack') == 'json'
+    with pytest.raises(ValueError, match="msgpack is not installed"):
+        response_format({'format': 'msgpack'})
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from smile_engine import server
+from smile_engine.options import parse_detection_options
+from smile_engine.result_cache import ResultCache
+from smile_engine.sessions import DetectionSession
+
+FACE = {"x": 40, "y": 30, "width": 80, "height": 80}
+
+
+@pytest.fixture
+def detections(monkeypatch):
+    """Detecção falsa (sempre a mesma face sorrindo) que conta as chamadas"""
+    calls = []
+
+    def fake_detect(img, options, session=None):
+        calls.append(img)
+        if session is not None:
+            session.tracker.boxes = [(40, 30, 80, 80)]
+        return {
+            "face_detected": True, "smiling": True, "smile_score": 0.9, "threshold": 0.5,
+            "tracking_mode": 'full', "face_region": dict(FACE),
+            "temporal": session.smoother.update(0.9, 0.5) if session is not None else None,
+        }
+
+    monkeypatch.setattr(server, 'result_cache', ResultCache(16))
+    monkeypatch.setattr(server, '_detect', fake_detect)
+    return calls
+
+
+def frame(flip=False):
+    gradient = np.tile(np.linspace(0, 255, 160, dtype=np.uint8), (120, 1))
+    return gradient[:, ::-1].copy() if flip else gradient
+
+
+def test_hit_miss_and_option_keying(detections):
+    options = parse_detection_options({})
+
+    assert server.run_detection(frame(), options)["cache"]["hit"] is False
+    assert server.run_detection(frame(), options)["cache"]["hit"] is True
+    assert len(detections) == 1
+
+    # Outras opções (ou outro frame) não reaproveitam o resultado
+    assert server.run_detection(frame(), parse_detection_options({'threshold': 0.7}))["cache"]["hit"] is False
+    assert server.run_detection(frame(flip=True), options)["cache"]["hit"] is False
+    assert len(detections) == 3
+
+
+def test_cache_hit_advances_session(detections):
+    options = parse_detection_options({})
+    session = DetectionSession('kiosk')
+
+    results = [server.run_detection(frame(), options, session) for _ in range(4)]
+
+    assert [r["cache"]["hit"] for r in results] == [False, True, True, True]
+    assert [r["temporal"]["stable_frames"] for r in results] == [1, 2, 3, 4]
+    assert results[2]["temporal"]["stable_smile"] is True
+    # O rastreador conta os frames repetidos para a redetecção periódica
+    assert session.tracker.boxes == [(40, 30, 80, 80)]
+    assert session.tracker.frames_since_full == 3
+    assert "temporal" not in server.result_cache.get(server.result_cache.key(frame(), options))[0]
@@ -0,0 +1,99 @@
+import os
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import pytest
+
+from smile_engine import shared_frames
+from smile_engine.options import parse_detection_options
+from smile_engine.shared_frames import FrameRing, attach, frame_view
+from smile_engine.workers import DetectionPool
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing(2, 64 * 64)
+    yield ring
+    for memory in shared_frames._attached.values():
+        memory.close()
+    shared_frames._attached.clear()
+    ring.close()
+
+
+def frame(value=0, shape=(64, 64)):
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def test_slot_is_reused_after_release(ring):
+    first = ring.put(frame(1))
+    ring.release(first)
+    second = ring.put(frame(2))
+
+    assert second.slot == first.slot
+    assert second.generation > first.generation
+    np.testing.assert_array_equal(frame_view(second), frame(2))
+    assert ring.stats()["in_use"] == 1
+
+
+def test_recycled_slot_is_detected(ring):
+    first = ring.put(frame(1))
+    ring.release(first)
+    ring.put(frame(2))
+
+    with pytest.raises(RuntimeError, match="recycled"):
+        frame_view(first)
+
+
+def test_full_ring_falls_back(ring):
+    assert ring.put(frame()) is not None
+    assert ring.put(frame()) is not None
+    assert ring.put(frame()) is None
+
+    stats = ring.stats()
+    assert stats["in_use"] == 2
+    assert stats["fallback_full"] == 1
+
+
+def test_oversized_frame_falls_back(ring):
+    assert ring.put(frame(shape=(65, 64))) is None
+
+    stats = ring.stats()
+    assert stats["in_use"] == 0
+    assert stats["fallback_oversize"] == 1
+
+
+def test_close_unlinks_segment():
+    ring = FrameRing(1, 1024)
+    name = ring.name
+    ring.close()
+    ring.close()
+
+    assert not os.path.exists(f"/dev/shm/{name.lstrip('/')}")
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+    assert ring.put(frame(shape=(8, 8))) is None
+
+
+def test_attach_does_not_track_segment(ring, monkeypatch):
+    registered = []
+    monkeypatch.setattr(resource_tracker, 'register', lambda name, rtype: registered.append(rtype))
+
+    attach(ring.name)
+
+    assert 'shared_memory' not in registered
+
+
+def test_pool_falls_back_to_pickle_when_ring_is_full():
+    pool = DetectionPool(1, ring_slots=1, ring_slot_bytes=64 * 64)
+    try:
+        held = pool.ring.put(frame())
+        result = pool.detect(frame(), parse_detection_options({}))
+        assert 'smiling' in result
+        assert pool.ring.stats()["fallback_full"] == 1
+
+        pool.ring.release(held)
+        pool.detect(frame(), parse_detection_options({}))
+        assert pool.ring.stats()["shared"] == 2
+        assert pool.ring.stats()["in_use"] == 0
+    finally:
+        pool.shutdown()
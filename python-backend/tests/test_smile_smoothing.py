@@ -0,0 +1,43 @@
+from smile_engine.smile_smoothing import SmileSmoother
+
+
+def test_hysteresis_ignores_scores_near_threshold():
+    smoother = SmileSmoother(ema_alpha=1.0, hysteresis=0.05)
+
+    # Dentro da faixa morta o estado não troca em nenhum sentido
+    assert smoother.update(0.53, 0.5)["smiling"] is False
+    assert smoother.update(0.6, 0.5)["smiling"] is True
+    assert smoother.update(0.47, 0.5)["smiling"] is True
+    assert smoother.update(0.44, 0.5)["smiling"] is False
+
+
+def test_stable_smile_fires_once():
+    smoother = SmileSmoother(stable_frames=3)
+
+    temporal = [smoother.update(0.9, 0.5) for _ in range(5)]
+
+    assert [t["stable_frames"] for t in temporal] == [1, 2, 3, 4, 5]
+    assert [t["stable_smile"] for t in temporal] == [False, False, True, False, False]
+    assert temporal[-1]["stable"] is True
+
+
+def test_ema_smooths_a_single_outlier():
+    smoother = SmileSmoother(ema_alpha=0.5)
+    for _ in range(3):
+        smoother.update(0.9, 0.5)
+
+    temporal = smoother.update(0.0, 0.5)
+
+    assert temporal["smiling"] is True
+    assert temporal["smoothed_score"] == 0.45
+    assert temporal["median_score"] == 0.9
+
+
+def test_reset_starts_over():
+    smoother = SmileSmoother()
+    for _ in range(3):
+        smoother.update(0.9, 0.5)
+
+    smoother.reset()
+
+    assert smoother.update(0.9, 0.5)["stable_frames"] == 1
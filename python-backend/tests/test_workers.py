@@ -0,0 +1,41 @@
+import atexit
+import os
+import signal
+import time
+
+import numpy as np
+
+from smile_engine.options import parse_detection_options
+from smile_engine.workers import DetectionPool
+
+
+def test_pool_recovers_from_dead_worker():
+    pool = DetectionPool(1, ring_slots=1, ring_slot_bytes=64 * 64)
+    try:
+        [pid] = pool.warm_up()
+        old_ring = pool.ring.name
+        os.kill(pid, signal.SIGKILL)
+        time.sleep(0.5)
+
+        result = pool.detect(np.zeros((64, 64), np.uint8), parse_detection_options({}))
+
+        assert 'smiling' in result
+        assert pool.restarts == 1
+        assert pool.ring.name != old_ring
+        assert not os.path.exists(f"/dev/shm/{old_ring.lstrip('/')}")
+        assert pool.ring.stats()["in_use"] == 0
+    finally:
+        pool.shutdown()
+
+
+def test_restarts_do_not_pile_up_exit_handlers(monkeypatch):
+    registered = []
+    monkeypatch.setattr(atexit, 'register', lambda func, *args: registered.append(func))
+    pool = DetectionPool(1, ring_slots=1, ring_slot_bytes=64 * 64)
+    try:
+        for _ in range(3):
+            pool._restart(pool._executor)
+        assert pool.restarts == 3
+        assert len(registered) == 1
+    finally:
+        pool.shutdown()
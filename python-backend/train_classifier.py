@@ -0,0 +1,148 @@
+"""Treino offline do engine classifier (descritores da boca + modelo NumPy)
+
+Exemplos:
+    # 1. Extrai os descritores uma vez (dataset/sorrindo/*.jpg, dataset/neutro/*.jpg)
+    python train_classifier.py extract dataset --output descriptors/
+
+    # 2. Treina e escolhe o threshold na validação
+    python train_classifier.py fit descriptors/ --output smile_model.npz
+    python train_classifier.py fit descriptors/ --model mlp --hidden 32 --output smile_model.npz
+
+    # 3. Servidor com o modelo treinado
+    python improved_smile_detector.py --model smile_model.npz --engine classifier
+
+A extração usa os mesmos rótulos e o mesmo paralelismo de `calibrate.py`.
+O treino não decodifica nenhuma imagem: lê os descritores com memory-map e
+otimiza o modelo inteiro em NumPy.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from smile_engine.calibration import (METRICS, best_thresholds, extract_descriptors, iter_labeled_images,
+                                      load_descriptors, metric_at)
+from smile_engine.classifier import MODEL_KINDS, set_threshold, train_classifier
+from smile_engine.engine import CANONICAL_FACE_SIZE
+from smile_engine.options import parse_face_size
+
+
+def _init_worker(opencv_threads):
+    cv2.setNumThreads(opencv_threads)
+
+
+def extract(args):
+    try:
+        face_size = parse_face_size({'face_size': args.face_size})
+    except ValueError as e:
+        sys.exit(f"❌ {e}")
+    items = []
+    for source in args.inputs:
+        items.extend(iter_labeled_images(os.path.expanduser(source)))
+    if not items:
+        sys.exit("❌ Nenhuma imagem rotulada encontrada (use subdiretórios smile/neutral ou um CSV caminho,rótulo)")
+    positives = sum(label for _, label in items)
+    print(f"🖼️  {len(items)} imagens ({positives} sorrindo, {len(items) - positives} neutras)", file=sys.stderr)
+
+    started = time.perf_counter()
+    processes = args.workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                             initargs=(args.opencv_threads,)) as executor:
+        extract_descriptors(items, args.output, executor if processes > 1 else None, face_size=face_size)
+
+    descriptors, _, _ = load_descriptors(args.output)
+    without_face = int(np.isnan(descriptors[:, 0]).sum())
+    elapsed = time.perf_counter() - started
+    print(f"✅ Descritores extraídos em {elapsed:.1f}s → {args.output} "
+          f"({without_face} imagens sem face)", file=sys.stderr)
+
+
+def fit(args):
+    try:
+        descriptors, labels, index = load_descriptors(args.input)
+    except (OSError, ValueError) as e:
+        sys.exit(f"❌ {e}")
+    rng = np.random.default_rng(args.seed)
+    indices = np.flatnonzero(~np.isnan(descriptors[:, 0]))
+    rng.shuffle(indices)
+    split = int(len(indices) * (1 - args.validation))
+    train, held_out = np.sort(indices[:split]), np.sort(indices[split:])
+    train_x, train_y = np.asarray(descriptors[train], dtype=np.float64), np.asarray(labels[train])
+    print(f"🧮 {len(train)} faces de treino, {len(held_out)} de validação", file=sys.stderr)
+
+    def log(message):
+        print(f"🔎 {message}", file=sys.stderr)
+
+    started = time.perf_counter()
+    try:
+        model = train_classifier(train_x, train_y, kind=args.model, hidden=args.hidden, epochs=args.epochs,
+                                 learning_rate=args.learning_rate, l2=args.l2, seed=args.seed, log=log)
+    except ValueError as e:
+        sys.exit(f"❌ {e}")
+    model.face_size = index.get('face_size') or CANONICAL_FACE_SIZE
+
+    # Threshold escolhido na validação quando ela tem as duas classes (senão no treino)
+    held_out_y = np.asarray(labels[held_out])
+    tune_x, tune_y = (descriptors[held_out], held_out_y) if len(np.unique(held_out_y)) == 2 else (train_x, train_y)
+    tune_probabilities = model.predict(np.asarray(tune_x, dtype=np.float32))
+    _, thresholds = best_thresholds(tune_probabilities[None, :], tune_y, args.metric)
+    threshold = float(thresholds[0])
+
+    report = {
+        "metric": args.metric,
+        "train_faces": int(len(train)),
+        "train": round(float(metric_at(model.predict(train_x.astype(np.float32)), train_y, threshold, args.metric)), 4),
+        "epochs": args.epochs,
+        "seconds": round(time.perf_counter() - started, 2),
+        "descriptors": os.path.abspath(args.input),
+    }
+    if len(held_out):
+        held_out_probabilities = model.predict(np.asarray(descriptors[held_out], dtype=np.float32))
+        report["validation_faces"] = int(len(held_out))
+        report["validation"] = round(float(metric_at(held_out_probabilities, held_out_y, threshold, args.metric)), 4)
+    set_threshold(model, threshold)
+    model.meta["training"] = report
+    model.save(args.output)
+
+    print(f"✅ {args.model}: threshold {threshold:.4f} | {args.metric} treino {report['train']}", file=sys.stderr)
+    if 'validation' in report:
+        print(f"📊 Validação ({report['validation_faces']} faces): {report['validation']}", file=sys.stderr)
+    print(f"💾 Modelo gravado em {args.output}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Treino offline do engine classifier')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    extract_parser = commands.add_parser('extract', help='extrai os descritores da boca de imagens rotuladas')
+    extract_parser.add_argument('inputs', nargs='+', help='diretórios com subpastas smile/neutral ou CSVs caminho,rótulo')
+    extract_parser.add_argument('--output', required=True, help='diretório dos descritores')
+    extract_parser.add_argument('--face-size', type=int, default=CANONICAL_FACE_SIZE,
+                                help=f'lado (px) da face normalizada (padrão: {CANONICAL_FACE_SIZE})')
+    extract_parser.add_argument('--workers', type=int, default=0, help='processos (0 = todos os núcleos)')
+    extract_parser.add_argument('--opencv-threads', type=int, default=1, help='threads do OpenCV por processo')
+    extract_parser.set_defaults(handler=extract)
+
+    fit_parser = commands.add_parser('fit', help='treina o modelo sobre os descritores')
+    fit_parser.add_argument('input', help='diretório gerado por "extract"')
+    fit_parser.add_argument('--output', default='smile_model.npz', help='modelo para o servidor (--model)')
+    fit_parser.add_argument('--model', choices=MODEL_KINDS, default='logistic')
+    fit_parser.add_argument('--hidden', type=int, default=32, help='neurônios da camada oculta (mlp)')
+    fit_parser.add_argument('--epochs', type=int, default=400)
+    fit_parser.add_argument('--learning-rate', type=float, default=0.01)
+    fit_parser.add_argument('--l2', type=float, default=1e-3, help='regularização dos pesos')
+    fit_parser.add_argument('--metric', choices=METRICS, default='f1', help='métrica do threshold')
+    fit_parser.add_argument('--validation', type=float, default=0.2, help='fração separada para validação')
+    fit_parser.add_argument('--seed', type=int, default=0)
+    fit_parser.set_defaults(handler=fit)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
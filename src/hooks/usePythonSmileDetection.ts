@@ -57,8 +57,94 @@ export const useFaceDetection = (videoRef: RefObject<HTMLVideoElement>): UseFace
   useEffect(() => {
     if (!isInitialized || !videoRef.current) return;
 
+    // Conexão persistente: evita um POST (e preflight CORS) por frame
+    let socket: WebSocket | null = null;
+    let awaitingResult = false;
+    // Sessão no servidor para rastreamento e suavização temporal no fallback HTTP
+    const sessionId = `kiosk-${Date.now()}-${Math.random().toString(36).slice(2)}`;
+    // Ritmo e resolução sugeridos pelo servidor (next_poll): devagar com a cabine vazia
+    let pollInterval = 500;
+    let maxWidth = Infinity;
+    let maxHeight = Infinity;
+    // Tamanho do frame enviado: as regiões da resposta vêm nessa escala
+    let frameWidth = 0;
+    let frameHeight = 0;
+    let pollTimer: ReturnType<typeof setTimeout> | null = null;
+    let polling = true;
+
+    const handleResult = (result: any) => {
+      if (!videoRef.current) return;
+
+      if (result.next_poll) {
+        pollInterval = result.next_poll.interval_ms;
+        maxWidth = result.next_poll.max_width;
+        maxHeight = result.next_poll.max_height;
+      }
+
+      if (result.error) {
+        console.error('❌ Erro na detecção Python:', result.error);
+        setIsSmiling(false);
+        return;
+      }
+
+      if (result.face_detected) {
+        // Simular bounding box baseado na região da face detectada
+        const faceRegion = result.face_region;
+        const detection: Detection = {
+          boundingBox: {
+            xCenter: (faceRegion.x + faceRegion.width / 2) / frameWidth,
+            yCenter: (faceRegion.y + faceRegion.height / 2) / frameHeight,
+            width: faceRegion.width / frameWidth,
+            height: faceRegion.height / frameHeight,
+          },
+          score: result.confidence
+        };
+
+        setDetections([detection]);
+        setIsDetecting(true);
+        // O servidor já aplica histerese: só conta sorriso estável por K frames
+        setIsSmiling(result.temporal ? result.temporal.stable : result.smiling);
+
+        console.log('🐍 Detecção Python:', {
+          faceDetected: result.face_detected,
+          smiling: result.smiling,
+          confidence: result.confidence,
+          smileScore: result.smile_score,
+          temporal: result.temporal,
+          threshold: smileThreshold,
+          details: result.details
+        });
+      } else {
+        setDetections([]);
+        setIsSmiling(false);
+        console.log('❌ Nenhuma face detectada pelo Python');
+      }
+    };
+
+    try {
+      socket = new WebSocket('ws://localhost:5001/api/detect-smile/stream');
+      socket.binaryType = 'arraybuffer';
+      socket.onopen = () => {
+        // Detecção só com movimento diante da cabine e ritmo sugerido em cada resposta
+        socket?.send(JSON.stringify({ presence: true }));
+      };
+      socket.onmessage = (event) => {
+        awaitingResult = false;
+        handleResult(JSON.parse(event.data));
+      };
+      socket.onclose = () => {
+        socket = null;
+        awaitingResult = false;
+      };
+    } catch (err) {
+      console.warn('⚠️ WebSocket indisponível, usando HTTP:', err);
+      socket = null;
+    }
+
     const detectFaces = async () => {
       if (!videoRef.current) return;
+      // Um frame por vez no stream; o servidor ainda descarta frames velhos
+      if (socket && awaitingResult) return;
 
       try {
         // Capturar frame do vídeo
@@ -66,58 +152,42 @@ export const useFaceDetection = (videoRef: RefObject<HTMLVideoElement>): UseFace
         const ctx = canvas.getContext('2d');
         if (!ctx) return;
 
-        canvas.width = videoRef.current.videoWidth;
-        canvas.height = videoRef.current.videoHeight;
-        ctx.drawImage(videoRef.current, 0, 0);
-
-        // Converter para base64
-        const imageData = canvas.toDataURL('image/jpeg', 0.8);
+        const { videoWidth, videoHeight } = videoRef.current;
+        const scale = Math.min(1, maxWidth / videoWidth, maxHeight / videoHeight);
+        canvas.width = Math.round(videoWidth * scale);
+        canvas.height = Math.round(videoHeight * scale);
+        ctx.drawImage(videoRef.current, 0, 0, canvas.width, canvas.height);
+
+        // Converter para JPEG binário (sem o overhead do base64)
+        const imageBlob = await new Promise<Blob | null>((resolve) =>
+          canvas.toBlob(resolve, 'image/jpeg', 0.8)
+        );
+        if (!imageBlob) return;
+
+        frameWidth = canvas.width;
+        frameHeight = canvas.height;
+
+        if (socket && socket.readyState === WebSocket.OPEN) {
+          awaitingResult = true;
+          socket.send(imageBlob);
+          return;
+        }
 
           // Enviar para servidor Python
-          const response = await fetch('http://localhost:5001/api/detect-smile', {
+          const response = await fetch('http://localhost:5001/api/detect-smile/binary?presence=1', {
           method: 'POST',
           headers: {
-            'Content-Type': 'application/json',
+            'Content-Type': 'image/jpeg',
+            'X-Session-Id': sessionId,
           },
-          body: JSON.stringify({ image: imageData })
+          body: imageBlob
         });
 
         if (!response.ok) {
           throw new Error('Erro na requisição para servidor Python');
         }
 
-        const result = await response.json();
-
-        if (result.face_detected) {
-          // Simular bounding box baseado na região da face detectada
-          const faceRegion = result.face_region;
-          const detection: Detection = {
-            boundingBox: {
-              xCenter: (faceRegion.x + faceRegion.width / 2) / videoRef.current.videoWidth,
-              yCenter: (faceRegion.y + faceRegion.height / 2) / videoRef.current.videoHeight,
-              width: faceRegion.width / videoRef.current.videoWidth,
-              height: faceRegion.height / videoRef.current.videoHeight,
-            },
-            score: result.confidence
-          };
-
-          setDetections([detection]);
-          setIsDetecting(true);
-          setIsSmiling(result.smiling);
-
-          console.log('🐍 Detecção Python:', {
-            faceDetected: result.face_detected,
-            smiling: result.smiling,
-            confidence: result.confidence,
-            smileScore: result.smile_score,
-            threshold: smileThreshold,
-            details: result.details
-          });
-        } else {
-          setDetections([]);
-          setIsSmiling(false);
-          console.log('❌ Nenhuma face detectada pelo Python');
-        }
+        handleResult(await response.json());
         
       } catch (err) {
         console.error('❌ Erro na detecção Python:', err);
@@ -125,13 +195,39 @@ export const useFaceDetection = (videoRef: RefObject<HTMLVideoElement>): UseFace
       }
     };
 
+    // Próximo frame no intervalo que a última resposta pediu
+    const poll = async () => {
+      await detectFaces();
+      if (polling) {
+        pollTimer = setTimeout(poll, pollInterval);
+      }
+    };
+
+    const stopPolling = () => {
+      polling = false;
+      if (pollTimer) {
+        clearTimeout(pollTimer);
+        pollTimer = null;
+      }
+    };
+
+    const closeSocket = () => {
+      if (socket) {
+        socket.onclose = null;
+        socket.close();
+        socket = null;
+      }
+    };
+
     if (videoRef.current.readyState >= 2) {
-      const interval = setInterval(detectFaces, 500); // A cada 500ms
-      return () => clearInterval(interval);
+      poll();
+      return () => {
+        stopPolling();
+        closeSocket();
+      };
     } else {
       const handleLoadedData = () => {
-        const interval = setInterval(detectFaces, 500);
-        return () => clearInterval(interval);
+        poll();
       };
       
       videoRef.current.addEventListener('loadeddata', handleLoadedData);
@@ -140,6 +236,8 @@ export const useFaceDetection = (videoRef: RefObject<HTMLVideoElement>): UseFace
         if (videoRef.current) {
           videoRef.current.removeEventListener('loadeddata', handleLoadedData);
         }
+        stopPolling();
+        closeSocket();
       };
     }
   }, [videoRef, smileThreshold, isInitialized]);